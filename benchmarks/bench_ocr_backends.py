@@ -0,0 +1,79 @@
+"""
+Compare les moteurs OCR (pytesseract / tesserocr) sur des scans réels.
+
+Usage : python -m benchmarks.bench_ocr_backends DOSSIER_PDF [--repeat 3]
+
+La 1ère page de chaque PDF est rendue une fois (comme dans le pipeline d'ingestion),
+puis chaque moteur l'OCRise --repeat fois. Affiche le temps moyen par page et
+le nombre de pages où les deux moteurs trouvent la même date d'intervention.
+"""
+import argparse
+import os
+import statistics
+import time
+
+from routes.ingest import (
+    PytesseractBackend,
+    TesserocrBackend,
+    extract_date_from_text,
+    render_first_page,
+)
+
+
+def load_pages(folder):
+    pages = []
+    for name in sorted(os.listdir(folder)):
+        if not name.lower().endswith(".pdf"):
+            continue
+        # Chemin passé tel quel à pdftoppm, comme pour un PDF spoolé
+        page = render_first_page(os.path.join(folder, name))
+        if page is not None:
+            pages.append((name, page))
+    return pages
+
+
+def bench(backend, pages, repeat):
+    timings = []
+    dates = {}
+    for name, page in pages:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            text = backend.image_to_string(page)
+            timings.append(time.perf_counter() - start)
+        dates[name] = extract_date_from_text(text)
+    return timings, dates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder", help="Dossier contenant des PDF scannés")
+    parser.add_argument("--repeat", type=int, default=3, help="Passages OCR par page")
+    args = parser.parse_args()
+
+    pages = load_pages(args.folder)
+    if not pages:
+        print("Aucun PDF exploitable.")
+        return
+    print(f"{len(pages)} page(s), {args.repeat} passage(s) chacune")
+
+    backends = [PytesseractBackend()]
+    try:
+        backends.append(TesserocrBackend())
+    except Exception as e:
+        print("tesserocr indisponible :", e)
+
+    all_dates = {}
+    for backend in backends:
+        timings, all_dates[backend.name] = bench(backend, pages, args.repeat)
+        print(f"{backend.name:12s} moyenne {statistics.mean(timings) * 1000:8.1f} ms/page"
+              f"  médiane {statistics.median(timings) * 1000:8.1f} ms"
+              f"  dates trouvées {sum(1 for d in all_dates[backend.name].values() if d)}/{len(pages)}")
+
+    if len(all_dates) == 2:
+        a, b = all_dates.values()
+        same = sum(1 for name, _ in pages if a[name] == b[name])
+        print(f"Dates identiques entre moteurs : {same}/{len(pages)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Compare les moteurs d'extraction de texte natif (PyPDF2 / pdftotext) sur des rapports réels.
+
+Usage : python -m benchmarks.bench_text_extraction DOSSIER_PDF [--repeat 3] [--pages 2]
+
+Chaque moteur extrait le texte des --pages premières pages de chaque PDF --repeat fois.
+Affiche le temps moyen par PDF, les échecs, le nombre de dates d'intervention trouvées
+et le nombre de PDF où les deux moteurs trouvent la même date.
+"""
+import argparse
+import os
+import statistics
+import time
+
+from routes.ingest import (
+    PDF_TEXT_PAGES,
+    PdftotextBackend,
+    PyPDF2TextBackend,
+    extract_date_from_text,
+)
+
+
+def load_pdfs(folder):
+    pdfs = []
+    for name in sorted(os.listdir(folder)):
+        if name.lower().endswith(".pdf"):
+            # Chemins, comme pour un PDF spoolé par l'ingestion
+            pdfs.append((name, os.path.join(folder, name)))
+    return pdfs
+
+
+def bench(backend, pdfs, repeat, pages):
+    timings = []
+    dates = {}
+    failures = 0
+    for name, pdf_path in pdfs:
+        text = ""
+        for _ in range(repeat):
+            start = time.perf_counter()
+            try:
+                text = backend.extract_text(pdf_path, pages)
+            except Exception as e:
+                failures += 1
+                print(f"  {backend.name} : échec sur {name} : {e}")
+                break
+            finally:
+                timings.append(time.perf_counter() - start)
+        dates[name] = extract_date_from_text(text)
+    return timings, dates, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder", help="Dossier contenant des PDF (rapports générés, scans...)")
+    parser.add_argument("--repeat", type=int, default=3, help="Passages par PDF")
+    parser.add_argument("--pages", type=int, default=PDF_TEXT_PAGES, help="Pages lues par PDF")
+    args = parser.parse_args()
+
+    pdfs = load_pdfs(args.folder)
+    if not pdfs:
+        print("Aucun PDF exploitable.")
+        return
+    print(f"{len(pdfs)} PDF, {args.repeat} passage(s) chacun, {args.pages} page(s) lue(s)")
+
+    backends = [PyPDF2TextBackend()]
+    try:
+        backends.append(PdftotextBackend())
+    except RuntimeError as e:
+        print("pdftotext indisponible :", e)
+
+    all_dates = {}
+    for backend in backends:
+        timings, all_dates[backend.name], failures = bench(backend, pdfs, args.repeat, args.pages)
+        print(f"{backend.name:10s} moyenne {statistics.mean(timings) * 1000:8.1f} ms/PDF"
+              f"  médiane {statistics.median(timings) * 1000:8.1f} ms"
+              f"  max {max(timings) * 1000:8.1f} ms"
+              f"  échecs {failures}"
+              f"  dates trouvées {sum(1 for d in all_dates[backend.name].values() if d)}/{len(pdfs)}")
+
+    if len(all_dates) == 2:
+        a, b = all_dates.values()
+        same = sum(1 for name, _ in pdfs if a[name] == b[name])
+        print(f"Dates identiques entre moteurs : {same}/{len(pdfs)}")
+
+
+if __name__ == "__main__":
+    main()
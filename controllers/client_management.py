@@ -7,6 +7,7 @@ from datetime import datetime
 import bcrypt
 import re
 from models.floorplan_model import FloorPlanModel
+from models.client_summary import record_client_user
 
 
 def _validate_password_strength(password):
@@ -64,31 +65,8 @@ def edit_client(db, client_id, username):
     client_doc_manager = ClientDocumentManager(db)
     documents = client_doc_manager.get_documents_by_client(client_id)
     client_users = list(db.clientUsers.find({"clientId": str(client_id)}))
-    from models.floorplan_model import FloorPlanModel  # Assurez-vous d'importer le modèle
-
-    # Charger les plans d'étage associés
-    # Charger les plans d'étage associés
-    floorplan_model = FloorPlanModel(db)  # ✅ Instancier le modèle
-    floorplans = list(db.floorPlans.find({"clientId": client_id}))
-
-    # Générer des URLs signées et charger les pièges associés
-    for plan in floorplans:
-        plan["traps"] = []
-
-        # ✅ Générer une nouvelle URL signée dynamiquement à chaque affichage
-        if "imagePath" in plan and plan["imagePath"]:
-            plan["imageUrl"] = floorplan_model.get_signed_url(plan["imagePath"])
-
-        # Charger les pièges associés
-        traps = db.traps.find({"planId": plan["_id"]})
-        for trap in traps:
-            # Vérifier et convertir les coordonnées en entiers
-            if "coordinates" in trap:
-                trap["coordinates"] = {
-                    "x": int(trap["coordinates"]["x"]) if isinstance(trap["coordinates"]["x"], (int, str)) else 0,
-                    "y": int(trap["coordinates"]["y"]) if isinstance(trap["coordinates"]["y"], (int, str)) else 0,
-                }
-            plan["traps"].append(trap)
+    # Plans d'étage et leurs pièges en deux requêtes (fichiers servis par /obj/floorplan/<plan_id>)
+    floorplans = FloorPlanModel(db).get_floorplans_with_traps(client_id)
 
     # Passer les données au template
     return render_template(
@@ -145,4 +123,5 @@ def create_client_user_c(db, client_id, form_data, created_by):
     }
 
     db.clientUsers.insert_one(user_data)
+    record_client_user(db, client_id)
     print(f"Utilisateur {username} créé avec succès pour le client {client_id}.")
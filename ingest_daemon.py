@@ -0,0 +1,171 @@
+"""
+Démon d'ingestion par dossier surveillé (hot folder).
+
+Surveille un répertoire (ex. dossier de dépôt du scanner réseau) avec watchdog,
+attend que chaque PDF soit entièrement écrit, puis le fait passer par le même
+pipeline que /api/ingest_docs (QR, date, MinIO, Mongo). Les fichiers traités
+sont déplacés dans done/ ou failed/.
+
+Usage : python ingest_daemon.py [--watch DOSSIER]
+"""
+import argparse
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from dotenv import load_dotenv
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+load_dotenv()
+
+from models import storage
+from models.database import connect_database
+from routes.ingest import ingest_pdfs
+
+WATCH_DIR = os.getenv("INGEST_WATCH_DIR", "hot_folder")
+# Délai (secondes) sans changement de taille avant de considérer un fichier comme complet
+SETTLE_SECONDS = float(os.getenv("INGEST_SETTLE_SECONDS", "3"))
+# Au-delà de ce délai, un PDF sans marqueur %%EOF est traité quand même (et finira dans failed/)
+MAX_WAIT_SECONDS = float(os.getenv("INGEST_MAX_WAIT_SECONDS", "300"))
+DAEMON_WORKERS = int(os.getenv("INGEST_DAEMON_WORKERS", "4"))
+
+
+class PendingFiles:
+    """Fichiers vus dans le dossier, en attente de fin d'écriture."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._files = {}  # chemin -> (taille, mtime, instant du dernier changement, instant d'apparition)
+
+    def touch(self, path):
+        with self._lock:
+            self._files.setdefault(path, (-1, -1, time.monotonic(), time.monotonic()))
+
+    def discard(self, path):
+        with self._lock:
+            self._files.pop(path, None)
+
+    def ready(self):
+        """Retire et retourne les fichiers stables depuis SETTLE_SECONDS."""
+        now = time.monotonic()
+        ready = []
+        with self._lock:
+            for path, (size, mtime, changed_at, seen_at) in list(self._files.items()):
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    del self._files[path]
+                    continue
+
+                if (stat.st_size, stat.st_mtime) != (size, mtime):
+                    self._files[path] = (stat.st_size, stat.st_mtime, now, seen_at)
+                    continue
+                if now - changed_at < SETTLE_SECONDS:
+                    continue
+                if not _has_eof_marker(path) and now - seen_at < MAX_WAIT_SECONDS:
+                    continue
+
+                del self._files[path]
+                ready.append(path)
+        return ready
+
+
+def _has_eof_marker(path):
+    """Un PDF complet se termine par %%EOF (à quelques octets près)."""
+    try:
+        with open(path, "rb") as fh:
+            fh.seek(max(os.path.getsize(path) - 1024, 0))
+            return b"%%EOF" in fh.read()
+    except OSError:
+        return False
+
+
+class HotFolderHandler(FileSystemEventHandler):
+    def __init__(self, watch_dir, pending):
+        self.watch_dir = os.path.abspath(watch_dir)
+        self.pending = pending
+
+    def _track(self, path):
+        # Seuls les PDF déposés à la racine du dossier surveillé (pas dans done/ ni failed/)
+        if os.path.dirname(os.path.abspath(path)) == self.watch_dir and path.lower().endswith(".pdf"):
+            self.pending.touch(path)
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self._track(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self._track(event.src_path)
+
+    def on_moved(self, event):
+        # Beaucoup de scanners écrivent un .tmp puis le renomment
+        if not event.is_directory:
+            self.pending.discard(event.src_path)
+            self._track(event.dest_path)
+
+
+def _move_to(path, folder):
+    os.makedirs(folder, exist_ok=True)
+    target = os.path.join(folder, f"{datetime.now():%Y%m%d-%H%M%S}_{os.path.basename(path)}")
+    shutil.move(path, target)
+    return target
+
+
+def process_file(db, path, done_dir, failed_dir):
+    """Ingère un PDF du dossier surveillé puis le range dans done/ ou failed/."""
+    name = os.path.basename(path)
+    try:
+        result = ingest_pdfs(db, [(name, path)], uploaded_by="hot_folder")[0]
+    except Exception as e:
+        result = {"file": name, "status": "error", "message": str(e)}
+
+    target = _move_to(path, failed_dir if result["status"] == "error" else done_dir)
+    print(f"[hot folder] {name} : {result['status']} -> {target}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingestion des PDF déposés dans un dossier surveillé.")
+    parser.add_argument("--watch", default=WATCH_DIR, help="Dossier à surveiller")
+    args = parser.parse_args()
+
+    watch_dir = os.path.abspath(args.watch)
+    done_dir = os.getenv("INGEST_DONE_DIR", os.path.join(watch_dir, "done"))
+    failed_dir = os.getenv("INGEST_FAILED_DIR", os.path.join(watch_dir, "failed"))
+    os.makedirs(watch_dir, exist_ok=True)
+
+    db, _, _ = connect_database()
+    storage.attach_object_index(db)
+    pending = PendingFiles()
+    handler = HotFolderHandler(watch_dir, pending)
+
+    # Fichiers déjà présents au démarrage
+    for entry in os.scandir(watch_dir):
+        if entry.is_file():
+            handler._track(entry.path)
+
+    observer = Observer()
+    observer.schedule(handler, watch_dir, recursive=False)
+    observer.start()
+    print(f"[hot folder] Surveillance de {watch_dir} ({DAEMON_WORKERS} workers)")
+
+    try:
+        with ThreadPoolExecutor(max_workers=DAEMON_WORKERS) as executor:
+            while True:
+                for path in pending.ready():
+                    executor.submit(process_file, db, path, done_dir, failed_dir)
+                time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        observer.stop()
+        observer.join()
+
+
+if __name__ == "__main__":
+    main()
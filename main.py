@@ -9,22 +9,29 @@ from flask import Flask, render_template, request, redirect, url_for, jsonify
 from initialize_project import login_user, create_initial_admin_user
 import bcrypt
 from datetime import datetime
+from itertools import islice
 from controllers.client_management import create_client_user_c
 from controllers.user_management import create_user
 from models.ClientDocumentManager import ClientDocumentManager
 from models.floorplan_model import FloorPlanModel
 from minio.error import S3Error
-from datetime import timedelta
 from zoneinfo import ZoneInfo
 from models.trap_model import TrapModel
+from models.database import get_mongo_settings
+from models import storage
+from models.indexes import ensure_indexes
+from models.client_search import build_search_keys
+from models.client_summary import rebuild_client_summaries, record_client_user, record_intervention, sync_client
 
 from flask import session, redirect, url_for, render_template, request
 
 from routes.onlyoffice_routes import onlyoffice_bp
 from routes.downloads import downloads_bp
-from routes.ingest import ingest_bp
+from routes.ingest import get_ocr_backend, ingest_bp, start_ingest_workers
 from routes.auth import auth_bp, login_required
 from routes.clients import clients_bp
+from routes.uploads import uploads_bp
+from routes.objects import objects_bp
 
 # Charger les variables d'environnement
 load_dotenv()
@@ -36,31 +43,55 @@ app.register_blueprint(downloads_bp)
 app.register_blueprint(ingest_bp)
 app.register_blueprint(auth_bp)
 app.register_blueprint(clients_bp)
+app.register_blueprint(uploads_bp)
+app.register_blueprint(objects_bp)
 app.secret_key = os.getenv("SECRET_KEY")
 
 # Définir l'environnement (DEV pour développement, PROD pour production)
 IS_DEV = os.getenv("ENV", "DEV") == "DEV"
 
-if IS_DEV:
-    mongo_host = os.getenv("DEV_MONGO_HOST")
-    mongo_database = os.getenv("DEV_MONGO_DATABASE")
-    mongo_uri = f"mongodb://{mongo_host}/{mongo_database}"
-else:
-    mongo_uri = os.getenv("PROD_MONGO_URI")
-    mongo_database = os.getenv("PROD_MONGO_DATABASE")
-    mongo_uri = os.getenv("PROD_MONGO_URI")
+mongo_uri, mongo_database = get_mongo_settings()
 
 # Connexion à MongoDB
 client = MongoClient(mongo_uri)
 db = client[mongo_database]
 app.config['MONGO_DB'] = db
+app.config['MONGO_URI'] = mongo_uri
+app.config['MONGO_DATABASE'] = mongo_database
 
-# Index unique sur le username des utilisateurs client (idempotent)
-db.clientUsers.create_index([("username", 1)], unique=True, name="username_unique")
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # Limite à 16 Mo
-# Vérification de l'existence de la collection et création d'un admin si nécessaire
-if "userInternet" not in db.list_collection_names():
-    create_initial_admin_user(db)
+# Nombre d'entrées par page de l'explorateur MinIO
+MINIO_BROWSER_PAGE_SIZE = int(os.getenv("MINIO_BROWSER_PAGE_SIZE", "100"))
+# Taille max d'une requête (Mo) : les fichiers sont spoolés sur disque, pas gardés en mémoire
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv("MAX_UPLOAD_MB", "1024")) * 1024 * 1024
+
+# Tâches de démarrage. Sautées quand ce module est réimporté sous le nom __mp_main__ dans
+# un process d'analyse (pool de routes/ingest.py, démarré en forkserver / spawn)
+if __name__ != "__mp_main__":
+    # Bucket MinIO vérifié une seule fois au démarrage (client partagé, models/storage.py)
+    storage.ensure_bucket()
+    # Index storageObjects tenu à jour à chaque écriture / suppression (python manage.py reindex-storage pour le reconstruire)
+    storage.attach_object_index(db)
+
+    # Vérification de l'existence de la collection et création d'un admin si nécessaire
+    if "userInternet" not in db.list_collection_names():
+        create_initial_admin_user(db)
+
+    # Index MongoDB déclarés dans models/indexes.py (idempotent ; python manage.py indexes pour le rapport).
+    # Après la vérification ci-dessus : créer un index crée aussi la collection userInternet
+    if os.getenv("ENSURE_INDEXES_ON_STARTUP", "1") == "1":
+        ensure_indexes(db)
+
+    # Première mise en service des résumés clients (liste des clients) : construits une fois,
+    # ensuite tenus à jour par les écritures ; réparation via `python manage.py rebuild-client-summaries`
+    if db.clientSummaries.estimated_document_count() == 0 and db.clients.estimated_document_count() > 0:
+        print("Construction des résumés clients :", rebuild_client_summaries(db))
+
+    # Moteur OCR effectivement retenu (OCR_BACKEND=auto retombe sur pytesseract sans tesserocr),
+    # aussi utilisé par l'analyse locale de secours
+    get_ocr_backend()
+
+    # Workers des jobs d'ingestion asynchrones (collection ingestJobs)
+    start_ingest_workers(app)
 
 
 @app.route("/")
@@ -197,21 +228,12 @@ def upload_document(client_id):
     print(f"Type MIME : {file.content_type}")
     print(f"Type de document : {document_type}")
 
-    # Lire les données du fichier
-    file_data = file.stream.read()
-    file_size = len(file_data)
-    print(f"Taille des données lues : {file_size} octets")
-
-    if file_size == 0:
-        print("Erreur : Le fichier est vide.")
-        return "Erreur : Le fichier est vide.", 400
-
-    # Réinitialiser le pointeur du flux pour permettre d'autres lectures
-    file.stream.seek(0)
-
     try:
-        client_doc_manager.handle_file_upload(client_id, file, session["username"], document_type)  # Passez le type
-        print(f"Fichier {file.filename} reçu pour le client {client_id}.")
+        upload = client_doc_manager.handle_file_upload(
+            client_id, file, session["username"], document_type,  # Passez le type
+            dedup_mode=request.form.get("dedupMode"),
+        )
+        print(f"Fichier {file.filename} reçu pour le client {client_id} ({upload['status']}).")
 
         return redirect(url_for("welcome", load=f"edit_client_route={client_id}"))
     except Exception as e:
@@ -229,12 +251,8 @@ def view_document(document_id):
         if not document:
             return "Document introuvable.", 404
 
-        # Générer une URL signée pour l'accès temporaire
-        object_name = document["fileUrl"].split(f"/{client_doc_manager.bucket_name}/")[-1]
-        presigned_url = client_doc_manager.generate_presigned_url(object_name)
-
-        # Rediriger vers l'URL signée
-        return redirect(presigned_url)
+        # Rediriger vers l'URL signée (générée par get_document_by_id)
+        return redirect(document["fileUrl"])
     except Exception as e:
         return f"Erreur lors de l'accès au document : {e}", 500
 
@@ -247,10 +265,13 @@ def toggle_client_user(user_id):
         if not user:
             return jsonify({"error": "Utilisateur introuvable."}), 404
         new_status = not user.get("isActive", True)
-        db.clientUsers.update_one(
-            {"_id": ObjectId(user_id)},
+        # Filtre sur l'état lu : deux bascules simultanées ne comptent qu'une fois dans le résumé client
+        result = db.clientUsers.update_one(
+            {"_id": ObjectId(user_id), "isActive": {"$ne": False} if new_status is False else False},
             {"$set": {"isActive": new_status}}
         )
+        if result.modified_count:
+            record_client_user(db, user.get("clientId"), 1 if new_status else -1)
         return jsonify({"success": True, "isActive": new_status})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -277,15 +298,7 @@ def download_document(document_id):
         document = client_doc_manager.get_document_by_id(document_id)
         file_path = document.get("filePath")
         file_name = document.get("fileName", "document")
-        presigned_url = client_doc_manager.minio_client.get_presigned_url(
-            "GET",
-            bucket_name=client_doc_manager.bucket_name,
-            object_name=file_path,
-            expires=timedelta(minutes=10),
-            response_headers={
-                "response-content-disposition": f'attachment; filename="{file_name}"'
-            },
-        )
+        presigned_url = storage.presign_cached(file_path, "download", download_name=file_name)
         return redirect(presigned_url)
     except Exception as e:
         return f"Erreur lors du téléchargement : {e}", 500
@@ -303,43 +316,67 @@ def upload_page(client_id):
 
 
 @app.route("/list_minio_files")
+@login_required
 def list_minio_files():
     """
-    Affiche la liste des fichiers présents dans le bucket MinIO avec des liens pour les voir.
+    Explorateur du bucket MinIO, dossier par dossier et page par page.
+    ?prefix=documents/<client>/ : dossier affiché ; ?start_after=<clé> : page suivante
+    (reprise de la liste MinIO après cette clé, sans reparcourir le début).
+    Les tailles des dossiers viennent de l'index storageObjects, pas d'un parcours du bucket.
     """
-    try:
-        # Configure le client MinIO
-        minio_client = Minio(
-            endpoint=os.getenv("AWS_ENDPOINT_URL").replace("http://", ""),
-            access_key=os.getenv("AWS_ACCESS_KEY_ID"),
-            secret_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-            secure=False  # Désactive SSL pour un environnement local
-        )
+    prefix = request.args.get("prefix", "").lstrip("/")
+    if prefix and not prefix.endswith("/"):
+        prefix += "/"
+    start_after = request.args.get("start_after") or None
+    if start_after and not start_after.startswith(prefix):
+        start_after = None
 
-        # Nom du bucket
-        bucket_name = os.getenv("AWS_BUCKET_NAME")
+    try:
+        # Liste non récursive : sous-dossiers + fichiers du niveau courant ; une entrée de plus
+        # que la page pour savoir s'il existe une suite. Si la page précédente finissait sur un
+        # dossier, certains serveurs S3 le renvoient à nouveau : il est ignoré.
+        objects = storage.list_objects(prefix=prefix or None, recursive=False, start_after=start_after)
+        objects = (obj for obj in objects if obj.object_name != start_after)
+        page = list(islice(objects, MINIO_BROWSER_PAGE_SIZE + 1))
+    except S3Error as e:
+        return f"Erreur lors de la récupération des fichiers : {str(e)}", 500
 
-        # Récupère la liste des objets
-        objects = minio_client.list_objects(bucket_name, recursive=True)
-        file_list = []
+    has_more = len(page) > MINIO_BROWSER_PAGE_SIZE
+    page = page[:MINIO_BROWSER_PAGE_SIZE]
 
-        # Génère des URLs signées pour chaque fichier
-        for obj in objects:
-            presigned_url = minio_client.presigned_get_object(
-                bucket_name=bucket_name,
-                object_name=obj.object_name,
-                expires=timedelta(hours=1)  # URL valide pendant 1 heure
-            )
+    folders, file_list = [], []
+    for obj in page:
+        name = obj.object_name[len(prefix):]
+        if obj.is_dir:
+            folders.append({"name": name.rstrip("/"), "prefix": obj.object_name})
+        else:
+            # Liens signés seulement au clic (/obj/key)
             file_list.append({
-                "name": obj.object_name,
+                "name": name,
                 "size": obj.size,
-                "url": presigned_url
+                "lastModified": obj.last_modified,
+                "url": url_for("objects.raw_object", key=obj.object_name),
             })
 
-        return render_template("minio_file_list.html", files=file_list)
+    index = storage.get_object_index()
+    totals = index.prefix_totals(prefix, names=[f["name"] for f in folders]) if index else {}
+    for folder in folders:
+        folder.update(totals.get(folder["name"], {"count": None, "size": None}))
 
-    except S3Error as e:
-        return f"Erreur lors de la récupération des fichiers : {str(e)}", 500
+    breadcrumbs = [{"name": storage.BUCKET_NAME, "prefix": ""}]
+    parts = prefix.rstrip("/").split("/") if prefix else []
+    for i, part in enumerate(parts):
+        breadcrumbs.append({"name": part, "prefix": "/".join(parts[:i + 1]) + "/"})
+
+    return render_template(
+        "minio_file_list.html",
+        prefix=prefix,
+        folders=folders,
+        files=file_list,
+        breadcrumbs=breadcrumbs,
+        next_start_after=page[-1].object_name if has_more and page else None,
+        is_continuation=bool(start_after),
+    )
 
 
 @app.route("/client_dashboard")
@@ -357,16 +394,8 @@ def client_dashboard():
     client_doc_manager = ClientDocumentManager(db)
     documents = client_doc_manager.get_documents_by_client(client_id)
 
-    # Récupérer les plans d'étage du client
-    floorplans = list(db.floorPlans.find({"clientId": client_id}))
-    floorplan_model = FloorPlanModel(db)
-
-    for plan in floorplans:
-        if "imagePath" in plan and plan["imagePath"]:
-            plan["imageUrl"] = floorplan_model.get_signed_url(plan["imagePath"])  # Générer URL de l’image
-
-        # Récupérer les pièges associés à ce plan
-        plan["traps"] = list(db.traps.find({"planId": plan["_id"]}))
+    # Plans d'étage du client et leurs pièges en deux requêtes (fichiers servis par /obj/floorplan/<plan_id>)
+    floorplans = FloorPlanModel(db).get_floorplans_with_traps(client_id)
 
     return render_template(
         "client_dashboard.html",
@@ -475,8 +504,10 @@ def upload_excel():
                     "modificationDate": datetime.now(ZoneInfo("Europe/Paris")),
                 }
 
-                # Insertion dans MongoDB
+                # Insertion dans MongoDB, avec les clés de recherche (models/client_search.py)
+                client_data["searchKeys"] = build_search_keys(client_data)
                 db.clients.insert_one(client_data)
+                sync_client(db, client_data)
             except Exception as e:
                 print(f"Erreur lors du traitement de la ligne {row.to_dict()} : {e}")
 
@@ -511,6 +542,7 @@ def add_intervention(client_id):
 
         # Insérer dans la collection `interventions`
         db.interventions.insert_one(intervention)
+        record_intervention(db, intervention)
 
         # Rediriger vers l'onglet Dates d'Intervention du client
         return redirect(url_for("welcome", load=f"edit_client_route={client_id}#dates"))
@@ -589,11 +621,9 @@ def add_trap(plan_id):
 
 @app.route("/edit_plan/<plan_id>", methods=["GET"])
 def edit_plan(plan_id):
-    floorplan_model = FloorPlanModel(db)
-    trap_model = TrapModel(db)
-
-    plan = floorplan_model.get_floorplan(plan_id)
-    traps = trap_model.get_traps_by_plan(plan_id)
+    # Même chargement plan + pièges que client_dashboard et edit_client
+    plan = FloorPlanModel(db).get_floorplan_with_traps(plan_id)
+    traps = plan["traps"] if plan else []
 
     return render_template("edit_plan.html", plan=plan, traps=traps)
 
@@ -610,26 +640,20 @@ def manage_traps(plan_id):
         return "ID de plan invalide", 400
 
     # Récupérer le plan et les pièges
-    plan = db.floorPlans.find_one({"_id": object_id})
+    plan = FloorPlanModel(db).get_floorplan_with_traps(object_id)
     if not plan:
         return "Plan d'étage introuvable", 404
+    traps = plan["traps"]
 
-    traps = list(db.traps.find({"planId": object_id}))
-    for trap in traps:
-        if "coordinates" in trap:
-            trap["coordinates"] = {
-                "x": int(trap["coordinates"]["x"]) if trap["coordinates"]["x"] else 0,
-                "y": int(trap["coordinates"]["y"]) if trap["coordinates"]["y"] else 0
-            }
-
-    # Générer une URL signée pour le plan (si `imagePath` est bien défini)
-    floorplan_model = FloorPlanModel(db)
+    # Lien stable vers l'image du plan, signé seulement au chargement de l'image
     if "imagePath" in plan and plan["imagePath"]:
-        plan["imageUrl"] = floorplan_model.get_signed_url(plan["imagePath"])
+        plan["imageUrl"] = url_for("objects.floorplan_object", plan_id=plan_id)
     else:
         plan["imageUrl"] = None
-
-    print("Image URL:", plan.get("imageUrl"))  # Vérifier si une URL est générée
+    # Pyramide de tuiles (générée en arrière-plan à l'upload) : l'éditeur ne charge que les
+    # tuiles visibles ; tant qu'elle n'est pas prête, l'image d'origine est affichée
+    if plan.get("tilesStatus") == "done" and plan.get("tiles"):
+        plan["tileUrlBase"] = url_for("objects.floorplan_object", plan_id=plan_id) + "/tiles"
 
     return render_template("manage_traps.html", plan=plan, traps=traps)
 
@@ -649,10 +673,7 @@ def save_trap_position():
         return jsonify({"success": False, "error": "Données incomplètes"}), 400
 
     try:
-        db.traps.update_one(
-            {"_id": ObjectId(trap_id)},
-            {"$set": {"coordinates": {"x": x, "y": y}}}
-        )
+        TrapModel(db).set_coordinates(trap_id, x, y)
         return jsonify({"success": True}), 200
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -0,0 +1,203 @@
+"""
+Commandes d'administration (hors serveur Flask).
+
+    python manage.py reindex-storage [--prefix documents/]
+    python manage.py floorplan-tiles [--all] [--plan <id>]
+    python manage.py document-thumbnails [--all] [--workers 4] [--limit 1000]
+    python manage.py indexes [--apply] [--drop-replaced]
+    python manage.py normalize-traps
+    python manage.py rebuild-search-keys [--missing]
+    python manage.py rebuild-client-summaries
+"""
+import argparse
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from models import storage
+from models.client_search import rebuild_search_keys
+from models.client_summary import rebuild_client_summaries
+from models.database import connect_database
+from models.floorplan_tiles import generate_floorplan_tiles
+from models.indexes import ensure_indexes, index_report
+from models.trap_model import normalize_coordinates
+from models.thumbnails import ensure_thumbnail, thumbnail_supported
+from models.utils.file_utils import sha256_file
+
+
+def reindex_storage(db, args):
+    """Reconstruit l'index storageObjects en parcourant le bucket (pages de 1000 clés, start_after)."""
+    index = storage.attach_object_index(db)
+    prefix = args.prefix or ""
+    print(f"Réindexation de {storage.BUCKET_NAME}/{prefix} ...")
+    result = index.reindex(storage.list_objects(prefix=prefix or None, recursive=True), prefix)
+    print(f"{result['indexed']} objets indexés, {result['removed']} entrées obsolètes supprimées.")
+
+
+def floorplan_tiles(db, args):
+    """Génère l'aperçu et les tuiles des plans existants (par défaut : ceux qui n'en ont pas encore)."""
+    storage.attach_object_index(db)
+    if args.plan:
+        query = {"_id": ObjectId(args.plan)}
+    elif args.all:
+        query = {}
+    else:
+        query = {"tilesStatus": {"$nin": ["done", "unsupported"]}}
+    plan_ids = [plan["_id"] for plan in db.floorPlans.find(query, {"_id": 1})]
+    print(f"{len(plan_ids)} plan(s) à traiter.")
+    for plan_id in plan_ids:
+        print(f"{plan_id} : {generate_floorplan_tiles(db, plan_id)}")
+
+
+def _thumbnail_for_object(db, key, filename, content_hash, force, work_dir):
+    """Télécharge un objet, génère sa vignette et la reporte sur tous les documents qui le référencent."""
+    fd, path = tempfile.mkstemp(dir=work_dir)
+    os.close(fd)
+    try:
+        storage.download_file(key, path)
+        content_hash = content_hash or sha256_file(path)
+        thumbnail_path = ensure_thumbnail(db, content_hash, path, filename, force=force)
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+    if not thumbnail_path:
+        return "skipped"
+    same_object = {"$or": [{"filePath": key}, {"objectPath": key}]}
+    db.clientDocuments.update_many(same_object, {"$set": {"thumbnailPath": thumbnail_path}})
+    db.clientDocuments.update_many({**same_object, "contentHash": None}, {"$set": {"contentHash": content_hash}})
+    return "done"
+
+
+def document_thumbnails(db, args):
+    """Génère en parallèle les vignettes des documents existants (par défaut : ceux qui n'en ont pas)."""
+    storage.attach_object_index(db)
+    query = {"$or": [{"filePath": {"$nin": [None, ""]}}, {"objectPath": {"$nin": [None, ""]}}]}
+    if not args.all:
+        query["thumbnailPath"] = None
+    cursor = db.clientDocuments.find(query, {"filePath": 1, "objectPath": 1, "fileName": 1, "contentHash": 1})
+    if args.limit:
+        cursor = cursor.limit(args.limit)
+
+    # Un objet partagé par plusieurs documents (mode "link") n'est traité qu'une fois
+    objects = {}
+    for doc in cursor:
+        key = doc.get("filePath") or doc.get("objectPath")
+        filename = doc.get("fileName") or os.path.basename(key)
+        # Formats sans vignette (Word, Excel...) : rien à télécharger
+        if thumbnail_supported(filename):
+            objects.setdefault(key, (filename, doc.get("contentHash")))
+    print(f"{len(objects)} objet(s) à traiter avec {args.workers} workers.")
+
+    work_dir = tempfile.mkdtemp(prefix="ahc_thumbnails_")
+    counts = {"done": 0, "skipped": 0, "error": 0}
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            futures = {
+                executor.submit(_thumbnail_for_object, db, key, filename, content_hash, args.all, work_dir): key
+                for key, (filename, content_hash) in objects.items()
+            }
+            for future, key in futures.items():
+                try:
+                    counts[future.result()] += 1
+                except Exception as e:
+                    counts["error"] += 1
+                    print(f"{key} : {e}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print(f"{counts['done']} vignette(s), {counts['skipped']} format(s) non pris en charge, {counts['error']} erreur(s).")
+
+
+def indexes(db, args):
+    """Applique le registre d'index (--apply) puis affiche les index manquants, inutilisés ou non déclarés."""
+    if args.apply or args.drop_replaced:
+        _, errors = ensure_indexes(db, drop_replaced=args.drop_replaced)
+        print(f"Index appliqués ({len(errors)} erreur(s)).")
+
+    for row in index_report(db):
+        if not row["present"]:
+            state = "MANQUANT"
+        elif not row["declared"]:
+            state = "non déclaré"
+        elif not row["ops"]:
+            state = "inutilisé"
+        else:
+            state = "ok"
+        since = row["since"].strftime("%d/%m/%Y %H:%M") if row["since"] else "-"
+        ops = row["ops"] if row["ops"] is not None else "-"
+        print(f"{row['collection']:<18} {row['index']:<26} {state:<12} {ops:>10} accès depuis {since}")
+
+
+def normalize_traps(db, args):
+    """Convertit une fois pour toutes les coordonnées de pièges enregistrées en texte (anciens formulaires)."""
+    not_number = {"$not": {"$type": "number"}}
+    query = {"coordinates": {"$type": "object"}, "$or": [{"coordinates.x": not_number}, {"coordinates.y": not_number}]}
+    updates = [
+        UpdateOne({"_id": trap["_id"]}, {"$set": {"coordinates": normalize_coordinates(trap["coordinates"])}})
+        for trap in db.traps.find(query, {"coordinates": 1})
+    ]
+    if updates:
+        db.traps.bulk_write(updates, ordered=False)
+    print(f"{len(updates)} piège(s) corrigé(s).")
+
+
+def search_keys(db, args):
+    """Recalcule les clés de recherche des clients (clients importés avant l'index, règles modifiées)."""
+    updated = rebuild_search_keys(db, only_missing=args.missing)
+    print(f"{updated} client(s) mis à jour.")
+
+
+def client_summaries(db, args):
+    """Reconstruit clientSummaries (liste des clients) après un écart ou à la mise en service."""
+    written = rebuild_client_summaries(db)
+    print(f"{written} résumé(s) client écrit(s).")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Commandes d'administration.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    reindex = commands.add_parser("reindex-storage", help="Reconstruit l'index storageObjects depuis le bucket")
+    reindex.add_argument("--prefix", default="", help="Ne réindexer que ce préfixe (ex. documents/)")
+    reindex.set_defaults(handler=reindex_storage)
+
+    tiles = commands.add_parser("floorplan-tiles", help="Génère aperçus et tuiles des plans d'étage")
+    tiles.add_argument("--all", action="store_true", help="Régénérer aussi les plans déjà traités")
+    tiles.add_argument("--plan", help="Ne traiter que ce plan")
+    tiles.set_defaults(handler=floorplan_tiles)
+
+    thumbs = commands.add_parser("document-thumbnails", help="Génère les vignettes des documents clients")
+    thumbs.add_argument("--all", action="store_true", help="Régénérer aussi les vignettes existantes")
+    thumbs.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Documents traités en parallèle")
+    thumbs.add_argument("--limit", type=int, default=0, help="Nombre maximal de documents (0 : tous)")
+    thumbs.set_defaults(handler=document_thumbnails)
+
+    idx = commands.add_parser("indexes", help="Rapport d'utilisation des index ($indexStats)")
+    idx.add_argument("--apply", action="store_true", help="Créer d'abord les index déclarés manquants")
+    idx.add_argument("--drop-replaced", action="store_true", help="Supprimer les index remplacés par le registre")
+    idx.set_defaults(handler=indexes)
+
+    traps = commands.add_parser("normalize-traps", help="Convertit en entiers les coordonnées de pièges")
+    traps.set_defaults(handler=normalize_traps)
+
+    keys = commands.add_parser("rebuild-search-keys", help="Recalcule les clés de recherche des clients")
+    keys.add_argument("--missing", action="store_true", help="Ne traiter que les clients sans clés")
+    keys.set_defaults(handler=search_keys)
+
+    summaries = commands.add_parser("rebuild-client-summaries", help="Reconstruit les résumés de la liste des clients")
+    summaries.set_defaults(handler=client_summaries)
+
+    args = parser.parse_args()
+    db, _, _ = connect_database()
+    args.handler(db, args)
+
+
+if __name__ == "__main__":
+    main()
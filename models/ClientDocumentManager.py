@@ -1,11 +1,18 @@
-from minio import Minio
 from minio.error import S3Error
 import os
-from datetime import datetime, timedelta
+from datetime import datetime
 from werkzeug.utils import secure_filename
 from bson.objectid import ObjectId
 from zoneinfo import ZoneInfo
-from urllib.parse import urlparse
+from models import storage
+from models.client_summary import record_documents, refresh_client_summary
+from models.thumbnails import ensure_thumbnail, release_thumbnail
+from models.utils.file_utils import sha256_file, spool_stream
+
+# Comportement quand un fichier identique (même SHA-256) existe déjà pour un autre client :
+#   - "copy" : le fichier est envoyé à nouveau sous le préfixe du nouveau client
+#   - "link" : le nouveau document référence l'objet MinIO existant, sans copie
+DOCUMENT_DEDUP_MODE = os.getenv("DOCUMENT_DEDUP_MODE", "copy")
 
 class ClientDocumentManager:
     def __init__(self, db):
@@ -14,39 +21,16 @@ class ClientDocumentManager:
         :param db: Instance de la base de données MongoDB.
         """
         self.db = db
-        endpoint_url = os.getenv("AWS_ENDPOINT_URL")
-        parsed_url = urlparse(endpoint_url)
-
-        self.minio_client = Minio(
-            endpoint=parsed_url.netloc or parsed_url.path,  # gère les deux formats
-            access_key=os.getenv("AWS_ACCESS_KEY_ID"),
-            secret_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-            secure=parsed_url.scheme == "https"
-        )
-        self.bucket_name = os.getenv("AWS_BUCKET_NAME")
-
-        # Vérifie si le bucket existe, sinon le crée
-        if not self.minio_client.bucket_exists(self.bucket_name):
-            self.minio_client.make_bucket(self.bucket_name)
+        # Client MinIO partagé (models/storage.py) : le bucket est vérifié au démarrage, pas ici
+        self.bucket_name = storage.BUCKET_NAME
 
     def get_documents_by_client(self, client_id):
-        documents = list(self.db.clientDocuments.find({"clientId": client_id}))
-
-        for document in documents:
-            try:
-                file_path = document.get("filePath") or document.get("objectPath")
-
-                if file_path:
-                    document["fileUrl"] = self.generate_presigned_url(file_path)
-                else:
-                    document["fileUrl"] = None
-                    print(f"⚠️ Aucun chemin de fichier trouvé pour le document {document.get('_id')}")
-            except Exception as e:
-                print(
-                    f"Erreur lors de la génération de l'URL signée pour {document.get('filePath') or document.get('objectPath')}: {e}")
-                document["fileUrl"] = None
-
-        return documents
+        """
+        Récupère tous les documents associés à un client.
+        Aucune URL n'est signée ici : les pages pointent vers /obj/<document_id>,
+        qui signe seulement quand le lien est suivi.
+        """
+        return list(self.db.clientDocuments.find({"clientId": client_id}))
 
     def delete_document(self, document_id):
         """
@@ -58,47 +42,49 @@ class ClientDocumentManager:
             raise ValueError("Document introuvable.")
 
         try:
-            # Supprime le fichier de MinIO
+            # Supprime le fichier de MinIO, sauf s'il est encore référencé par un document lié
             file_path = document["filePath"]
-            self.minio_client.remove_object(self.bucket_name, file_path)
+            if not self.is_object_shared(file_path, exclude_id=document["_id"]):
+                storage.delete(file_path)
 
-            # Supprime les métadonnées de MongoDB
+            # Supprime les métadonnées de MongoDB, puis la vignette si plus aucun document ne la partage
             self.db.clientDocuments.delete_one({"_id": ObjectId(document_id)})
+            release_thumbnail(self.db, document)
+            # Compteurs et date du dernier document recalculés pour ce client
+            refresh_client_summary(self.db, document.get("clientId"))
 
         except S3Error as e:
             raise ValueError(f"Erreur lors de la suppression dans MinIO : {str(e)}")
 
-    def get_documents_by_client(self, client_id):
+    def is_object_shared(self, file_path, exclude_id=None):
+        """
+        Indique si un objet MinIO est référencé par un autre document (mode "link").
+        :param file_path: Chemin de l'objet dans le bucket.
+        :param exclude_id: ID du document à ignorer (celui qu'on supprime / déplace).
+        """
+        query = {"$or": [{"filePath": file_path}, {"objectPath": file_path}]}
+        if exclude_id is not None:
+            query["_id"] = {"$ne": ObjectId(exclude_id)}
+        return self.db.clientDocuments.count_documents(query, limit=1) > 0
+
+    def find_by_content_hash(self, content_hash, client_id=None):
         """
-        Récupère tous les documents associés à un client et génère des URL signées.
+        Cherche un document existant de même empreinte SHA-256.
+        :param client_id: Si fourni, limite la recherche à ce client.
         """
-        documents = list(self.db.clientDocuments.find({"clientId": client_id}))
-        for document in documents:
-            try:
-                # Génère une URL signée basée sur filePath
-                document["fileUrl"] = self.generate_presigned_url(document["filePath"])
-            except Exception as e:
-                print(f"Erreur lors de la génération de l'URL signée pour {document['filePath']}: {e}")
-                document["fileUrl"] = None  # Assurez-vous que cela n'interrompt pas l'affichage
-        return documents
+        query = {"contentHash": content_hash}
+        if client_id is not None:
+            query["clientId"] = client_id
+        return self.db.clientDocuments.find_one(query, sort=[("uploadDate", 1)])
 
-    def generate_presigned_url(self, object_name, expiration=3600):
+    def generate_presigned_url(self, object_name, expiry="view"):
         """
-        Génère une URL signée pour un objet dans MinIO.
+        Génère (ou reprend du cache) une URL signée pour un objet dans MinIO.
         :param object_name: Le chemin de l'objet dans le bucket (sans le nom du bucket).
-        :param expiration: Durée de validité de l'URL (en secondes).
+        :param expiry: Classe d'expiration (voir storage.PRESIGN_EXPIRY_CLASSES).
         """
         try:
-            # Log du chemin de l'objet avant génération de l'URL
-            print(f"Génération de l'URL signée pour : {object_name}")
-            # Appel à MinIO pour générer l'URL signée
-            presigned_url = self.minio_client.presigned_get_object(
-                bucket_name=self.bucket_name,  # Nom du bucket (client-documents)
-                object_name=object_name.strip(),  # Chemin sans espace
-                expires=timedelta(seconds=expiration)
-            )
-            print(f"URL générée : {presigned_url}")
-            return presigned_url
+            return storage.presign_cached(object_name, expiry)
         except S3Error as e:
             raise ValueError(f"Erreur lors de la génération du lien signé : {str(e)}")
 
@@ -120,54 +106,88 @@ class ClientDocumentManager:
 
         return document
 
-    def handle_file_upload(self, client_id, file, uploaded_by, document_type):
+    def handle_file_upload(self, client_id, file, uploaded_by, document_type, dedup_mode=None):
         """
         Gère l'upload d'un fichier pour un client.
         :param client_id: ID du client.
         :param file: Fichier uploadé via un formulaire.
         :param uploaded_by: Nom ou ID de l'utilisateur ayant effectué l'upload.
         :param document_type: Type de document (ex. facture, contrat, autre).
+        :param dedup_mode: "copy" ou "link" (par défaut DOCUMENT_DEDUP_MODE).
+        :return: {"status": "ok" | "duplicate" | "linked", "documentId": ...}
         """
         if not file:
             raise ValueError("Aucun fichier reçu pour l'upload.")
 
+        # Écriture dans un fichier temporaire : taille et empreinte calculées par blocs,
+        # la mémoire utilisée ne dépend pas de la taille du fichier
+        spool_path, content_hash, file_size = spool_stream(file.stream)
+        try:
+            return self.store_file(
+                client_id, spool_path, file.filename, file.content_type, uploaded_by, document_type,
+                content_hash=content_hash, file_size=file_size, dedup_mode=dedup_mode,
+            )
+        finally:
+            os.remove(spool_path)
+
+    def store_file(self, client_id, path, filename, content_type, uploaded_by, document_type,
+                   content_hash=None, file_size=None, dedup_mode=None):
+        """
+        Range un fichier déjà présent sur disque (upload spoolé, upload reprenable finalisé).
+        :param path: Chemin du fichier local (non supprimé ici).
+        :param content_hash: Empreinte SHA-256 si déjà calculée.
+        :param file_size: Taille si déjà connue.
+        :return: {"status": "ok" | "duplicate" | "linked", "documentId": ...}
+        """
+        dedup_mode = dedup_mode or DOCUMENT_DEDUP_MODE
+        content_hash = content_hash or sha256_file(path)
+        file_size = os.path.getsize(path) if file_size is None else file_size
+        if file_size == 0:
+            raise ValueError("Le fichier est vide.")
+
         # Nettoyage du nom de fichier
-        raw_filename = secure_filename(file.filename)
+        raw_filename = secure_filename(filename)
         cleaned_filename = raw_filename.replace(" ", "_")
         unique_filename = f"{client_id}/{datetime.now(ZoneInfo('Europe/Paris')).timestamp()}_{cleaned_filename}"
 
-        # Lire les données pour calculer la taille si nécessaire
-        file_data = file.stream.read()
-        file_size = len(file_data) if file.content_length == 0 else file.content_length
-
-        # Réinitialiser le flux avant l'upload
-        file.stream.seek(0)
+        # Même contenu déjà présent pour ce client : rien à envoyer
+        existing = self.find_by_content_hash(content_hash, client_id=client_id)
+        if existing:
+            return {"status": "duplicate", "documentId": str(existing["_id"])}
+
+        document = {
+            "clientId": client_id,
+            "fileName": raw_filename,
+            "filePath": unique_filename,
+            "uploadDate": datetime.now(ZoneInfo("Europe/Paris")),
+            "uploadedBy": uploaded_by,
+            "fileSize": file_size,
+            "fileType": content_type,
+            "documentType": document_type,  # Ajout du type de document
+            "contentHash": content_hash,
+        }
+
+        # Même contenu chez un autre client : en mode "link", on référence l'objet existant
+        if dedup_mode == "link":
+            existing = self.find_by_content_hash(content_hash)
+            if existing:
+                document["filePath"] = existing.get("filePath") or existing.get("objectPath")
+                document["linkedFrom"] = existing["_id"]
+                document["thumbnailPath"] = existing.get("thumbnailPath")
+                inserted_id = self.db.clientDocuments.insert_one(document).inserted_id
+                record_documents(self.db, [document])
+                return {"status": "linked", "documentId": str(inserted_id)}
 
         try:
-            # Upload du fichier dans MinIO
-            self.minio_client.put_object(
-                bucket_name=self.bucket_name,
-                object_name=unique_filename,
-                data=file.stream,
-                length=file_size,
-                content_type=file.content_type,
-            )
+            # Upload multipart du fichier dans MinIO, partie par partie
+            storage.put_file(unique_filename, path, content_type)
+            # Vignette de la 1ère page (PDF, images), rendue depuis le fichier local déjà spoolé
+            document["thumbnailPath"] = ensure_thumbnail(self.db, content_hash, path, raw_filename)
 
             # Sauvegarde des métadonnées dans MongoDB
-            document = {
-                "clientId": client_id,
-                "fileName": raw_filename,
-                "filePath": unique_filename,
-                "uploadDate": datetime.now(ZoneInfo("Europe/Paris")),
-                "uploadedBy": uploaded_by,
-                "fileSize": file_size,
-                "fileType": file.content_type,
-                "documentType": document_type,  # Ajout du type de document
-            }
-            self.db.clientDocuments.insert_one(document)
+            inserted_id = self.db.clientDocuments.insert_one(document).inserted_id
+            record_documents(self.db, [document])
+            return {"status": "ok", "documentId": str(inserted_id)}
 
         except S3Error as e:
             raise ValueError(f"Erreur lors de l'upload vers MinIO : {str(e)}")
-
-
-
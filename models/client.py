@@ -1,6 +1,8 @@
 from datetime import datetime
 from bson.objectid import ObjectId
 from zoneinfo import ZoneInfo
+from models.client_search import build_search_keys
+from models.client_summary import remove_client_summary, sync_client
 
 class Client:
     def __init__(
@@ -146,11 +148,14 @@ class Client:
         :param db: Instance MongoDB.
         """
         data = self.to_dict()
+        # Clés de recherche (models/client_search.py) recalculées à chaque écriture
+        data["searchKeys"] = build_search_keys(data)
         if self.client_id:  # Mise à jour si l'ID existe
             db.clients.update_one({"_id": self.client_id}, {"$set": data})
         else:  # Insertion sinon
             inserted_id = db.clients.insert_one(data).inserted_id
             self.client_id = inserted_id  # Met à jour l'ID après insertion
+        sync_client(db, {**data, "_id": self.client_id})
 
 
 
@@ -162,6 +167,7 @@ class Client:
         """
         if self.client_id:
             result = db.clients.delete_one({"_id": self.client_id})
+            remove_client_summary(db, self.client_id)
             return result.deleted_count == 1
         raise ValueError("Impossible de supprimer : l'ID du client est manquant.")
 
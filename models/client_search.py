@@ -0,0 +1,151 @@
+"""
+Recherche de clients par préfixes de mots, servie par un index MongoDB.
+
+À chaque écriture d'un client, le champ searchKeys reçoit les préfixes (edge n-grams)
+de chaque mot de ses champs identifiants, normalisés : minuscules, sans accents ni
+ponctuation. "Boulangerie Dupré" donne "bo", "bou", ..., "du", "dup", "dupr", "dupre".
+Une recherche "dupr boul" devient {"searchKeys": {"$all": ["dupr", "boul"]}},
+résolue par l'index multiclé searchKeys sans parcourir la collection.
+"""
+import re
+import unicodedata
+
+from pymongo import UpdateOne
+
+# Longueurs des préfixes indexés : un terme plus long est tronqué à SEARCH_MAX_GRAM
+SEARCH_MIN_GRAM = 2
+SEARCH_MAX_GRAM = 15
+# Clients réécrits par lot lors d'une reconstruction complète
+SEARCH_REBUILD_BATCH_SIZE = 1000
+
+# Champs des clients lus par build_search_keys : projection de toute lecture destinée à recalculer les clés
+SEARCH_KEY_PROJECTION = {"companyName": 1, "email": 1, "responsible": 1, "serviceAddress": 1,
+                         "contractNumber": 1, "entity": 1}
+
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+
+
+def fold(text) -> str:
+    """Minuscules, sans accents, ponctuation remplacée par des espaces ("Dupré & Fils" -> "dupre fils")."""
+    if text is None:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    ascii_text = "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+    return _NON_ALNUM_RE.sub(" ", ascii_text).strip()
+
+
+def tokenize(text) -> list[str]:
+    return fold(text).split()
+
+
+def edge_ngrams(token: str) -> list[str]:
+    """Préfixes d'un mot, de SEARCH_MIN_GRAM à SEARCH_MAX_GRAM caractères."""
+    return [token[:n] for n in range(SEARCH_MIN_GRAM, min(len(token), SEARCH_MAX_GRAM) + 1)]
+
+
+def _searchable_values(client: dict) -> list:
+    responsible = client.get("responsible") or {}
+    service_address = client.get("serviceAddress") or {}
+    return [
+        client.get("companyName"),
+        client.get("email"),
+        responsible.get("firstName"),
+        responsible.get("lastName"),
+        service_address.get("treatmentPlaceName"),
+        service_address.get("city"),
+        # Numéros importés en texte ou en entier : indexés sous la même forme
+        client.get("contractNumber"),
+        client.get("entity"),
+    ]
+
+
+def build_search_keys(client: dict) -> list[str]:
+    """Clés de recherche d'un client (champ searchKeys), sans doublon."""
+    keys = set()
+    for value in _searchable_values(client):
+        for token in tokenize(value):
+            keys.update(edge_ngrams(token))
+    return sorted(keys)
+
+
+def query_terms(search: str) -> list[str]:
+    """Termes d'une recherche, sous la forme des clés indexées (mots d'un caractère ignorés)."""
+    return [token[:SEARCH_MAX_GRAM] for token in tokenize(search) if len(token) >= SEARCH_MIN_GRAM]
+
+
+def search_filter(search: str) -> dict | None:
+    """
+    Filtre MongoDB d'une recherche libre : tous les mots doivent préfixer un mot du client.
+    :return: Le filtre, ou None si la recherche ne contient aucun terme exploitable.
+    """
+    terms = query_terms(search)
+    if not terms:
+        return None
+    # Le terme le plus long est le plus sélectif : placé en premier, c'est lui qui parcourt l'index
+    terms.sort(key=len, reverse=True)
+    return {"searchKeys": {"$all": terms}}
+
+
+def _exact_number_values(search: str) -> list:
+    """Formes possibles d'un numéro de contrat / d'entité saisi (importés en texte ou en entier)."""
+    raw = search.strip()
+    values = {raw, raw.upper()}
+    if raw.isdigit():
+        values.add(int(raw))
+    return list(values)
+
+
+def autocomplete(db, search: str, limit: int = 10) -> list[dict]:
+    """
+    Clients correspondant à une saisie partielle, pour les sélecteurs de client.
+    Les numéros de contrat / entités exactement égaux à la saisie viennent en premier
+    (requête dédiée, index contractNumber / entity), puis les clients trouvés par
+    préfixes, par ordre alphabétique.
+    """
+    query = search_filter(search)
+    if query is None:
+        return []
+    projection = {"companyName": 1, "contractNumber": 1, "entity": 1, "serviceAddress.city": 1,
+                  "serviceAddress.treatmentPlaceName": 1}
+
+    values = _exact_number_values(search)
+    results = list(
+        db.clients.find({"$or": [{"contractNumber": {"$in": values}}, {"entity": {"$in": values}}]}, projection)
+        .sort("companyName", 1)
+        .limit(limit)
+    )
+    if len(results) < limit:
+        seen = {client["_id"] for client in results}
+        # limit suffit : au plus len(results) doublons avec la requête exacte
+        for client in db.clients.find(query, projection).sort("companyName", 1).limit(limit):
+            if client["_id"] not in seen and len(results) < limit:
+                results.append(client)
+    return results
+
+
+def rebuild_search_keys(db, only_missing=False):
+    """
+    Recalcule searchKeys pour tous les clients (après un changement des règles de normalisation),
+    et recopie les nouvelles clés dans leurs résumés (clientSummaries, recherche de la liste des clients).
+    :param only_missing: Ne traite que les clients qui n'ont pas encore de clés.
+    :return: Nombre de clients mis à jour.
+    """
+    query = {"searchKeys": None} if only_missing else {}
+    updated = 0
+    batch = []  # (_id du client, clés)
+
+    def flush():
+        updates = [UpdateOne({"_id": client_id}, {"$set": {"searchKeys": keys}}) for client_id, keys in batch]
+        modified = db.clients.bulk_write(updates, ordered=False).modified_count
+        # Même _id dans clientSummaries ; un résumé absent est laissé à rebuild_client_summaries
+        db.clientSummaries.bulk_write(updates, ordered=False)
+        return modified
+
+    for client in db.clients.find(query, SEARCH_KEY_PROJECTION):
+        batch.append((client["_id"], build_search_keys(client)))
+        if len(batch) >= SEARCH_REBUILD_BATCH_SIZE:
+            updated += flush()
+            batch = []
+    if batch:
+        updated += flush()
+    return updated
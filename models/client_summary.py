@@ -0,0 +1,279 @@
+"""
+Résumés dénormalisés des clients (collection clientSummaries, _id = _id du client).
+
+La liste des clients lit uniquement cette collection : identité (nom, email, lieu,
+contrat, entité, clés de recherche) et compteurs (documents, scans, plans, pièges,
+interventions, comptes actifs du portail client, dates du dernier document / de la
+dernière intervention). Un client sans compte actif est affiché « non assigné ».
+
+Les écritures (upload, ingestion, assignation, plan, piège, intervention, compte client) mettent le
+résumé à jour par $inc / $max. Une suppression qui peut changer une date « dernier ... »
+recalcule le résumé de ce client seul (refresh_client_summary). rebuild_client_summaries
+reconstruit toute la collection à partir des agrégations ($group), pour réparer un écart.
+Ces mises à jour ne lèvent jamais d'exception : l'écriture principale est déjà faite.
+"""
+from datetime import datetime
+
+from bson.objectid import ObjectId
+from pymongo import ReplaceOne, UpdateOne
+
+from models.client_search import SEARCH_KEY_PROJECTION, build_search_keys
+
+# Résumés réécrits par lot lors d'une reconstruction complète
+SUMMARY_REBUILD_BATCH_SIZE = 1000
+
+# Champs des clients recopiés dans leur résumé, plus ceux qui servent à recalculer
+# searchKeys pour un client qui n'a pas encore de clés
+CLIENT_PROJECTION = {**SEARCH_KEY_PROJECTION, "searchKeys": 1}
+
+EMPTY_COUNTERS = {
+    "documentCount": 0,
+    "scanCount": 0,
+    "planCount": 0,
+    "trapCount": 0,
+    "interventionCount": 0,
+    "activeUserCount": 0,
+    "lastDocumentDate": None,
+    "lastInterventionDate": None,
+}
+
+
+def _summary_id(client_id):
+    """_id du résumé (ObjectId du client), ou None pour un clientId absent ou invalide."""
+    if isinstance(client_id, ObjectId):
+        return client_id
+    if client_id and ObjectId.is_valid(str(client_id)):
+        return ObjectId(str(client_id))
+    return None
+
+
+def _client_fields(client):
+    service_address = client.get("serviceAddress") or {}
+    return {
+        "companyName": client.get("companyName"),
+        "email": client.get("email"),
+        "serviceAddress": {"treatmentPlaceName": service_address.get("treatmentPlaceName")},
+        "contractNumber": client.get("contractNumber"),
+        "entity": client.get("entity"),
+        "searchKeys": client.get("searchKeys") or build_search_keys(client),
+    }
+
+
+def _as_datetime(value):
+    """Date d'intervention en datetime (les scans la stockent en texte ISO "AAAA-MM-JJ")."""
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    return value
+
+
+def _apply(db, updates):
+    """
+    Applique des mises à jour [(summary_id, update)] sur les résumés ; un client dont le
+    résumé n'existe pas encore (collection jamais reconstruite) est résumé complètement.
+    """
+    if not updates:
+        return
+    try:
+        result = db.clientSummaries.bulk_write(
+            [UpdateOne({"_id": summary_id}, update) for summary_id, update in updates], ordered=False
+        )
+        if result.matched_count < len(updates):
+            for summary_id in {summary_id for summary_id, _ in updates}:
+                if not db.clientSummaries.count_documents({"_id": summary_id}, limit=1):
+                    refresh_client_summary(db, summary_id)
+    except Exception as e:
+        print("Erreur mise à jour des résumés clients :", e)
+
+
+# ----- Écritures incrémentales -----
+def sync_client(db, client):
+    """Recopie l'identité d'un client créé ou modifié dans son résumé (compteurs à zéro s'il est nouveau)."""
+    summary_id = _summary_id(client.get("_id"))
+    if summary_id is None:
+        return
+    try:
+        db.clientSummaries.update_one(
+            {"_id": summary_id},
+            {"$set": _client_fields(client),
+             "$setOnInsert": {**EMPTY_COUNTERS, "summarizedAt": datetime.now()}},
+            upsert=True,
+        )
+    except Exception as e:
+        print(f"Erreur résumé du client {summary_id} :", e)
+
+
+def remove_client_summary(db, client_id):
+    summary_id = _summary_id(client_id)
+    if summary_id is None:
+        return
+    try:
+        db.clientSummaries.delete_one({"_id": summary_id})
+    except Exception as e:
+        print(f"Erreur suppression du résumé du client {summary_id} :", e)
+
+
+def record_documents(db, documents):
+    """
+    Compte des documents qui viennent d'être rangés chez un client (upload, scan, assignation).
+    Les documents sans client (scans non assignés) sont ignorés.
+    """
+    updates = []
+    for document in documents:
+        summary_id = _summary_id(document.get("clientId"))
+        if summary_id is None:
+            continue
+        last_dates = {}
+        if document.get("uploadDate"):
+            last_dates["lastDocumentDate"] = document["uploadDate"]
+        if _as_datetime(document.get("interventionDate")):
+            last_dates["lastInterventionDate"] = _as_datetime(document["interventionDate"])
+        update = {"$inc": {"documentCount": 1, "scanCount": 1 if document.get("source") == "scan" else 0}}
+        if last_dates:
+            update["$max"] = last_dates
+        updates.append((summary_id, update))
+    _apply(db, updates)
+
+
+def record_floorplan(db, client_id):
+    summary_id = _summary_id(client_id)
+    if summary_id is not None:
+        _apply(db, [(summary_id, {"$inc": {"planCount": 1}})])
+
+
+def record_traps(db, plan_id, delta=1):
+    """Ajoute delta pièges (négatif à la suppression) au client du plan."""
+    try:
+        plan = db.floorPlans.find_one({"_id": ObjectId(plan_id)}, {"clientId": 1})
+    except Exception as e:
+        print(f"Erreur lecture du plan {plan_id} :", e)
+        return
+    summary_id = _summary_id(plan.get("clientId")) if plan else None
+    if summary_id is not None:
+        _apply(db, [(summary_id, {"$inc": {"trapCount": delta}})])
+
+
+def record_intervention(db, intervention):
+    summary_id = _summary_id(intervention.get("clientId"))
+    if summary_id is None:
+        return
+    update = {"$inc": {"interventionCount": 1}}
+    if intervention.get("date"):
+        update["$max"] = {"lastInterventionDate": intervention["date"]}
+    _apply(db, [(summary_id, update)])
+
+
+def record_client_user(db, client_id, delta=1):
+    """Ajoute delta comptes actifs du portail (création, réactivation ; -1 à la désactivation)."""
+    summary_id = _summary_id(client_id)
+    if summary_id is not None:
+        _apply(db, [(summary_id, {"$inc": {"activeUserCount": delta}})])
+
+
+# ----- Recalcul par agrégation -----
+def _aggregate_counters(db, client_ids=None):
+    """
+    Compteurs par client (clé : clientId en texte, comme dans les collections liées).
+    :param client_ids: Limite le calcul à ces clients ; None pour tous.
+    """
+    match = {"clientId": {"$in": client_ids}} if client_ids is not None else {"clientId": {"$ne": None}}
+    counters = {}
+
+    def entry(client_id):
+        return counters.setdefault(str(client_id), dict(EMPTY_COUNTERS))
+
+    for row in db.clientDocuments.aggregate([
+        {"$match": match},
+        {"$group": {
+            "_id": "$clientId",
+            "documentCount": {"$sum": 1},
+            "scanCount": {"$sum": {"$cond": [{"$eq": ["$source", "scan"]}, 1, 0]}},
+            "lastDocumentDate": {"$max": "$uploadDate"},
+            "lastInterventionDate": {"$max": "$interventionDate"},
+        }},
+    ]):
+        row["lastInterventionDate"] = _as_datetime(row["lastInterventionDate"])
+        entry(row["_id"]).update({k: v for k, v in row.items() if k != "_id"})
+
+    for row in db.interventions.aggregate([
+        {"$match": match},
+        {"$group": {"_id": "$clientId", "count": {"$sum": 1}, "last": {"$max": "$date"}}},
+    ]):
+        client_counters = entry(row["_id"])
+        client_counters["interventionCount"] = row["count"]
+        last = client_counters["lastInterventionDate"]
+        if row["last"] and (not last or row["last"] > last):
+            client_counters["lastInterventionDate"] = row["last"]
+
+    for row in db.clientUsers.aggregate([
+        {"$match": {**match, "isActive": {"$ne": False}}},
+        {"$group": {"_id": "$clientId", "count": {"$sum": 1}}},
+    ]):
+        entry(row["_id"])["activeUserCount"] = row["count"]
+
+    plan_clients = {}
+    for plan in db.floorPlans.find(match, {"clientId": 1}):
+        plan_clients[plan["_id"]] = plan["clientId"]
+        entry(plan["clientId"])["planCount"] += 1
+
+    if plan_clients:
+        plan_filter = {"planId": {"$in": list(plan_clients)}} if client_ids is not None else {}
+        for row in db.traps.aggregate([
+            {"$match": plan_filter},
+            {"$group": {"_id": "$planId", "count": {"$sum": 1}}},
+        ]):
+            if row["_id"] in plan_clients:
+                entry(plan_clients[row["_id"]])["trapCount"] += row["count"]
+    return counters
+
+
+def refresh_client_summary(db, client_id):
+    """Recalcule entièrement le résumé d'un client (après une suppression) ; le supprime si le client n'existe plus."""
+    summary_id = _summary_id(client_id)
+    if summary_id is None:
+        return
+    try:
+        client = db.clients.find_one({"_id": summary_id}, CLIENT_PROJECTION)
+        if not client:
+            db.clientSummaries.delete_one({"_id": summary_id})
+            return
+        counters = _aggregate_counters(db, [str(summary_id)]).get(str(summary_id), EMPTY_COUNTERS)
+        db.clientSummaries.replace_one(
+            {"_id": summary_id},
+            {**_client_fields(client), **counters, "summarizedAt": datetime.now()},
+            upsert=True,
+        )
+    except Exception as e:
+        print(f"Erreur recalcul du résumé du client {summary_id} :", e)
+
+
+def rebuild_client_summaries(db):
+    """
+    Reconstruit clientSummaries depuis clients et les collections liées, puis supprime les
+    résumés des clients disparus. Les écritures faites pendant la reconstruction peuvent
+    être comptées deux fois ou pas du tout : à lancer hors des heures d'utilisation.
+    :return: Nombre de résumés écrits.
+    """
+    started = datetime.now()
+    counters = _aggregate_counters(db)
+    written = 0
+    batch = []
+    for client in db.clients.find({}, CLIENT_PROJECTION):
+        summary = {
+            **_client_fields(client),
+            **counters.get(str(client["_id"]), EMPTY_COUNTERS),
+            "summarizedAt": datetime.now(),
+        }
+        batch.append(ReplaceOne({"_id": client["_id"]}, summary, upsert=True))
+        if len(batch) >= SUMMARY_REBUILD_BATCH_SIZE:
+            db.clientSummaries.bulk_write(batch, ordered=False)
+            written += len(batch)
+            batch = []
+    if batch:
+        db.clientSummaries.bulk_write(batch, ordered=False)
+        written += len(batch)
+
+    db.clientSummaries.delete_many({"summarizedAt": {"$lt": started}})
+    return written
@@ -0,0 +1,23 @@
+import os
+from pymongo import MongoClient
+
+
+def get_mongo_settings():
+    """
+    Paramètres de connexion MongoDB selon l'environnement (variable ENV : DEV ou PROD).
+    :return: (URI MongoDB, nom de la base)
+    """
+    if os.getenv("ENV", "DEV") == "DEV":
+        mongo_host = os.getenv("DEV_MONGO_HOST")
+        mongo_database = os.getenv("DEV_MONGO_DATABASE")
+        return f"mongodb://{mongo_host}/{mongo_database}", mongo_database
+    return os.getenv("PROD_MONGO_URI"), os.getenv("PROD_MONGO_DATABASE")
+
+
+def connect_database():
+    """
+    Ouvre la connexion MongoDB (utilisé par les scripts hors Flask : démon d'ingestion, commandes).
+    :return: (instance de la base, URI MongoDB, nom de la base)
+    """
+    mongo_uri, mongo_database = get_mongo_settings()
+    return MongoClient(mongo_uri)[mongo_database], mongo_uri, mongo_database
@@ -1,30 +1,24 @@
-from minio import Minio
 from minio.error import S3Error
 import os
-from datetime import datetime, timedelta
+from datetime import datetime
 from werkzeug.utils import secure_filename
 from bson.objectid import ObjectId
 from zoneinfo import ZoneInfo
 import qrcode
 import io
+import tempfile
+from models import storage
+from models.client_summary import record_floorplan
+from models.floorplan_tiles import RASTER_EXTENSIONS, schedule_floorplan_tiles
+from models.trap_model import TrapModel
 from models.utils.word_utils import add_qr_to_word
 from qrcode.image.pil import PilImage
 
 class FloorPlanModel:
     def __init__(self, db):
         self.db = db
-        self.db = db
-        self.minio_client = Minio(
-            endpoint=os.getenv("AWS_ENDPOINT_URL").replace("http://", ""),
-            access_key=os.getenv("AWS_ACCESS_KEY_ID"),
-            secret_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-            secure=False  # Désactive SSL pour un environnement local
-        )
-        self.bucket_name = os.getenv("AWS_BUCKET_NAME")
-
-        # Vérifie si le bucket existe, sinon le crée
-        if not self.minio_client.bucket_exists(self.bucket_name):
-            self.minio_client.make_bucket(self.bucket_name)
+        # Client MinIO partagé (models/storage.py) : le bucket est vérifié au démarrage, pas ici
+        self.bucket_name = storage.BUCKET_NAME
 
     def get_signed_url(self, object_name):
         """
@@ -33,11 +27,7 @@ class FloorPlanModel:
         :return: URL signée temporaire
         """
         try:
-            return self.minio_client.presigned_get_object(
-                bucket_name=self.bucket_name,
-                object_name=object_name,
-                expires=timedelta(hours=1)  # URL valable 1 heure
-            )
+            return storage.presign_cached(object_name)  # URL valable 1 heure, réutilisée tant qu'elle l'est assez
         except S3Error as e:
             print(f"Erreur MinIO : {e}")
             return None
@@ -75,13 +65,7 @@ class FloorPlanModel:
 
         # ✅ Stockage du QR code dans MinIO
         qr_path = f"qrcodes/{client_id}/{datetime.now(ZoneInfo('Europe/Paris')).timestamp()}_qr.png"
-        self.minio_client.put_object(
-            bucket_name=self.bucket_name,
-            object_name=qr_path,
-            data=qr_bytes,
-            length=len(qr_bytes.getvalue()),
-            content_type="image/png",
-        )
+        storage.put_bytes(qr_path, qr_bytes.getvalue(), "image/png")
 
         # ✅ Si le fichier est un Word, insérer le QR dans le document
         try:
@@ -97,13 +81,7 @@ class FloorPlanModel:
                 content_type = file.content_type
 
             # ✅ Upload du fichier dans MinIO (Word modifié ou original)
-            self.minio_client.put_object(
-                bucket_name=self.bucket_name,
-                object_name=unique_filename,
-                data=file_to_upload,
-                length=upload_length,
-                content_type=content_type,
-            )
+            storage.put_bytes(unique_filename, file_to_upload.getvalue(), content_type)
 
             # ✅ Enregistrement dans MongoDB
             floorplan = {
@@ -119,10 +97,21 @@ class FloorPlanModel:
                 "fileType": content_type,
             }
 
-            return self.db.floorPlans.insert_one(floorplan)
-
+            result = self.db.floorPlans.insert_one(floorplan)
+            record_floorplan(self.db, client_id)
         except S3Error as e:
             raise ValueError(f"Erreur lors de l'upload du plan vers MinIO : {str(e)}")
+
+        # Aperçu + tuiles en arrière-plan : le PDF est rastérisé ici une fois pour toutes,
+        # à partir des octets déjà reçus (pas de relecture depuis MinIO)
+        source_path = None
+        if ext in RASTER_EXTENSIONS:
+            fd, source_path = tempfile.mkstemp(prefix="ahc_floorplan_", suffix=f".{ext}")
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(file_data)
+        schedule_floorplan_tiles(self.db, result.inserted_id, source_path)
+        return result
+
     def edit_floorplan(self, plan_id, name, description):
         """Modifie un plan d'étage existant."""
         return self.db.floorPlans.update_one(
@@ -132,4 +121,22 @@ class FloorPlanModel:
 
     def get_floorplan(self, plan_id):
         """Récupère un plan d'étage par son ID."""
-        return self.db.floorPlans.find_one({"_id": ObjectId(plan_id)})
\ No newline at end of file
+        return self.db.floorPlans.find_one({"_id": ObjectId(plan_id)})
+
+    def get_floorplan_with_traps(self, plan_id):
+        """Un plan d'étage avec ses pièges (plan["traps"]), ou None s'il n'existe pas."""
+        plan = self.get_floorplan(plan_id)
+        if plan:
+            plan["traps"] = TrapModel(self.db).get_traps_by_plans([plan["_id"]])[plan["_id"]]
+        return plan
+
+    def get_floorplans_with_traps(self, client_id):
+        """
+        Plans d'étage d'un client, chacun avec ses pièges (plan["traps"]).
+        Deux requêtes quel que soit le nombre de plans : les plans, puis tous leurs pièges ($in).
+        """
+        floorplans = list(self.db.floorPlans.find({"clientId": client_id}))
+        traps_by_plan = TrapModel(self.db).get_traps_by_plans([plan["_id"] for plan in floorplans])
+        for plan in floorplans:
+            plan["traps"] = traps_by_plan[plan["_id"]]
+        return floorplans
\ No newline at end of file
@@ -0,0 +1,177 @@
+"""
+Aperçu WebP et pyramide de tuiles (format deep zoom) des plans d'étage.
+
+Le plan est rastérisé une seule fois après l'upload (les PDF via pdf2image), puis :
+  floorplans/<client>/<plan>/preview.webp                  aperçu réduit (FLOORPLAN_PREVIEW_MAX_PX)
+  floorplans/<client>/<plan>/tiles/<niveau>/<col>_<ligne>.webp
+Le niveau maxLevel est l'image en pleine résolution ; chaque niveau inférieur divise
+la taille par 2, jusqu'à minLevel où l'image tient dans une seule tuile.
+La génération tourne dans un pool de threads du process, hors de la requête d'upload.
+"""
+import math
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from io import BytesIO
+
+from bson.objectid import ObjectId
+from PIL import Image
+
+from models import storage
+
+FLOORPLAN_TILE_SIZE = int(os.getenv("FLOORPLAN_TILE_SIZE", "256"))
+FLOORPLAN_PREVIEW_MAX_PX = int(os.getenv("FLOORPLAN_PREVIEW_MAX_PX", "1600"))
+FLOORPLAN_WEBP_QUALITY = int(os.getenv("FLOORPLAN_WEBP_QUALITY", "80"))
+# Résolution de rastérisation des plans PDF (première page seulement)
+FLOORPLAN_PDF_DPI = int(os.getenv("FLOORPLAN_PDF_DPI", "150"))
+# Plans traités en parallèle par process, et envois de tuiles simultanés par plan
+FLOORPLAN_TILE_WORKERS = int(os.getenv("FLOORPLAN_TILE_WORKERS", "1"))
+FLOORPLAN_TILE_UPLOADS = int(os.getenv("FLOORPLAN_TILE_UPLOADS", "8"))
+
+RASTER_EXTENSIONS = {"pdf", "png", "jpg", "jpeg"}
+
+_tile_pool = None
+_tile_pool_lock = threading.Lock()
+
+
+def plan_prefix(plan):
+    return f"floorplans/{plan['clientId']}/{plan['_id']}"
+
+
+def rasterize(path, ext):
+    """
+    Image PIL (RGB) du plan : première page pour un PDF, image telle quelle sinon.
+    :return: L'image, ou None si le format n'est pas rastérisable (Word).
+    """
+    if ext == "pdf":
+        from pdf2image import convert_from_path
+        pages = convert_from_path(path, dpi=FLOORPLAN_PDF_DPI, first_page=1, last_page=1)
+        return pages[0].convert("RGB") if pages else None
+    if ext in RASTER_EXTENSIONS:
+        with Image.open(path) as img:
+            return img.convert("RGB")
+    return None
+
+
+def _webp(image):
+    buffer = BytesIO()
+    image.save(buffer, format="WEBP", quality=FLOORPLAN_WEBP_QUALITY, method=4)
+    return buffer.getvalue()
+
+
+def pyramid_levels(width, height, tile_size=FLOORPLAN_TILE_SIZE):
+    """(minLevel, maxLevel) de la pyramide d'une image width x height."""
+    max_level = math.ceil(math.log2(max(width, height, 1)))
+    return max_level - max(0, math.ceil(math.log2(max(width, height) / tile_size))), max_level
+
+
+def iter_tiles(image, tile_size=FLOORPLAN_TILE_SIZE):
+    """
+    Découpe l'image en pyramide : (niveau, colonne, ligne, tuile), du niveau pleine
+    résolution au niveau où l'image tient dans une tuile. Chaque niveau est obtenu en
+    réduisant le précédent de moitié.
+    """
+    min_level, max_level = pyramid_levels(*image.size, tile_size)
+    level_image = image
+    for level in range(max_level, min_level - 1, -1):
+        w, h = level_image.size
+        for row in range(math.ceil(h / tile_size)):
+            for col in range(math.ceil(w / tile_size)):
+                box = (col * tile_size, row * tile_size, min((col + 1) * tile_size, w), min((row + 1) * tile_size, h))
+                yield level, col, row, level_image.crop(box)
+        if level > min_level:
+            level_image = level_image.resize((max(1, math.ceil(w / 2)), max(1, math.ceil(h / 2))), Image.LANCZOS)
+
+
+def build_tiles(plan, image):
+    """
+    Envoie l'aperçu et toutes les tuiles du plan dans MinIO.
+    :return: Champs "preview*" / "tiles" à enregistrer sur le plan.
+    """
+    prefix = plan_prefix(plan)
+    width, height = image.size
+
+    preview = image.copy()
+    preview.thumbnail((FLOORPLAN_PREVIEW_MAX_PX, FLOORPLAN_PREVIEW_MAX_PX), Image.LANCZOS)
+    preview_path = f"{prefix}/preview.webp"
+    storage.put_bytes(preview_path, _webp(preview), "image/webp")
+
+    # Encodage ici, envois en parallèle (le client MinIO est partagé entre threads)
+    with ThreadPoolExecutor(max_workers=FLOORPLAN_TILE_UPLOADS) as uploads:
+        futures = [
+            uploads.submit(storage.put_bytes, f"{prefix}/tiles/{level}/{col}_{row}.webp", _webp(tile), "image/webp")
+            for level, col, row, tile in iter_tiles(image)
+        ]
+        for future in futures:
+            future.result()
+
+    min_level, max_level = pyramid_levels(width, height)
+    return {
+        "previewPath": preview_path,
+        "previewWidth": preview.width,
+        "previewHeight": preview.height,
+        "tiles": {
+            "prefix": f"{prefix}/tiles",
+            "width": width,
+            "height": height,
+            "tileSize": FLOORPLAN_TILE_SIZE,
+            "minLevel": min_level,
+            "maxLevel": max_level,
+            "format": "webp",
+        },
+    }
+
+
+def generate_floorplan_tiles(db, plan_id, source_path=None):
+    """
+    Rastérise un plan et génère son aperçu et ses tuiles (statut dans floorPlans.tilesStatus).
+    :param source_path: Fichier local du plan, supprimé à la fin ; s'il est absent, l'objet est téléchargé.
+    :return: Statut final ("done", "unsupported", "error").
+    """
+    work_dir = tempfile.mkdtemp(prefix="ahc_floorplan_")
+    try:
+        plan = db.floorPlans.find_one({"_id": ObjectId(plan_id)})
+        if not plan or not plan.get("imagePath"):
+            return "error"
+        ext = (plan.get("fileName") or plan["imagePath"]).rsplit(".", 1)[-1].lower()
+        if ext not in RASTER_EXTENSIONS:
+            db.floorPlans.update_one({"_id": plan["_id"]}, {"$set": {"tilesStatus": "unsupported"}})
+            return "unsupported"
+
+        db.floorPlans.update_one({"_id": plan["_id"]}, {"$set": {"tilesStatus": "processing"}})
+        if not source_path:
+            source_path = os.path.join(work_dir, f"source.{ext}")
+            storage.download_file(plan["imagePath"], source_path)
+
+        image = rasterize(source_path, ext)
+        fields = build_tiles(plan, image)
+        fields.update({"tilesStatus": "done", "tilesGeneratedAt": datetime.now()})
+        db.floorPlans.update_one({"_id": plan["_id"]}, {"$set": fields, "$unset": {"tilesError": ""}})
+        return "done"
+    except Exception as e:
+        print(f"Erreur génération des tuiles du plan {plan_id} :", e)
+        db.floorPlans.update_one(
+            {"_id": ObjectId(plan_id)}, {"$set": {"tilesStatus": "error", "tilesError": str(e)}}
+        )
+        return "error"
+    finally:
+        if source_path and os.path.exists(source_path):
+            os.remove(source_path)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _get_tile_pool():
+    global _tile_pool
+    with _tile_pool_lock:
+        if _tile_pool is None:
+            _tile_pool = ThreadPoolExecutor(max_workers=FLOORPLAN_TILE_WORKERS, thread_name_prefix="floorplan-tiles")
+        return _tile_pool
+
+
+def schedule_floorplan_tiles(db, plan_id, source_path=None):
+    """Lance la génération en arrière-plan ; le plan passe en tilesStatus "pending"."""
+    db.floorPlans.update_one({"_id": ObjectId(plan_id)}, {"$set": {"tilesStatus": "pending"}})
+    return _get_tile_pool().submit(generate_floorplan_tiles, db, plan_id, source_path)
@@ -0,0 +1,138 @@
+"""
+Registre des index MongoDB de l'application.
+
+Chaque requête fréquente (rendu des pages, connexion, tri des scans, pipeline d'ingestion)
+doit avoir son index déclaré ici. ensure_indexes les crée de façon idempotente au démarrage
+ou via `python manage.py indexes --apply` ; index_report compare le registre aux index
+réellement présents et à leur utilisation ($indexStats).
+"""
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+INDEXES = {
+    # Connexion des utilisateurs internes et des utilisateurs du portail client
+    "userInternet": [
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+    ],
+    "clientUsers": [
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+        IndexModel([("clientId", ASCENDING)], name="clientId"),
+    ],
+    "clients": [
+        # Recherche par préfixes de mots (models/client_search.py) : index multiclé,
+        # suivi de _id pour paginer les résultats par curseur (models/pagination.py)
+        IndexModel([("searchKeys", ASCENDING), ("_id", ASCENDING)], name="searchKeys_id"),
+        # Autocomplétion : numéro de contrat / entité saisi en entier
+        IndexModel([("contractNumber", ASCENDING)], name="contractNumber"),
+        IndexModel([("entity", ASCENDING)], name="entity"),
+    ],
+    # Liste des clients (models/client_summary.py) : recherche et filtre "avec / sans documents",
+    # paginés par curseur sur _id
+    "clientSummaries": [
+        IndexModel([("searchKeys", ASCENDING), ("_id", ASCENDING)], name="searchKeys_id"),
+        IndexModel([("documentCount", ASCENDING), ("_id", ASCENDING)], name="documentCount_id"),
+    ],
+    "clientDocuments": [
+        # Onglet documents / portail client : documents d'un client, par date
+        IndexModel([("clientId", ASCENDING), ("uploadDate", ASCENDING)], name="clientId_uploadDate"),
+        # Tri des scans non assignés, du plus ancien au plus récent
+        IndexModel([("status", ASCENDING), ("uploadDate", ASCENDING)], name="status_uploadDate"),
+        # Déduplication par empreinte SHA-256 (le plus ancien document d'abord)
+        IndexModel([("contentHash", ASCENDING), ("uploadDate", ASCENDING)], name="contentHash_uploadDate"),
+        # Lot déjà reçu (ingest_batch)
+        IndexModel([("batchHash", ASCENDING)], name="batchHash", sparse=True),
+        # Objet MinIO encore référencé par un autre document (mode "link", suppression, assignation)
+        IndexModel([("filePath", ASCENDING)], name="filePath"),
+        IndexModel([("objectPath", ASCENDING)], name="objectPath", sparse=True),
+        # Vignette encore utilisée par un autre document
+        IndexModel([("thumbnailPath", ASCENDING)], name="thumbnailPath", sparse=True),
+    ],
+    "floorPlans": [
+        IndexModel([("clientId", ASCENDING), ("uploadDate", ASCENDING)], name="clientId_uploadDate"),
+    ],
+    "traps": [
+        IndexModel([("planId", ASCENDING)], name="planId"),
+    ],
+    "interventions": [
+        IndexModel([("clientId", ASCENDING), ("date", ASCENDING)], name="clientId_date"),
+    ],
+    # Cache OCR/QR : éviction des entrées les moins récemment utilisées
+    "ocrCache": [
+        IndexModel([("lastUsed", ASCENDING)], name="lastUsed"),
+    ],
+    # File des jobs d'ingestion : réservation du plus ancien job en attente
+    "ingestJobs": [
+        IndexModel([("status", ASCENDING), ("createdAt", ASCENDING)], name="status_createdAt"),
+    ],
+    # Uploads reprenables : purge des sessions abandonnées
+    "uploadSessions": [
+        IndexModel([("expiresAt", ASCENDING)], name="expiresAt"),
+    ],
+    # Index des objets du bucket : tailles par client
+    "storageObjects": [
+        IndexModel([("clientId", ASCENDING), ("top", ASCENDING)], name="clientId_top"),
+    ],
+}
+
+# Index remplacés par une version du registre (supprimés par ensure_indexes(drop_replaced=True))
+REPLACED_INDEXES = {
+    "clients": ["searchKeys"],
+    "clientDocuments": ["contentHash"],
+}
+
+
+def ensure_indexes(db, drop_replaced=False):
+    """
+    Crée les index déclarés (sans effet s'ils existent déjà à l'identique).
+    Un index en conflit (même nom, autre définition ; doublons sur un index unique)
+    est signalé sans empêcher la création des autres.
+    :param drop_replaced: Supprime aussi les index listés dans REPLACED_INDEXES.
+    :return: {collection: [noms créés ou confirmés]} et la liste des erreurs.
+    """
+    applied, errors = {}, []
+    for collection, models in INDEXES.items():
+        applied[collection] = []
+        for model in models:
+            name = model.document["name"]
+            try:
+                db[collection].create_indexes([model])
+                applied[collection].append(name)
+            except OperationFailure as e:
+                errors.append({"collection": collection, "index": name, "error": str(e)})
+                print(f"Index {collection}.{name} non créé :", e)
+
+    if drop_replaced:
+        for collection, names in REPLACED_INDEXES.items():
+            existing = db[collection].index_information()
+            for name in names:
+                if name in existing:
+                    db[collection].drop_index(name)
+    return applied, errors
+
+
+def index_report(db):
+    """
+    Compare le registre aux index présents et à leur utilisation depuis le dernier
+    redémarrage du serveur MongoDB ($indexStats).
+    :return: Liste de lignes {collection, index, declared, present, ops, since}.
+    """
+    rows = []
+    for collection in sorted(set(INDEXES) | set(db.list_collection_names())):
+        declared = {model.document["name"] for model in INDEXES.get(collection, [])}
+        try:
+            stats = {s["name"]: s for s in db[collection].aggregate([{"$indexStats": {}}])}
+        except OperationFailure:
+            stats = {}
+        for name in sorted(declared | set(stats)):
+            if name == "_id_":
+                continue
+            usage = stats.get(name, {}).get("accesses", {})
+            rows.append({
+                "collection": collection,
+                "index": name,
+                "declared": name in declared,
+                "present": name in stats,
+                "ops": usage.get("ops"),
+                "since": usage.get("since"),
+            })
+    return rows
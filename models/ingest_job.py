@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+
+# Étapes possibles d'un fichier dans un job d'ingestion
+FILE_STATUSES = ("queued", "rasterized", "ocr", "stored", "duplicate", "error")
+
+
+class IngestJobQueue:
+    def __init__(self, db):
+        """
+        File d'attente des lots d'ingestion, stockée dans la collection ingestJobs.
+        Fonctionne avec un simple mongod local (aucun broker externe).
+        :param db: Instance de la base de données MongoDB.
+        """
+        self.db = db
+        self.collection = db.ingestJobs
+
+    def create_job(self, files, spool_dir, created_by):
+        """
+        Crée un job à partir de fichiers déjà spoolés sur disque.
+        :param files: Liste de dicts {"file": nom, "spoolPath": chemin ou None, "contentHash": sha256,
+                      "status": ..., "result": ...}
+        :param spool_dir: Répertoire du spool, supprimé à la fin du job.
+        :param created_by: Utilisateur à l'origine de l'envoi.
+        :return: ID du job créé.
+        """
+        job = {
+            "status": "queued",
+            "spoolDir": spool_dir,
+            "files": [
+                {
+                    "file": f["file"],
+                    "spoolPath": f.get("spoolPath"),
+                    "contentHash": f.get("contentHash"),
+                    "status": f.get("status", "queued"),
+                    "result": f.get("result"),
+                }
+                for f in files
+            ],
+            "createdBy": created_by,
+            "createdAt": datetime.now(),
+            "startedAt": None,
+            "finishedAt": None,
+            "lockedAt": None,
+            "workerId": None,
+        }
+        return self.collection.insert_one(job).inserted_id
+
+    def claim_next(self, worker_id, stale_after=timedelta(minutes=10)):
+        """
+        Réserve atomiquement le job le plus ancien en attente.
+        Un job "running" dont le worker ne donne plus signe de vie depuis stale_after est repris.
+        :return: Le job réservé ou None.
+        """
+        now = datetime.now()
+        return self.collection.find_one_and_update(
+            {"$or": [
+                {"status": "queued"},
+                {"status": "running", "lockedAt": {"$lt": now - stale_after}},
+            ]},
+            {"$set": {"status": "running", "lockedAt": now, "workerId": worker_id, "startedAt": now}},
+            sort=[("createdAt", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def _owned(self, job_id, worker_id):
+        """Filtre d'un job, limité au worker qui le détient quand worker_id est donné."""
+        query = {"_id": ObjectId(job_id)}
+        if worker_id is not None:
+            query["workerId"] = worker_id
+        return query
+
+    def heartbeat(self, job_id, worker_id):
+        """
+        Rafraîchit le verrou d'un job en cours, pour qu'il ne soit pas repris pendant une longue analyse.
+        :return: False si le job n'appartient plus à ce worker (repris ou terminé).
+        """
+        result = self.collection.update_one(
+            {**self._owned(job_id, worker_id), "status": "running"},
+            {"$set": {"lockedAt": datetime.now()}},
+        )
+        return result.matched_count > 0
+
+    def set_file_status(self, job_id, index, status, result=None, worker_id=None):
+        """
+        Met à jour l'étape d'un fichier du job (et rafraîchit le verrou du worker).
+        :param worker_id: N'écrit que si le job appartient toujours à ce worker.
+        :return: False si rien n'a été écrit (job repris par un autre worker).
+        """
+        update = {f"files.{index}.status": status, "lockedAt": datetime.now()}
+        if result is not None:
+            update[f"files.{index}.result"] = result
+        return self.collection.update_one(self._owned(job_id, worker_id), {"$set": update}).matched_count > 0
+
+    def finish(self, job_id, status="done", worker_id=None):
+        """
+        Marque le job comme terminé.
+        :param worker_id: Ne termine le job que s'il appartient toujours à ce worker.
+        :return: False si le job n'a pas été trouvé (ou appartient à un autre worker).
+        """
+        result = self.collection.update_one(
+            self._owned(job_id, worker_id),
+            {"$set": {"status": status, "finishedAt": datetime.now(), "lockedAt": None}}
+        )
+        return result.matched_count > 0
+
+    def get_job(self, job_id):
+        """Récupère un job par son ID."""
+        return self.collection.find_one({"_id": ObjectId(job_id)})
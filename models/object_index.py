@@ -0,0 +1,142 @@
+import re
+from datetime import datetime
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+
+# Préfixes de premier niveau dont le deuxième segment est l'ID du client
+# (documents/<client>/..., floorplans/<client>/..., qrcodes/<client>/...)
+CLIENT_SCOPED_PREFIXES = ("documents", "floorplans", "qrcodes")
+# Taille des lots d'écriture lors d'une réindexation complète
+REINDEX_BATCH_SIZE = 1000
+
+
+def client_id_for_key(key: str) -> str | None:
+    """
+    ID du client propriétaire d'un objet, déduit de sa clé.
+    Les anciens documents sont rangés directement sous <client_id>/.
+    """
+    parts = key.split("/")
+    if len(parts) > 2 and parts[0] in CLIENT_SCOPED_PREFIXES and ObjectId.is_valid(parts[1]):
+        return parts[1]
+    if len(parts) > 1 and ObjectId.is_valid(parts[0]):
+        return parts[0]
+    return None
+
+
+class StorageObjectIndex:
+    def __init__(self, db):
+        """
+        Index côté MongoDB des objets du bucket (collection storageObjects, _id = clé de l'objet).
+        Tenu à jour à chaque écriture / suppression faite par models/storage.py, il évite de
+        parcourir le bucket pour connaître la taille occupée par un client ou un préfixe.
+        :param db: Instance de la base de données MongoDB.
+        """
+        self.db = db
+        self.collection = db.storageObjects
+
+    @staticmethod
+    def _entry(key, size, last_modified=None, etag=None):
+        return {
+            "size": size,
+            "top": key.split("/", 1)[0],
+            "clientId": client_id_for_key(key),
+            "lastModified": last_modified or datetime.now(),
+            "etag": etag,
+            "indexedAt": datetime.now(),
+        }
+
+    def record(self, key, size, last_modified=None, etag=None):
+        """Ajoute ou met à jour un objet."""
+        self.collection.update_one(
+            {"_id": key}, {"$set": self._entry(key, size, last_modified, etag)}, upsert=True
+        )
+
+    def record_copy(self, src_key, dst_key):
+        """
+        Indexe la copie d'un objet avec la taille de la source.
+        :return: False si la source n'est pas indexée (l'appelant doit alors lire la taille lui-même).
+        """
+        src = self.collection.find_one({"_id": src_key}, {"size": 1, "etag": 1})
+        if not src:
+            return False
+        self.record(dst_key, src["size"], etag=src.get("etag"))
+        return True
+
+    def remove(self, keys):
+        """Retire un ou plusieurs objets de l'index."""
+        keys = [keys] if isinstance(keys, str) else list(keys)
+        if keys:
+            self.collection.delete_many({"_id": {"$in": keys}})
+
+    def client_usage(self, client_id):
+        """Nombre d'objets et taille totale (octets) des objets d'un client."""
+        rows = list(self.collection.aggregate([
+            {"$match": {"clientId": str(client_id)}},
+            {"$group": {"_id": "$top", "count": {"$sum": 1}, "size": {"$sum": "$size"}}},
+        ]))
+        return {
+            "clientId": str(client_id),
+            "count": sum(row["count"] for row in rows),
+            "size": sum(row["size"] for row in rows),
+            "byPrefix": {row["_id"]: {"count": row["count"], "size": row["size"]} for row in rows},
+        }
+
+    def prefix_totals(self, prefix="", names=None):
+        """
+        Totaux (nombre, taille) des sous-dossiers directs d'un préfixe.
+        La recherche par préfixe ancré sur _id utilise l'index de la clé primaire.
+        :param prefix: Préfixe parent ("" pour la racine, sinon terminé par "/").
+        :param names: Si fourni, ne calcule que ces sous-dossiers (ex. ceux de la page affichée).
+        :return: {sous-dossier: {"count": n, "size": octets}}
+        """
+        if names is not None:
+            if not names:
+                return {}
+            match = {"$or": [{"_id": {"$regex": "^" + re.escape(prefix + name + "/")}} for name in names]}
+        elif prefix:
+            match = {"_id": {"$regex": "^" + re.escape(prefix)}}
+        else:
+            match = {}
+        rows = self.collection.aggregate([
+            {"$match": match},
+            {"$project": {
+                "size": 1,
+                "child": {"$arrayElemAt": [
+                    {"$split": [{"$substrCP": ["$_id", len(prefix), {"$strLenCP": "$_id"}]}, "/"]}, 0
+                ]},
+            }},
+            {"$group": {"_id": "$child", "count": {"$sum": 1}, "size": {"$sum": "$size"}}},
+        ])
+        return {row["_id"]: {"count": row["count"], "size": row["size"]} for row in rows}
+
+    def reindex(self, objects, prefix=""):
+        """
+        Reconstruit l'index à partir d'un parcours du bucket (ou d'un préfixe) :
+        les objets listés sont (ré)indexés, les entrées absentes du parcours sont supprimées.
+        :param objects: Itérable d'objets minio (object_name, size, last_modified, etag).
+        :return: {"indexed": n, "removed": n}
+        """
+        run_id = ObjectId()
+        started = datetime.now()
+        indexed = 0
+        batch = []
+        for obj in objects:
+            if obj.is_dir:
+                continue
+            entry = self._entry(obj.object_name, obj.size, obj.last_modified, obj.etag)
+            entry["reindexRun"] = run_id
+            batch.append(UpdateOne({"_id": obj.object_name}, {"$set": entry}, upsert=True))
+            if len(batch) >= REINDEX_BATCH_SIZE:
+                self.collection.bulk_write(batch, ordered=False)
+                indexed += len(batch)
+                batch = []
+        if batch:
+            self.collection.bulk_write(batch, ordered=False)
+            indexed += len(batch)
+
+        # Les objets écrits pendant le parcours (indexedAt récent) sont conservés
+        stale = {"reindexRun": {"$ne": run_id}, "indexedAt": {"$lt": started}}
+        if prefix:
+            stale["_id"] = {"$regex": "^" + re.escape(prefix)}
+        removed = self.collection.delete_many(stale).deleted_count
+        return {"indexed": indexed, "removed": removed}
@@ -0,0 +1,72 @@
+import os
+from datetime import datetime
+
+# Nombre maximal de résultats conservés (les moins récemment utilisés sont évincés)
+OCR_CACHE_MAX_ENTRIES = int(os.getenv("OCR_CACHE_MAX_ENTRIES", "50000"))
+
+
+class OcrResultCache:
+    def __init__(self, db, max_entries=OCR_CACHE_MAX_ENTRIES):
+        """
+        Cache persistant des résultats d'analyse QR / OCR, stocké dans la collection ocrCache.
+        Clé : empreinte SHA-256 du PDF + version du pipeline d'analyse.
+        Changer la version invalide donc tout le cache sans rien supprimer.
+        :param db: Instance de la base de données MongoDB.
+        :param max_entries: Taille maximale du cache.
+        """
+        self.db = db
+        self.collection = db.ocrCache
+        self.max_entries = max_entries
+
+    @staticmethod
+    def _key(content_hash, pipeline_version):
+        return f"{pipeline_version}:{content_hash}"
+
+    def get(self, content_hash, pipeline_version):
+        """
+        Retourne le résultat mis en cache (et le marque comme utilisé), ou None.
+        Une erreur Mongo n'empêche jamais l'analyse : elle est traitée comme un défaut de cache.
+        """
+        if not content_hash:
+            return None
+        try:
+            entry = self.collection.find_one_and_update(
+                {"_id": self._key(content_hash, pipeline_version)},
+                {"$set": {"lastUsed": datetime.now()}, "$inc": {"hits": 1}},
+            )
+        except Exception as e:
+            print("Erreur lecture cache OCR :", e)
+            return None
+        return entry["result"] if entry else None
+
+    def put(self, content_hash, pipeline_version, result):
+        """Enregistre un résultat d'analyse puis applique la limite de taille."""
+        if not content_hash:
+            return
+        now = datetime.now()
+        try:
+            self.collection.update_one(
+                {"_id": self._key(content_hash, pipeline_version)},
+                {
+                    "$set": {
+                        "contentHash": content_hash,
+                        "pipelineVersion": pipeline_version,
+                        "result": result,
+                        "lastUsed": now,
+                    },
+                    "$setOnInsert": {"createdAt": now, "hits": 0},
+                },
+                upsert=True,
+            )
+            self.evict()
+        except Exception as e:
+            print("Erreur écriture cache OCR :", e)
+
+    def evict(self):
+        """Supprime les entrées les moins récemment utilisées au-delà de max_entries."""
+        excess = self.collection.estimated_document_count() - self.max_entries
+        if excess <= 0:
+            return 0
+        oldest = self.collection.find({}, {"_id": 1}).sort("lastUsed", 1).limit(excess)
+        ids = [entry["_id"] for entry in oldest]
+        return self.collection.delete_many({"_id": {"$in": ids}}).deleted_count
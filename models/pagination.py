@@ -0,0 +1,110 @@
+"""
+Pagination par curseur (keyset) et cache des totaux des listes.
+
+Une page est lue à partir du dernier _id de la page précédente ({"_id": {"$gt": ...}}),
+via l'index : son coût ne dépend ni du numéro de page ni de la taille de la collection,
+contrairement à skip(). Le navigateur ne manipule que des jetons opaques (base64 URL)
+"suivant" / "précédent".
+"""
+import base64
+import json
+import os
+import threading
+import time
+
+from bson.objectid import ObjectId
+
+# Durée de validité d'un total filtré (recherche) gardé en mémoire
+COUNT_CACHE_TTL = float(os.getenv("COUNT_CACHE_TTL", "30"))
+COUNT_CACHE_MAX_ENTRIES = int(os.getenv("COUNT_CACHE_MAX_ENTRIES", "1000"))
+
+
+def encode_cursor(direction, anchor_id, page):
+    """Jeton opaque : sens ("next" / "prev"), _id d'ancrage et numéro de la page visée (affichage)."""
+    payload = json.dumps({"d": direction, "id": str(anchor_id), "p": page}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """
+    :return: (direction, ObjectId, page), ou None si le jeton est absent ou invalide (retour à la 1ère page).
+    """
+    if not token:
+        return None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        if payload["d"] not in ("next", "prev") or not ObjectId.is_valid(payload["id"]):
+            return None
+        return payload["d"], ObjectId(payload["id"]), max(1, int(payload["p"]))
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def keyset_page(collection, query, projection, token, per_page):
+    """
+    Lit une page triée par _id à partir d'un jeton de curseur.
+    Un élément de plus que la page est demandé pour savoir s'il en reste au-delà.
+    :return: {"items", "page", "next", "prev"} ; next / prev valent None en bout de liste.
+    """
+    cursor = decode_cursor(token)
+    direction, anchor, page = cursor if cursor else ("next", None, 1)
+
+    if anchor is None:
+        page_query, sort = query, 1
+    elif direction == "next":
+        page_query, sort = {"$and": [query, {"_id": {"$gt": anchor}}]} if query else {"_id": {"$gt": anchor}}, 1
+    else:
+        page_query, sort = {"$and": [query, {"_id": {"$lt": anchor}}]} if query else {"_id": {"$lt": anchor}}, -1
+
+    items = list(collection.find(page_query, projection).sort("_id", sort).limit(per_page + 1))
+    has_more = len(items) > per_page
+    items = items[:per_page]
+    if sort == -1:
+        items.reverse()
+
+    if direction == "next":
+        has_next, has_prev = has_more, anchor is not None
+    else:
+        # Revenu en arrière depuis une page existante : il y a forcément une page suivante
+        has_next, has_prev = True, has_more
+    # Page 1 atteinte en reculant (suppressions entre-temps) : pas de lien "précédent"
+    has_prev = has_prev and page > 1
+
+    return {
+        "items": items,
+        "page": page,
+        "next": encode_cursor("next", items[-1]["_id"], page + 1) if has_next and items else None,
+        "prev": encode_cursor("prev", items[0]["_id"], page - 1) if has_prev and items else None,
+    }
+
+
+class CountCache:
+    def __init__(self, ttl=COUNT_CACHE_TTL, max_entries=COUNT_CACHE_MAX_ENTRIES):
+        """
+        Totaux des listes : estimated_document_count (métadonnées de la collection) sans filtre,
+        count_documents gardé ttl secondes en mémoire du process pour une recherche.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}  # (collection, filtre) -> (total, expiresAt)
+        self._lock = threading.Lock()
+
+    def count(self, collection, query):
+        if not query:
+            return collection.estimated_document_count()
+
+        key = (collection.full_name, json.dumps(query, sort_keys=True, default=str))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > now:
+                return entry[0]
+
+        total = collection.count_documents(query)
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries = {k: v for k, v in self._entries.items() if v[1] > now}
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+            self._entries[key] = (total, now + self.ttl)
+        return total
@@ -0,0 +1,130 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Nombre maximal d'URL gardées en mémoire par process (les moins récemment utilisées sont évincées)
+PRESIGN_CACHE_MAX_ENTRIES = int(os.getenv("PRESIGN_CACHE_MAX_ENTRIES", "10000"))
+# Une URL n'est redonnée que s'il lui reste au moins cette fraction de sa durée de validité
+PRESIGN_CACHE_MIN_REMAINING = float(os.getenv("PRESIGN_CACHE_MIN_REMAINING", "0.5"))
+# Fichier SQLite partagé entre les workers gunicorn d'une même machine (vide : cache par process seulement)
+PRESIGN_CACHE_SQLITE = os.getenv("PRESIGN_CACHE_SQLITE", "")
+
+
+class PresignedUrlCache:
+    def __init__(self, max_entries=PRESIGN_CACHE_MAX_ENTRIES, min_remaining=PRESIGN_CACHE_MIN_REMAINING,
+                 sqlite_path=PRESIGN_CACHE_SQLITE):
+        """
+        Cache d'URL signées, clé (objet, nom de téléchargement, classe d'expiration).
+        Une URL est réutilisée tant qu'il lui reste min_remaining de sa durée de vie :
+        la personne qui clique dispose donc toujours d'une marge de validité.
+        Niveau 1 : LRU en mémoire du process. Niveau 2 (optionnel) : fichier SQLite
+        partagé entre les process de la machine.
+        :param max_entries: Taille maximale de chaque niveau.
+        :param min_remaining: Fraction de validité restante exigée (0 à 1).
+        :param sqlite_path: Chemin du cache partagé, ou "" pour s'en passer.
+        """
+        self.max_entries = max_entries
+        self.min_remaining = min_remaining
+        self.sqlite_path = sqlite_path
+        self._entries = OrderedDict()  # clé -> (url, expiresAt en secondes epoch)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats = {"hits": 0, "sharedHits": 0, "misses": 0, "evictions": 0}
+
+    def _usable(self, expires_at, lifetime):
+        return expires_at - time.time() >= lifetime * self.min_remaining
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    # ----- Cache partagé SQLite -----
+    def _db(self):
+        """Connexion SQLite du thread courant (une connexion ne se partage pas entre threads ni après un fork)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.sqlite_path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS presigned ("
+                "key TEXT PRIMARY KEY, url TEXT NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS presigned_last_used ON presigned (last_used)")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _shared_get(self, key):
+        try:
+            conn = self._db()
+            row = conn.execute("SELECT url, expires_at FROM presigned WHERE key = ?", (key,)).fetchone()
+            if row:
+                # Une URL lue par un autre process reste « récente » pour l'éviction LRU
+                conn.execute("UPDATE presigned SET last_used = ? WHERE key = ?", (time.time(), key))
+        except sqlite3.Error as e:
+            print("Erreur lecture cache d'URL partagé :", e)
+            return None
+        return row
+
+    def _shared_put(self, key, url, expires_at):
+        try:
+            conn = self._db()
+            conn.execute(
+                "INSERT OR REPLACE INTO presigned (key, url, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, url, expires_at, time.time()),
+            )
+            # Éviction LRU approximative : on ne garde que les max_entries plus récents
+            conn.execute(
+                "DELETE FROM presigned WHERE key IN (SELECT key FROM presigned ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+        except sqlite3.Error as e:
+            print("Erreur écriture cache d'URL partagé :", e)
+
+    # ----- API -----
+    def get_or_sign(self, object_key, download_name, expiry_class, lifetime, sign):
+        """
+        Retourne une URL signée encore suffisamment valide, ou en signe une nouvelle.
+        :param lifetime: Durée de validité de la classe d'expiration, en secondes.
+        :param sign: Fonction sans argument qui produit une nouvelle URL valable lifetime secondes.
+        """
+        key = f"{expiry_class}|{download_name or ''}|{object_key}"
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and self._usable(entry[1], lifetime):
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[0]
+
+        if self.sqlite_path:
+            row = self._shared_get(key)
+            if row and self._usable(row[1], lifetime):
+                self._count("sharedHits")
+                self._remember(key, row[0], row[1])
+                return row[0]
+
+        self._count("misses")
+        expires_at = time.time() + lifetime
+        url = sign()
+        self._remember(key, url, expires_at)
+        if self.sqlite_path:
+            self._shared_put(key, url, expires_at)
+        return url
+
+    def _remember(self, key, url, expires_at):
+        with self._lock:
+            self._entries[key] = (url, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def stats(self):
+        """Compteurs du process courant et taux de succès (hits mémoire + partagés)."""
+        with self._lock:
+            stats = dict(self._stats, entries=len(self._entries), pid=os.getpid())
+        lookups = stats["hits"] + stats["sharedHits"] + stats["misses"]
+        stats["hitRate"] = round((stats["hits"] + stats["sharedHits"]) / lookups, 4) if lookups else None
+        return stats
@@ -0,0 +1,240 @@
+"""
+Accès au stockage objet MinIO, partagé par tous les modèles et blueprints.
+
+Un seul client par process, construit au premier appel avec un pool de connexions
+urllib3 dimensionné pour les accès concurrents (threads Flask, copies parallèles).
+Le client Minio est thread-safe ; il est recréé après un fork (pool d'analyse).
+Le bucket est vérifié / créé une fois au démarrage (ensure_bucket), jamais par requête.
+Chaque écriture / suppression met à jour l'index storageObjects (attach_object_index),
+qui sert les tailles par client et par préfixe sans parcourir le bucket.
+"""
+import io
+import mimetypes
+import os
+import threading
+from datetime import timedelta
+from urllib.parse import urlparse
+
+import certifi
+import urllib3
+from minio import Minio
+from minio.commonconfig import CopySource
+from minio.deleteobjects import DeleteObject
+
+from models.object_index import StorageObjectIndex
+from models.presign_cache import PresignedUrlCache
+from models.utils.file_utils import UPLOAD_PART_SIZE
+
+ENDPOINT_URL = os.getenv("AWS_ENDPOINT_URL", "http://localhost:9000")
+ACCESS_KEY = os.getenv("AWS_ACCESS_KEY_ID", "")
+SECRET_KEY = os.getenv("AWS_SECRET_ACCESS_KEY", "")
+BUCKET_NAME = os.getenv("AWS_BUCKET_NAME", "client-documents")
+# Région du bucket : si elle est connue, le client n'a pas à la demander au serveur
+REGION = os.getenv("AWS_REGION") or None
+
+# Connexions HTTP gardées ouvertes vers MinIO (par process)
+STORAGE_POOL_SIZE = int(os.getenv("STORAGE_POOL_SIZE", "32"))
+STORAGE_CONNECT_TIMEOUT = float(os.getenv("STORAGE_CONNECT_TIMEOUT", "5"))
+STORAGE_READ_TIMEOUT = float(os.getenv("STORAGE_READ_TIMEOUT", "300"))
+
+# Durée de validité par défaut des URL signées
+PRESIGN_EXPIRES = timedelta(hours=1)
+# Classes d'expiration des URL mises en cache : affichage (aperçus, liens "Voir") et téléchargement
+PRESIGN_EXPIRY_CLASSES = {
+    "view": PRESIGN_EXPIRES,
+    "download": timedelta(minutes=10),
+}
+
+presign_cache = PresignedUrlCache()
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+_object_index = None
+
+
+def _endpoint():
+    """
+    "http(s)://hote:port" ou "hote:port" -> (hote:port, https ?).
+    Sans schéma, http est supposé.
+    """
+    parsed = urlparse(ENDPOINT_URL if "://" in ENDPOINT_URL else f"http://{ENDPOINT_URL}")
+    return parsed.netloc or parsed.path, parsed.scheme == "https"
+
+
+def _http_client():
+    return urllib3.PoolManager(
+        num_pools=4,
+        maxsize=STORAGE_POOL_SIZE,
+        timeout=urllib3.Timeout(connect=STORAGE_CONNECT_TIMEOUT, read=STORAGE_READ_TIMEOUT),
+        cert_reqs="CERT_REQUIRED",
+        ca_certs=os.environ.get("SSL_CERT_FILE") or certifi.where(),
+        retries=urllib3.Retry(total=5, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504]),
+    )
+
+
+def get_client():
+    """Client MinIO du process courant (créé au premier appel)."""
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        with _client_lock:
+            if _client is None or _client_pid != os.getpid():
+                endpoint, secure = _endpoint()
+                _client = Minio(
+                    endpoint,
+                    access_key=ACCESS_KEY,
+                    secret_key=SECRET_KEY,
+                    secure=secure,
+                    region=REGION,
+                    http_client=_http_client(),
+                )
+                _client_pid = os.getpid()
+    return _client
+
+
+def attach_object_index(db):
+    """
+    Active la mise à jour de l'index storageObjects par ce process.
+    À appeler au démarrage de l'application et des scripts qui écrivent dans le bucket.
+    """
+    global _object_index
+    _object_index = StorageObjectIndex(db)
+    return _object_index
+
+
+def get_object_index():
+    """Index storageObjects du process, ou None s'il n'a pas été attaché."""
+    return _object_index
+
+
+def _index_call(method, *args):
+    """Met à jour l'index sans jamais faire échouer l'opération de stockage (un reindex rattrape)."""
+    if _object_index is None:
+        return
+    try:
+        getattr(_object_index, method)(*args)
+    except Exception as e:
+        print(f"Erreur index storageObjects ({method}) :", e)
+
+
+class _CountingReader:
+    """Enveloppe un flux pour compter les octets lus (taille d'un envoi de longueur inconnue)."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.size = 0
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.size += len(data)
+        return data
+
+
+def ensure_bucket():
+    """Crée le bucket s'il n'existe pas. À appeler une fois au démarrage."""
+    client = get_client()
+    if not client.bucket_exists(BUCKET_NAME):
+        client.make_bucket(BUCKET_NAME)
+
+
+def put_stream(key, stream, content_type="application/octet-stream"):
+    """Envoie un flux de taille inconnue, en multipart (mémoire bornée à UPLOAD_PART_SIZE)."""
+    reader = _CountingReader(stream)
+    result = get_client().put_object(
+        BUCKET_NAME, key, reader, length=-1, part_size=UPLOAD_PART_SIZE, content_type=content_type
+    )
+    _index_call("record", key, reader.size, None, result.etag)
+    return result
+
+
+def put_file(key, path, content_type="application/octet-stream"):
+    """Envoie un fichier local sans le charger en mémoire."""
+    with open(path, "rb") as data:
+        return put_stream(key, data, content_type)
+
+
+def put_bytes(key, data, content_type="application/octet-stream"):
+    """Envoie un petit contenu déjà en mémoire (QR code, document généré...)."""
+    result = get_client().put_object(BUCKET_NAME, key, io.BytesIO(data), length=len(data), content_type=content_type)
+    _index_call("record", key, len(data), None, result.etag)
+    return result
+
+
+def get_object(key):
+    """
+    Ouvre un objet en lecture.
+    L'appelant doit fermer la réponse (close() puis release_conn()).
+    """
+    return get_client().get_object(BUCKET_NAME, key)
+
+
+def download_file(key, path):
+    """Télécharge un objet dans un fichier local."""
+    return get_client().fget_object(BUCKET_NAME, key, path)
+
+
+def presign_get(key, expires=PRESIGN_EXPIRES, download_name=None):
+    """
+    URL signée de lecture d'un objet.
+    :param download_name: Si fourni, force le téléchargement sous ce nom (Content-Disposition).
+    """
+    headers = None
+    if download_name:
+        headers = {"response-content-disposition": f'attachment; filename="{download_name}"'}
+        guessed = mimetypes.guess_type(download_name)[0]
+        if guessed:
+            headers["response-content-type"] = guessed
+    return get_client().get_presigned_url(
+        "GET", BUCKET_NAME, key.strip(), expires=expires, response_headers=headers
+    )
+
+
+def presign_cached(key, expiry="view", download_name=None):
+    """
+    Comme presign_get, en réutilisant une URL déjà signée tant qu'il lui reste
+    assez de validité (voir PresignedUrlCache).
+    :param expiry: Classe d'expiration ("view" ou "download").
+    """
+    lifetime = PRESIGN_EXPIRY_CLASSES[expiry]
+    return presign_cache.get_or_sign(
+        key.strip(), download_name, expiry, lifetime.total_seconds(),
+        lambda: presign_get(key, expires=lifetime, download_name=download_name),
+    )
+
+
+def copy(src_key, dst_key):
+    """Copie côté serveur (aucune donnée ne transite par l'application)."""
+    result = get_client().copy_object(BUCKET_NAME, dst_key, CopySource(BUCKET_NAME, src_key))
+    if _object_index is not None:
+        try:
+            if not _object_index.record_copy(src_key, dst_key):
+                # Source absente de l'index (antérieure à celui-ci) : une lecture des métadonnées suffit
+                stat = get_client().stat_object(BUCKET_NAME, dst_key)
+                _object_index.record(dst_key, stat.size, stat.last_modified, stat.etag)
+        except Exception as e:
+            print("Erreur index storageObjects (copy) :", e)
+    return result
+
+
+def delete(key):
+    get_client().remove_object(BUCKET_NAME, key)
+    _index_call("remove", key)
+
+
+def delete_many(keys):
+    """
+    Supprime plusieurs objets en un seul appel.
+    :return: Liste des erreurs (objets non supprimés).
+    """
+    if not keys:
+        return []
+    # remove_objects est paresseux : la suppression n'a lieu qu'en consommant l'itérateur
+    errors = list(get_client().remove_objects(BUCKET_NAME, [DeleteObject(key) for key in keys]))
+    failed = {error.name for error in errors}
+    _index_call("remove", [key for key in keys if key not in failed])
+    return errors
+
+
+def list_objects(prefix=None, recursive=True, start_after=None):
+    """Itérateur paresseux : les pages de 1000 clés ne sont demandées qu'au fil de la consommation."""
+    return get_client().list_objects(BUCKET_NAME, prefix=prefix, recursive=recursive, start_after=start_after)
@@ -0,0 +1,102 @@
+"""
+Vignettes WebP de la 1ère page des documents clients (champ clientDocuments.thumbnailPath).
+
+Les vignettes sont rangées par contenu : thumbnails/<sha256>.webp. Un document
+déplacé (assignation d'un scan) ou lié à un autre client garde donc la même vignette,
+et un même fichier n'en produit qu'une.
+"""
+import os
+from io import BytesIO
+
+from PIL import Image
+
+from models import storage
+
+THUMBNAIL_MAX_PX = int(os.getenv("THUMBNAIL_MAX_PX", "320"))
+THUMBNAIL_WEBP_QUALITY = int(os.getenv("THUMBNAIL_WEBP_QUALITY", "70"))
+# Résolution de rendu quand la page n'a pas déjà été rastérisée (upload manuel, backfill)
+THUMBNAIL_RENDER_DPI = int(os.getenv("THUMBNAIL_RENDER_DPI", "50"))
+
+IMAGE_EXTENSIONS = {"png", "jpg", "jpeg", "webp", "gif", "bmp", "tif", "tiff"}
+
+
+def thumbnail_key(content_hash):
+    return f"thumbnails/{content_hash}.webp"
+
+
+def thumbnail_from_image(image):
+    """Réduit une image PIL (ex. page déjà rendue pour le QR / l'OCR) en vignette WebP."""
+    thumb = image.copy()
+    thumb.thumbnail((THUMBNAIL_MAX_PX, THUMBNAIL_MAX_PX), Image.LANCZOS)
+    if thumb.mode not in ("RGB", "L"):
+        thumb = thumb.convert("RGB")
+    buffer = BytesIO()
+    thumb.save(buffer, format="WEBP", quality=THUMBNAIL_WEBP_QUALITY)
+    return buffer.getvalue()
+
+
+def _extension(filename):
+    return filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+
+
+def thumbnail_supported(filename):
+    """Vrai si une vignette peut être rendue pour ce type de fichier (PDF ou image)."""
+    ext = _extension(filename)
+    return ext == "pdf" or ext in IMAGE_EXTENSIONS
+
+
+def render_thumbnail(path, filename):
+    """
+    Vignette d'un fichier local : 1ère page d'un PDF (rendue directement en petit) ou image.
+    :return: Octets WebP, ou None pour les autres formats.
+    """
+    ext = _extension(filename)
+    if ext == "pdf":
+        from pdf2image import convert_from_path
+        pages = convert_from_path(
+            path, dpi=THUMBNAIL_RENDER_DPI, first_page=1, last_page=1, size=(THUMBNAIL_MAX_PX, None)
+        )
+        return thumbnail_from_image(pages[0]) if pages else None
+    if ext in IMAGE_EXTENSIONS:
+        with Image.open(path) as img:
+            img.draft("RGB", (THUMBNAIL_MAX_PX, THUMBNAIL_MAX_PX))  # décodage JPEG réduit
+            return thumbnail_from_image(img)
+    return None
+
+
+def ensure_thumbnail(db, content_hash, path, filename, data=None, force=False):
+    """
+    Garantit l'existence de la vignette d'un contenu et retourne sa clé.
+    Ne lève jamais d'exception : un document reste utilisable sans vignette.
+    :param data: Vignette déjà calculée (pipeline d'ingestion) ; sinon elle est rendue depuis path.
+    :param force: Régénère la vignette même si un document la référence déjà.
+    :return: Clé de la vignette, ou None (format non pris en charge, erreur).
+    """
+    if not content_hash:
+        return None
+    key = thumbnail_key(content_hash)
+    try:
+        if not force and db.clientDocuments.count_documents(
+                {"contentHash": content_hash, "thumbnailPath": key}, limit=1):
+            return key
+        data = data or render_thumbnail(path, filename)
+        if not data:
+            return None
+        storage.put_bytes(key, data, "image/webp")
+        return key
+    except Exception as e:
+        print(f"Erreur vignette {filename} :", e)
+        return None
+
+
+def release_thumbnail(db, document):
+    """Supprime la vignette d'un document supprimé si plus aucun autre document ne l'utilise."""
+    key = document.get("thumbnailPath")
+    if not key:
+        return
+    if db.clientDocuments.count_documents({"_id": {"$ne": document["_id"]}, "thumbnailPath": key}, limit=1):
+        return
+    try:
+        storage.delete(key)
+    except Exception as e:
+        print(f"Suppression impossible de la vignette {key} :", e)
@@ -1,6 +1,37 @@
 from bson.objectid import ObjectId
 from datetime import datetime
 from zoneinfo import ZoneInfo
+from models.client_summary import record_traps
+
+def normalize_coordinates(coordinates):
+    """
+    Coordonnées d'un piège en pixels entiers, telles qu'enregistrées en base.
+    Les valeurs des formulaires arrivent en texte ; vide ou invalide -> 0.
+    Convertir à l'écriture évite de le refaire à chaque affichage.
+    """
+    if not coordinates:
+        return None
+
+    def to_int(value):
+        try:
+            return int(float(value))
+        except (TypeError, ValueError):
+            return 0
+
+    return {"x": to_int(coordinates.get("x")), "y": to_int(coordinates.get("y"))}
+
+
+def _with_int_coordinates(trap):
+    """
+    Filet de sécurité à la lecture pour les pièges enregistrés avant la conversion à l'écriture
+    (tant que `python manage.py normalize-traps` n'a pas tourné) : sans effet sur des
+    coordonnées déjà entières, seul cas des pièges écrits par add_trap / set_coordinates.
+    """
+    coordinates = trap.get("coordinates")
+    if coordinates and not (isinstance(coordinates.get("x"), int) and isinstance(coordinates.get("y"), int)):
+        trap["coordinates"] = normalize_coordinates(coordinates)
+    return trap
+
 
 class TrapModel:
     def __init__(self, db):
@@ -15,11 +46,13 @@ class TrapModel:
             "type": trap_data.get("type"),
             "label": trap_data.get("label"),
             "location": trap_data.get("location"),
-            "coordinates": trap_data.get("coordinates"),
+            "coordinates": normalize_coordinates(trap_data.get("coordinates")),
             "barcode": trap_data.get("barcode"),
             "dateAdded": datetime.now(ZoneInfo("Europe/Paris"))
         }
-        return self.db.traps.insert_one(trap)
+        result = self.db.traps.insert_one(trap)
+        record_traps(self.db, plan_id)
+        return result
 
     def get_traps_by_plan(self, plan_id):
         """
@@ -27,10 +60,33 @@ class TrapModel:
         :param plan_id: ID du plan d'étage.
         :return: Liste des pièges associés.
         """
-        return list(self.db.traps.find({"planId": ObjectId(plan_id)}))
+        return [_with_int_coordinates(trap) for trap in self.db.traps.find({"planId": ObjectId(plan_id)})]
+
+    def get_traps_by_plans(self, plan_ids):
+        """
+        Récupère les pièges de plusieurs plans en une seule requête ($in sur planId).
+        :param plan_ids: IDs (ObjectId) des plans d'étage.
+        :return: {planId: [pièges]} ; chaque plan demandé a une entrée, éventuellement vide.
+        """
+        traps_by_plan = {plan_id: [] for plan_id in plan_ids}
+        if plan_ids:
+            for trap in self.db.traps.find({"planId": {"$in": list(plan_ids)}}):
+                traps_by_plan.setdefault(trap["planId"], []).append(_with_int_coordinates(trap))
+        return traps_by_plan
+
+    def set_coordinates(self, trap_id, x, y):
+        """Enregistre l'emplacement d'un piège sur son plan (pixels affichés)."""
+        return self.db.traps.update_one(
+            {"_id": ObjectId(trap_id)},
+            {"$set": {"coordinates": normalize_coordinates({"x": x, "y": y})}}
+        )
 
     def delete_trap(self, trap_id):
         """
         Supprime un piège par son ID.
         """
-        return self.db.traps.delete_one({"_id": ObjectId(trap_id)})
\ No newline at end of file
+        trap = self.db.traps.find_one({"_id": ObjectId(trap_id)}, {"planId": 1})
+        result = self.db.traps.delete_one({"_id": ObjectId(trap_id)})
+        if trap and result.deleted_count:
+            record_traps(self.db, trap["planId"], -1)
+        return result
\ No newline at end of file
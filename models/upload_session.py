@@ -0,0 +1,127 @@
+import os
+from datetime import datetime, timedelta
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+
+# Destinations possibles d'un upload reprenable une fois finalisé
+UPLOAD_TARGETS = ("ingest", "batch", "document")
+
+
+class UploadSessionStore:
+    def __init__(self, db, upload_dir, ttl=timedelta(hours=24)):
+        """
+        Sessions d'upload reprenable (dans l'esprit de tus), stockées dans la collection uploadSessions.
+        Les octets reçus sont ajoutés à un fichier local par session ; seul l'offset
+        confirmé en base fait foi pour reprendre un envoi interrompu.
+        :param db: Instance de la base de données MongoDB.
+        :param upload_dir: Répertoire des fichiers en cours de réception.
+        :param ttl: Durée de vie d'une session sans activité.
+        """
+        self.db = db
+        self.collection = db.uploadSessions
+        self.upload_dir = upload_dir
+        self.ttl = ttl
+
+    def create(self, file_name, length, target, created_by, metadata=None):
+        """
+        Ouvre une session et crée son fichier de réception vide.
+        :param length: Taille totale annoncée, en octets.
+        :param target: "ingest", "batch" ou "document" (pipeline appelé à la finalisation).
+        :param metadata: Paramètres de la destination (clientId, documentType, dedupMode...).
+        :return: La session créée.
+        """
+        os.makedirs(self.upload_dir, exist_ok=True)
+        now = datetime.now()
+        session_id = ObjectId()
+        upload = {
+            "_id": session_id,
+            "fileName": file_name,
+            "length": length,
+            "offset": 0,
+            "target": target,
+            "metadata": metadata or {},
+            "path": os.path.join(self.upload_dir, f"{session_id}.part"),
+            "status": "open",
+            "result": None,
+            "writeToken": None,
+            "writeLockedAt": None,
+            "createdBy": created_by,
+            "createdAt": now,
+            "updatedAt": now,
+            "expiresAt": now + self.ttl,
+        }
+        open(upload["path"], "wb").close()
+        self.collection.insert_one(upload)
+        return upload
+
+    def get(self, upload_id):
+        """Récupère une session par son ID."""
+        return self.collection.find_one({"_id": ObjectId(upload_id)})
+
+    def begin_write(self, upload_id, offset, token, stale_after=timedelta(minutes=5)):
+        """
+        Réserve la session pour écrire à partir de offset.
+        Échoue si l'offset en base a changé ou si un autre envoi est en cours
+        (un verrou plus vieux que stale_after est considéré comme abandonné).
+        :param token: Identifiant unique de l'écriture, à repasser à end_write.
+        :return: La session réservée, ou None.
+        """
+        now = datetime.now()
+        return self.collection.find_one_and_update(
+            {
+                "_id": ObjectId(upload_id),
+                "offset": offset,
+                "status": "open",
+                "$or": [{"writeToken": None}, {"writeLockedAt": {"$lt": now - stale_after}}],
+            },
+            {"$set": {"writeToken": token, "writeLockedAt": now}},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def end_write(self, upload_id, token, new_offset):
+        """
+        Confirme les octets reçus (le fichier local doit déjà être synchronisé) et libère la session.
+        :return: La session à jour, ou None si le verrou a été perdu entre-temps.
+        """
+        now = datetime.now()
+        return self.collection.find_one_and_update(
+            {"_id": ObjectId(upload_id), "writeToken": token},
+            {"$set": {
+                "offset": new_offset,
+                "writeToken": None,
+                "writeLockedAt": None,
+                "updatedAt": now,
+                "expiresAt": now + self.ttl,
+            }},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def mark(self, upload_id, status, from_status=None, result=None):
+        """
+        Change le statut d'une session (open -> finalizing -> done / error).
+        :param from_status: Si fourni, le changement n'a lieu que depuis ce statut.
+        :return: True si la session a été modifiée.
+        """
+        query = {"_id": ObjectId(upload_id)}
+        if from_status is not None:
+            query["status"] = from_status
+        update = {"status": status, "updatedAt": datetime.now()}
+        if result is not None:
+            update["result"] = result
+        return self.collection.update_one(query, {"$set": update}).modified_count == 1
+
+    def delete(self, upload):
+        """Supprime une session et son fichier de réception."""
+        if upload.get("path") and os.path.exists(upload["path"]):
+            os.remove(upload["path"])
+        self.collection.delete_one({"_id": upload["_id"]})
+
+    def purge_expired(self):
+        """Supprime les sessions abandonnées (et leurs fichiers). Retourne leur nombre."""
+        expired = list(self.collection.find(
+            {"expiresAt": {"$lt": datetime.now()}, "status": {"$ne": "finalizing"}},
+            {"path": 1},
+        ))
+        for upload in expired:
+            self.delete(upload)
+        return len(expired)
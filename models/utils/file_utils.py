@@ -0,0 +1,54 @@
+import hashlib
+import os
+import tempfile
+
+# Taille des blocs lus lors des copies / calculs d'empreinte
+CHUNK_SIZE = 1024 * 1024
+# Taille des parties des envois multipart vers MinIO (5 Mo minimum imposé par S3).
+# C'est aussi la mémoire maximale utilisée par un envoi, quelle que soit la taille du fichier.
+UPLOAD_PART_SIZE = int(os.getenv("UPLOAD_PART_SIZE", str(16 * 1024 * 1024)))
+
+
+def sha256_bytes(data):
+    """Empreinte SHA-256 (hexadécimale) d'un contenu en mémoire."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def copy_stream_with_sha256(src, dst, chunk_size=CHUNK_SIZE):
+    """
+    Copie un flux dans un autre par blocs en calculant l'empreinte au passage.
+    :return: (sha256 hexadécimal, nombre d'octets copiés)
+    """
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: src.read(chunk_size), b""):
+        digest.update(chunk)
+        dst.write(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def sha256_file(path, chunk_size=CHUNK_SIZE):
+    """Empreinte SHA-256 (hexadécimale) d'un fichier, lu par blocs."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def spool_stream(src, directory=None, suffix=""):
+    """
+    Écrit un flux (ex. fichier d'un formulaire) dans un fichier temporaire,
+    par blocs, en calculant empreinte et taille au passage.
+    Le fichier est à supprimer par l'appelant.
+    :return: (chemin, sha256 hexadécimal, taille en octets)
+    """
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as dst:
+            content_hash, size = copy_stream_with_sha256(src, dst)
+    except Exception:
+        os.remove(path)
+        raise
+    return path, content_hash, size
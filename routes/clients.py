@@ -1,10 +1,17 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, session, current_app, jsonify
 from bson import ObjectId
 from controllers.client_management import create_client, edit_client
 from models.client import Client
+from models.client_search import autocomplete, search_filter
+from models.client_summary import remove_client_summary
+from models.pagination import CountCache, keyset_page
+from routes.auth import login_required
 
 clients_bp = Blueprint('clients', __name__)
 
+CLIENTS_PER_PAGE = 50  # Nombre de clients par page
+client_counts = CountCache()
+
 
 @clients_bp.route("/create_client", methods=["GET", "POST"])
 def create_client_route():
@@ -22,47 +29,64 @@ def create_client_route():
 @clients_bp.route("/client_list")
 def client_list():
     db = current_app.config['MONGO_DB']
-    page = int(request.args.get('page', 1))  # Page actuelle, par défaut 1
-    per_page = 50  # Nombre de clients par page
-    skip = (page - 1) * per_page
+    cursor = request.args.get('cursor', '')  # Jeton de page (models/pagination.py), vide : 1ère page
 
     # Recherche et filtre
     search_query = request.args.get('search', '').strip()
 
-    # Construire la requête MongoDB
+    filter_option = request.args.get('filter', '')
+
+    # La liste ne lit que clientSummaries (models/client_summary.py) : identité et compteurs
+    # déjà calculés, sans requête par ligne sur les documents, plans ou interventions.
+    # Recherche : préfixes de mots normalisés (nom, email, responsable, lieu, ville,
+    # n° de contrat, entité), résolus par l'index searchKeys
     query = {}
     if search_query:
-        try:
-            # Si la recherche est un entier, rechercher dans `contractNumber`
-            search_number = int(search_query)
-            query["$or"] = [
-                {"contractNumber": search_number},
-                {"entity": search_number}
-            ]
-        except ValueError:
-            # Sinon, utiliser une recherche textuelle
-            query["$or"] = [
-                {"companyName": {"$regex": search_query, "$options": "i"}},
-                {"email": {"$regex": search_query, "$options": "i"}}
-            ]
-
-    # Total des clients pour pagination
-    total_clients = db.clients.count_documents(query)
-
-    # Récupération des clients avec pagination
-    clients = list(db.clients.find(query, {
-        "companyName": 1,
-        "responsible": 1,
-        "email": 1,
-        "serviceAddress.treatmentPlaceName": 1,
-        "contractNumber": 1,
-        "entity": 1
-    }).skip(skip).limit(per_page))
-
-    # Calcul du nombre total de pages
-    total_pages = (total_clients + per_page - 1) // per_page
-
-    return render_template("client_list.html", clients=clients, page=page, total_pages=total_pages)
+        # Recherche sans terme exploitable (un seul caractère) : aucun résultat plutôt qu'un parcours complet
+        query = search_filter(search_query) or {"_id": None}
+    if filter_option == "with_docs":
+        query["documentCount"] = {"$gt": 0}
+    elif filter_option == "without_docs":
+        query["documentCount"] = 0
+
+    # Page lue par curseur sur _id (ordre d'insertion des clients), sans skip
+    result = keyset_page(db.clientSummaries, query, {"searchKeys": 0}, cursor, CLIENTS_PER_PAGE)
+
+    # Total des clients : estimation sans filtre, total mis en cache quelques secondes pour une recherche
+    total_clients = client_counts.count(db.clientSummaries, query)
+    total_pages = max(1, (total_clients + CLIENTS_PER_PAGE - 1) // CLIENTS_PER_PAGE)
+
+    return render_template("client_list.html", clients=result["items"], page=result["page"],
+                           total_pages=total_pages, total_clients=total_clients,
+                           next_cursor=result["next"], prev_cursor=result["prev"])
+
+
+@clients_bp.route("/api/clients/autocomplete")
+@login_required
+def api_clients_autocomplete():
+    """
+    Suggestions de clients pour les sélecteurs (tri des documents non assignés...).
+    ?q=<saisie>&limit=10 -> [{"id", "companyName", "contractNumber", "entity", "city", "label"}]
+    """
+    db = current_app.config['MONGO_DB']
+    try:
+        limit = max(1, min(int(request.args.get("limit", 10)), 50))
+    except ValueError:
+        limit = 10
+
+    suggestions = []
+    for client in autocomplete(db, request.args.get("q", ""), limit):
+        service_address = client.get("serviceAddress") or {}
+        details = [str(v) for v in (client.get("contractNumber"), service_address.get("city")) if v]
+        suggestions.append({
+            "id": str(client["_id"]),
+            "companyName": client.get("companyName", ""),
+            "contractNumber": client.get("contractNumber"),
+            "entity": client.get("entity"),
+            "city": service_address.get("city"),
+            "label": " · ".join([client.get("companyName") or "(sans nom)"] + details),
+        })
+    return jsonify(suggestions)
 
 
 @clients_bp.route("/edit_client/<client_id>", methods=["GET", "POST"])
@@ -76,6 +100,7 @@ def delete_client(client_id):
     db = current_app.config['MONGO_DB']
     try:
         result = db.clients.delete_one({"_id": ObjectId(client_id)})
+        remove_client_summary(db, client_id)
         if result.deleted_count == 1:
             return "Client supprimé", 200
         else:
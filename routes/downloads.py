@@ -1,30 +1,11 @@
 # routes/downloads.py
 import os
-from datetime import timedelta
-from urllib.parse import urlparse
-from flask import Blueprint, request, redirect, abort
-from minio import Minio
+from flask import Blueprint, request, redirect, abort, jsonify
+from models import storage
+from routes.auth import login_required
 
 downloads_bp = Blueprint("downloads", __name__)
 
-# ---- MinIO client autonome (lit .env) ----
-ENDPOINT_URL = os.getenv("AWS_ENDPOINT_URL", "http://localhost:9000")
-ACCESS_KEY = os.getenv("AWS_ACCESS_KEY_ID", "")
-SECRET_KEY = os.getenv("AWS_SECRET_ACCESS_KEY", "")
-BUCKET_NAME = os.getenv("AWS_BUCKET_NAME", "client-documents")
-
-# Parse l'endpoint (gère http(s)://host:port et aussi host:port)
-p = urlparse(ENDPOINT_URL if "://" in ENDPOINT_URL else f"http://{ENDPOINT_URL}")
-endpoint = p.netloc or p.path  # ex: "minio.ahc-digital.com:9000" ou "localhost:9000"
-secure = (p.scheme == "https")
-
-minio_client = Minio(
-    endpoint,
-    access_key=ACCESS_KEY,
-    secret_key=SECRET_KEY,
-    secure=secure,
-)
-
 @downloads_bp.route("/download_floorplan")
 def download_floorplan():
     """
@@ -44,16 +25,15 @@ def download_floorplan():
         filename = os.path.basename(key)
 
     try:
-        url = minio_client.get_presigned_url(
-            "GET",
-            bucket_name=BUCKET_NAME,
-            object_name=key,
-            expires=timedelta(minutes=10),
-            response_headers={
-                # Force le téléchargement avec un nom propre
-                "response-content-disposition": f'attachment; filename="{filename}"'
-            },
-        )
+        # Force le téléchargement avec un nom propre
+        url = storage.presign_cached(key, "download", download_name=filename)
         return redirect(url)
     except Exception as e:
-        return abort(500, f"Presign error: {e}")
\ No newline at end of file
+        return abort(500, f"Presign error: {e}")
+
+
+@downloads_bp.route("/api/presign_cache/stats")
+@login_required
+def presign_cache_stats():
+    """Compteurs du cache d'URL signées du process qui répond (hits, misses, taux de succès)."""
+    return jsonify(storage.presign_cache.stats())
@@ -1,34 +1,121 @@
-from flask import Blueprint, render_template, request, jsonify, current_app, abort, redirect, url_for
-import os, io, re, mimetypes
-from datetime import datetime, timedelta
+from flask import Blueprint, render_template, request, jsonify, current_app, abort, redirect, url_for, session
+import os, io, re
+import multiprocessing, shutil, socket, subprocess, tempfile, threading, time, uuid
+from concurrent.futures import CancelledError, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime, timedelta
 from urllib.parse import urlparse, parse_qs
-from minio import Minio
-from pdf2image import convert_from_bytes
+from pdf2image import convert_from_bytes, convert_from_path
 from PIL import Image
 import cv2
 import numpy as np
 import pytesseract
-from PyPDF2 import PdfReader
+from PyPDF2 import PdfReader, PdfWriter
+try:
+    from pyzbar import pyzbar  # décodeur de secours (nécessite la lib zbar)
+except ImportError:
+    pyzbar = None
+from pymongo import MongoClient
+from werkzeug.utils import secure_filename
+from models import storage
+from models.client_summary import record_documents
+from models.ingest_job import IngestJobQueue
+from models.ocr_cache import OcrResultCache
+from models.thumbnails import ensure_thumbnail, thumbnail_from_image
+from models.utils.file_utils import sha256_file, spool_stream
 
 ingest_bp = Blueprint("ingest", __name__)
 
-# ----- MinIO client (depuis .env) -----
-ENDPOINT_URL = os.getenv("AWS_ENDPOINT_URL", "http://localhost:9000")
-ACCESS_KEY = os.getenv("AWS_ACCESS_KEY_ID", "")
-SECRET_KEY = os.getenv("AWS_SECRET_ACCESS_KEY", "")
-BUCKET_NAME = os.getenv("AWS_BUCKET_NAME", "client-documents")
-
-p = urlparse(ENDPOINT_URL if "://" in ENDPOINT_URL else f"http://{ENDPOINT_URL}")
-endpoint = p.netloc or p.path
-secure = (p.scheme == "https")
-
-minio_client = Minio(
-    endpoint,
-    access_key=ACCESS_KEY,
-    secret_key=SECRET_KEY,
-    secure=secure,
+# ----- Pool d'analyse (QR + date) -----
+# Nombre de process dédiés au rendu / QR / OCR (par défaut : un par cœur)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "0")) or (os.cpu_count() or 1)
+# Démarrage des process d'analyse : jamais par fork du process Flask (threads, connexions pymongo).
+# forkserver : les workers sont clonés d'un petit serveur qui n'a importé que ce module ;
+# spawn là où forkserver n'existe pas
+INGEST_START_METHOD = os.getenv("INGEST_START_METHOD", "forkserver")
+
+_analysis_pool = None
+_analysis_pool_lock = threading.Lock()
+# Plafond global d'analyses en vol, tous lots confondus (évite de surcharger le CPU
+# quand plusieurs envois arrivent en même temps)
+_analysis_slots = threading.BoundedSemaphore(INGEST_WORKERS)
+
+# Résolution du rendu de la 1ère page, partagé entre décodage QR et OCR
+INGEST_RENDER_DPI = int(os.getenv("INGEST_RENDER_DPI", "200"))
+
+# Version du pipeline d'analyse : clé du cache OCR/QR avec l'empreinte du PDF.
+# À incrémenter à chaque changement qui modifie les résultats (rendu, QR, OCR, parsing de date).
+INGEST_PIPELINE_VERSION = os.getenv("INGEST_PIPELINE_VERSION", f"4-{INGEST_RENDER_DPI}dpi")
+
+# ----- Moteur OCR -----
+# auto : tesserocr si installé, sinon pytesseract
+OCR_BACKEND = os.getenv("OCR_BACKEND", "auto")
+OCR_LANG = os.getenv("OCR_LANG", "fra")
+
+_ocr_backends = {}
+
+# ----- Extraction du texte natif des PDF -----
+# auto : pdftotext (Poppler, déjà requis par pdf2image) si présent, sinon PyPDF2
+PDF_TEXT_BACKEND = os.getenv("PDF_TEXT_BACKEND", "auto")
+# Délai max (secondes) accordé à pdftotext avant de basculer sur l'autre moteur
+PDF_TEXT_TIMEOUT = float(os.getenv("PDF_TEXT_TIMEOUT", "10"))
+# Pages lues pour chercher la date d'intervention
+PDF_TEXT_PAGES = 2
+
+# ----- Date d'intervention -----
+def _parse_zones(value: str) -> tuple:
+    """
+    Zones "x0,y0,x1,y1;x0,y0,x1,y1" (fractions de la page) -> tuple de tuples.
+    Une chaîne vide désactive l'OCR ciblé (OCR pleine page directement).
+    """
+    zones = []
+    for part in value.split(";"):
+        if part.strip():
+            x0, y0, x1, y1 = (float(v) for v in part.split(","))
+            zones.append((x0, y0, x1, y1))
+    return tuple(zones)
+
+# Zones du bon d'intervention où figure la date, OCRisées en priorité (défaut : bandeau d'en-tête)
+INTERVENTION_DATE_ZONES = _parse_zones(os.getenv("INTERVENTION_DATE_ZONES", "0,0,1,0.3"))
+# Résolution (DPI) de l'OCR des zones : plus basse que le rendu de la page
+DATE_ZONE_OCR_DPI = int(os.getenv("DATE_ZONE_OCR_DPI", "150"))
+# Distance max (caractères) entre un mot-clé ("date d'intervention"...) et la date qu'il annonce
+DATE_KEYWORD_WINDOW = int(os.getenv("DATE_KEYWORD_WINDOW", "60"))
+
+# ----- Découpage des lots scannés -----
+# Résolution du rendu des pages d'un lot (recherche de QR seulement)
+SPLIT_RENDER_DPI = int(os.getenv("SPLIT_RENDER_DPI", "150"))
+# Nombre de pages rendues par tâche du pool (amortit le lancement de pdftoppm)
+SPLIT_PAGES_PER_TASK = int(os.getenv("SPLIT_PAGES_PER_TASK", "8"))
+
+# ----- Détection QR -----
+# Budget de temps (secondes) pour chercher un QR sur une page avant d'abandonner
+QR_TIME_BUDGET = float(os.getenv("QR_TIME_BUDGET", "2.0"))
+# Largeur (pixels) de la passe rapide sur la page réduite
+QR_COARSE_WIDTH = int(os.getenv("QR_COARSE_WIDTH", "1000"))
+# Zones probables du QR (fractions x0, y0, x1, y1 de la page), par ordre de priorité.
+# add_qr_to_word place le QR dans la colonne gauche du pied de page.
+QR_REGIONS = (
+    (0.0, 0.75, 0.5, 1.0),   # pied de page, gauche
+    (0.0, 0.75, 1.0, 1.0),   # pied de page complet
+    (0.5, 0.0, 1.0, 0.25),   # coin haut droit
+    (0.0, 0.0, 0.5, 0.25),   # coin haut gauche
 )
 
+# ----- Jobs d'ingestion asynchrones -----
+INGEST_JOB_WORKERS = int(os.getenv("INGEST_JOB_WORKERS", "2"))
+INGEST_JOB_POLL_INTERVAL = float(os.getenv("INGEST_JOB_POLL_INTERVAL", "1.0"))
+INGEST_JOB_STALE_AFTER = timedelta(seconds=int(os.getenv("INGEST_JOB_STALE_AFTER", "600")))
+# Rafraîchissement du verrou d'un job en cours (doit rester bien inférieur à INGEST_JOB_STALE_AFTER)
+INGEST_JOB_HEARTBEAT_INTERVAL = float(os.getenv("INGEST_JOB_HEARTBEAT_INTERVAL", "30"))
+INGEST_SPOOL_DIR = os.getenv("INGEST_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "ahc_ingest_spool"))
+
+_job_workers_started = False
+
+# Copies MinIO simultanées lors d'une assignation en masse
+ASSIGN_COPY_WORKERS = int(os.getenv("ASSIGN_COPY_WORKERS", "8"))
+_worker_mongo_clients = {}
+
 # ----- Helpers -----
 def _now_ts():
     return f"{datetime.now().timestamp():.0f}"
@@ -54,28 +141,131 @@ def parse_client_id_from_qr(text: str) -> str | None:
         pass
     return None
 
-def extract_qr_client_id_from_pdf(pdf_bytes: bytes) -> tuple[str | None, str | None]:
+def parse_intervention_ref_from_qr(text: str | None) -> str | None:
     """
-    Convertit la 1ère page en image, tente de décoder un QR via OpenCV.
-    Retourne (client_id, qr_raw) ou (None, None).
+    Référence d'intervention portée par un QR (paramètre intervention_ref de l'URL), ou None.
+    Seule façon de reconnaître les pages d'une même intervention qui répètent son QR.
+    """
+    if not text or not (text.startswith("http://") or text.startswith("https://")):
+        return None
+    return parse_qs(urlparse(text).query).get("intervention_ref", [None])[0]
+
+def render_first_page(pdf: bytes | str, dpi: int = INGEST_RENDER_DPI) -> Image.Image | None:
+    """
+    Rend la 1ère page du PDF une seule fois, en niveaux de gris.
+    pdf : contenu du PDF, ou chemin d'un PDF sur disque (passé tel quel à pdftoppm).
+    Le format PPM/PGM est lu directement depuis la sortie de pdftoppm (pas d'encodage PNG).
+    Retourne une image PIL en mode "L" ou None.
     """
+    convert = convert_from_path if isinstance(pdf, str) else convert_from_bytes
     try:
-        # Convertir la première page du PDF en image
-        pages = convert_from_bytes(pdf_bytes, first_page=1, last_page=1, fmt="png")
-        if not pages:
-            return None, None
+        pages = convert(
+            pdf, dpi=dpi, first_page=1, last_page=1, fmt="ppm", grayscale=True
+        )
+        return pages[0] if pages else None
+    except Exception as e:
+        print("Erreur rendu PDF :", e)
+        return None
+
+def _crop(gray: np.ndarray, region: tuple) -> np.ndarray:
+    h, w = gray.shape
+    x0, y0, x1, y1 = region
+    return gray[int(y0 * h):int(y1 * h), int(x0 * w):int(x1 * w)]
 
-        page: Image.Image = pages[0]
+def _binarize(gray: np.ndarray) -> np.ndarray:
+    return cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)[1]
 
-        # PIL -> numpy -> BGR pour OpenCV
-        img = np.array(page)              # RGB
-        img_bgr = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+def _deskew(gray: np.ndarray) -> np.ndarray | None:
+    """Redresse une page scannée de travers (None si l'inclinaison est négligeable)."""
+    ink = cv2.findNonZero(cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)[1])
+    if ink is None:
+        return None
+    angle = cv2.minAreaRect(ink)[-1]
+    if angle > 45:
+        angle -= 90
+    if abs(angle) < 0.5:
+        return None
+    h, w = gray.shape
+    matrix = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+    return cv2.warpAffine(gray, matrix, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+def _qr_attempts(gray: np.ndarray):
+    """
+    Variantes de la page à essayer, de la moins coûteuse à la plus coûteuse.
+    Générateur : une variante n'est calculée que si les précédentes ont échoué.
+    Produit des couples (décodeur, image).
+    """
+    h, w = gray.shape
+    # 1) Passe rapide sur la page réduite
+    if w > QR_COARSE_WIDTH:
+        scale = QR_COARSE_WIDTH / w
+        yield "opencv", cv2.resize(gray, (QR_COARSE_WIDTH, int(h * scale)), interpolation=cv2.INTER_AREA)
+    # 2) Zones probables en pleine résolution
+    for region in QR_REGIONS:
+        yield "opencv", _crop(gray, region)
+    # 3) Page complète, puis binarisée, puis redressée
+    yield "opencv", gray
+    binary = _binarize(gray)
+    yield "opencv", binary
+    deskewed = _deskew(gray)
+    if deskewed is not None:
+        yield "opencv", deskewed
+    # 4) Secours pyzbar sur les mêmes zones
+    if pyzbar is not None:
+        for region in QR_REGIONS[:2]:
+            yield "pyzbar", _crop(gray, region)
+        yield "pyzbar", gray
+        yield "pyzbar", binary
 
-        detector = cv2.QRCodeDetector()
-        data, points, _ = detector.detectAndDecode(img_bgr)
+def _decode_qr(decoder: str, img: np.ndarray) -> str | None:
+    if decoder == "pyzbar":
+        for symbol in pyzbar.decode(img, symbols=[pyzbar.ZBarSymbol.QRCODE]):
+            data = symbol.data.decode("utf-8", errors="replace").strip()
+            if data:
+                return data
+        return None
+    data, _, _ = cv2.QRCodeDetector().detectAndDecode(img)
+    return data.strip() or None
 
+def detect_qr_in_image(gray: np.ndarray, time_budget: float = QR_TIME_BUDGET) -> str | None:
+    """
+    Cherche un QR sur une page en niveaux de gris, du grossier au fin :
+    page réduite, zones probables, page complète, variantes binarisée / redressée,
+    puis pyzbar. S'arrête dès qu'un QR est lu ou que le budget de temps est écoulé.
+    """
+    deadline = time.monotonic() + time_budget
+    for decoder, img in _qr_attempts(gray):
+        if img.size == 0:
+            continue
+        try:
+            data = _decode_qr(decoder, img)
+        except Exception:
+            data = None
         if data:
-            raw = data.strip()
+            return data
+        if time.monotonic() > deadline:
+            break
+    return None
+
+def extract_qr_client_id_from_pdf(pdf: bytes | str, page: Image.Image | None = None) -> tuple[str | None, str | None]:
+    """
+    Tente de décoder un QR sur la 1ère page (cascade de detect_qr_in_image).
+    page : rendu déjà calculé par render_first_page (sinon la page est rendue ici).
+    Retourne (client_id, qr_raw) ou (None, None).
+    """
+    try:
+        if page is None:
+            page = render_first_page(pdf)
+        if page is None:
+            return None, None
+
+        # PIL -> numpy (niveaux de gris, suffisant pour OpenCV)
+        img = np.array(page)
+        if img.ndim == 3:
+            img = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+
+        raw = detect_qr_in_image(img)
+        if raw:
             cid = parse_client_id_from_qr(raw)
             if cid:
                 return cid, raw
@@ -87,33 +277,254 @@ def extract_qr_client_id_from_pdf(pdf_bytes: bytes) -> tuple[str | None, str | N
     except Exception:
         return None, None
 
-def put_minio_object(key: str, data: bytes, content_type: str = "application/pdf"):
-    bio = io.BytesIO(data)
-    bio.seek(0, io.SEEK_END)
-    length = bio.tell()
-    bio.seek(0)
-    minio_client.put_object(
-        bucket_name=BUCKET_NAME,
-        object_name=key,
-        data=bio,
-        length=length,
-        content_type=content_type,
-    )
+def analyze_pdf(pdf: bytes | str, on_stage=None) -> dict:
+    """
+    Analyse un PDF scanné (contenu ou chemin sur disque) : QR client + date d'intervention.
+    Exécutée dans un process du pool : ne touche ni à Mongo ni à MinIO.
+    La page est rendue une seule fois puis partagée entre QR, OCR et vignette.
+    on_stage : callback optionnel appelé avec "rasterized" puis "ocr".
+    """
+    page = render_first_page(pdf)
+    # Étape publiée dès le rendu, avant la recherche du QR
+    if on_stage:
+        on_stage("rasterized")
+    if page is not None:
+        client_id, qr_raw = extract_qr_client_id_from_pdf(pdf, page)
+    else:
+        client_id, qr_raw = None, None
+    date_info = extract_intervention_date_from_pdf(pdf, page)
+    if on_stage:
+        on_stage("ocr")
+    return {
+        "clientId": client_id,
+        "qrRaw": qr_raw,
+        "interventionDate": date_info.get("interventionDate"),
+        "interventionDateSource": date_info.get("source"),
+        "rawText": date_info.get("rawText", ""),
+        "thumbnail": thumbnail_from_image(page) if page is not None else None,
+    }
 
-def presign_get(key: str, disposition_filename: str | None = None) -> str:
-    headers = {}
-    if disposition_filename:
-        headers["response-content-disposition"] = f'attachment; filename="{disposition_filename}"'
-        # optionnel : type deviné
-        guessed = mimetypes.guess_type(disposition_filename)[0] or "application/pdf"
-        headers["response-content-type"] = guessed
-    return minio_client.get_presigned_url(
-        "GET",
-        bucket_name=BUCKET_NAME,
-        object_name=key,
-        expires=timedelta(minutes=10),
-        response_headers=headers or None,
-    )
+def _analysis_mp_context():
+    method = INGEST_START_METHOD if INGEST_START_METHOD in multiprocessing.get_all_start_methods() else "spawn"
+    context = multiprocessing.get_context(method)
+    if method == "forkserver":
+        # Le serveur n'importe que le pipeline d'analyse, pas le module principal de l'application
+        context.set_forkserver_preload([__name__])
+    return context
+
+def _get_analysis_pool() -> ProcessPoolExecutor:
+    global _analysis_pool
+    with _analysis_pool_lock:
+        if _analysis_pool is None:
+            _analysis_pool = ProcessPoolExecutor(max_workers=INGEST_WORKERS, mp_context=_analysis_mp_context())
+        return _analysis_pool
+
+def _reset_analysis_pool(broken_pool):
+    """
+    Remplace le pool cassé. Sans effet si un autre appel l'a déjà remplacé : un échec
+    tardif ne doit pas arrêter le nouveau pool, utilisé par d'autres requêtes.
+    """
+    global _analysis_pool
+    with _analysis_pool_lock:
+        if _analysis_pool is not broken_pool:
+            return
+        _analysis_pool = None
+    broken_pool.shutdown(wait=False, cancel_futures=True)
+
+def _submit_analysis(fn, *args):
+    """
+    Soumet une analyse au pool de process.
+    Chaque analyse prend une place dans le sémaphore global, rendue à la fin du calcul.
+    """
+    _analysis_slots.acquire()
+    try:
+        pool = _get_analysis_pool()
+        future = pool.submit(fn, *args)
+    except Exception:
+        _analysis_slots.release()
+        raise
+    future.add_done_callback(lambda _f: _analysis_slots.release())
+    # Pool d'origine, pour ne remplacer que celui-là s'il casse (_analysis_result)
+    future.analysis_pool = pool
+    return future
+
+def _analysis_result(future, fn, *args):
+    """
+    Récupère le résultat d'une analyse soumise par _submit_analysis.
+    Si un worker est mort (OOM, segfault poppler...), le pool est recréé
+    et l'analyse est refaite dans le process courant ; de même pour une analyse
+    annulée par l'arrêt de son pool cassé.
+    """
+    try:
+        return future.result()
+    except BrokenProcessPool as e:
+        print("Pool d'analyse cassé, analyse locale :", e)
+        _reset_analysis_pool(future.analysis_pool)
+        return fn(*args)
+    except CancelledError:
+        print("Analyse annulée (pool d'analyse remplacé), analyse locale")
+        return fn(*args)
+
+def analyze_pdf_file(pdf_path: str, on_stage=None) -> dict:
+    """
+    Comme analyze_pdf, pour un PDF spoolé sur disque : seul le chemin est transmis
+    au pool, et pdftoppm / pdftotext / PyPDF2 lisent le fichier eux-mêmes
+    (le contenu n'est jamais chargé en entier en mémoire).
+    """
+    return analyze_pdf(pdf_path, on_stage=on_stage)
+
+def extract_intervention_date_from_file(pdf_path: str) -> dict:
+    """Comme extract_intervention_date_from_pdf, pour un PDF sur disque (exécutée dans le pool)."""
+    return extract_intervention_date_from_pdf(pdf_path)
+
+def analyze_pdfs(pdf_paths: list[str], return_exceptions: bool = False) -> list:
+    """
+    Répartit l'analyse de plusieurs PDF (fichiers sur disque) sur le pool de process.
+    Les résultats sont renvoyés dans le même ordre que pdf_paths.
+    :param return_exceptions: Renvoie l'exception d'un PDF à sa place au lieu de la lever.
+    """
+    futures = [_submit_analysis(analyze_pdf_file, pdf_path) for pdf_path in pdf_paths]
+    results = []
+    for pdf_path, future in zip(pdf_paths, futures):
+        try:
+            results.append(_analysis_result(future, analyze_pdf_file, pdf_path))
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            results.append(e)
+    return results
+
+def _cacheable(analysis: dict) -> bool:
+    # Une analyse sans QR ni texte peut venir d'une erreur passagère (poppler, tesseract) : on ne la fige pas
+    return bool(analysis.get("qrRaw") or analysis.get("rawText"))
+
+def _cache_entry(analysis: dict) -> dict:
+    # La vignette part dans MinIO, pas dans le cache OCR/QR
+    return {k: v for k, v in analysis.items() if k != "thumbnail"}
+
+def analyze_pdfs_cached(db, items: list[tuple[str, str]], return_exceptions: bool = False) -> list:
+    """
+    Comme analyze_pdfs, en passant d'abord par le cache OCR/QR.
+    items : liste de (empreinte SHA-256, chemin du PDF). Ordre conservé.
+    """
+    cache = OcrResultCache(db)
+    analyses = [cache.get(content_hash, INGEST_PIPELINE_VERSION) for content_hash, _ in items]
+    missing = [i for i, analysis in enumerate(analyses) if analysis is None]
+
+    computed = analyze_pdfs([items[i][1] for i in missing], return_exceptions=return_exceptions)
+    for i, analysis in zip(missing, computed):
+        analyses[i] = analysis
+        if not isinstance(analysis, Exception) and _cacheable(analysis):
+            cache.put(items[i][0], INGEST_PIPELINE_VERSION, _cache_entry(analysis))
+    return analyses
+
+def find_duplicate_document(db, content_hash: str | None):
+    """Retourne le 1er document clientDocuments ayant cette empreinte SHA-256, ou None."""
+    if not content_hash:
+        return None
+    return db.clientDocuments.find_one({"contentHash": content_hash}, sort=[("uploadDate", 1)])
+
+def _duplicate_result(name: str, existing: dict) -> dict:
+    return {
+        "file": name,
+        "status": "duplicate",
+        "docId": str(existing["_id"]),
+        "clientId": existing.get("clientId"),
+    }
+
+def store_scan(db, name: str, pdf_path: str, analysis: dict | None, uploaded_by: str = "quick_ingest",
+               content_hash: str | None = None, extra_fields: dict | None = None) -> dict:
+    """
+    Range un scan analysé : documents/<clientId>/interventions/scans/ si le QR
+    a donné un client, documents/unassigned/ sinon. Crée l'entrée clientDocuments.
+    Si un document de même empreinte existe déjà (ex. doublon dans le même lot),
+    rien n'est envoyé et le document existant est renvoyé.
+    Retourne le résultat à renvoyer au client (status ok / unassigned / duplicate / error).
+    """
+    existing = find_duplicate_document(db, content_hash)
+    if existing:
+        return _duplicate_result(name, existing)
+    if analysis is None:
+        # Doublon d'un fichier du lot qui n'a finalement pas pu être rangé
+        return {"file": name, "status": "error", "message": "Doublon d'un fichier en erreur"}
+
+    client_id = analysis["clientId"]
+    intervention_date = analysis["interventionDate"]
+    date_source = analysis["interventionDateSource"]
+    print(f"{name} : date d'intervention {intervention_date} (source {date_source})")
+
+    if client_id:
+        key = f"documents/{client_id}/interventions/scans/{_now_ts()}_{name.replace(' ', '_')}"
+    else:
+        # pas de QR → parking unassigned
+        key = f"documents/unassigned/{_now_ts()}_{name.replace(' ', '_')}"
+
+    try:
+        storage.put_file(key, pdf_path, "application/pdf")
+        # Vignette issue de la page déjà rendue pour le QR ; rendue ici seulement si l'analyse
+        # venait du cache ou ne l'a pas produite (parties de lot)
+        thumbnail_path = ensure_thumbnail(db, content_hash, pdf_path, name, analysis.get("thumbnail"))
+        document = {
+            "clientId": client_id,
+            "fileName": name,
+            "objectPath": key,
+            "filePath": key,
+            "documentType": "intervention",
+            "uploadedBy": uploaded_by,
+            "uploadDate": datetime.now(),
+            "interventionDate": intervention_date,
+            "interventionDateSource": date_source,
+            "source": "scan",
+            "status": "ok" if client_id else "unassigned",
+            "qrRaw": analysis["qrRaw"],
+            "contentHash": content_hash,
+            "thumbnailPath": thumbnail_path,
+            **(extra_fields or {}),
+        }
+        doc_id = db.clientDocuments.insert_one(document).inserted_id
+    except Exception as e:
+        return {"file": name, "status": "error", "message": f"Upload/DB: {e}"}
+
+    if client_id:
+        record_documents(db, [document])
+        return {"file": name, "status": "ok", "clientId": client_id, "docId": str(doc_id)}
+    return {"file": name, "status": "unassigned", "docId": str(doc_id)}
+
+def ingest_pdfs(db, items: list[tuple], uploaded_by: str = "quick_ingest") -> list[dict]:
+    """
+    Pipeline d'ingestion complet pour des PDF sur disque : déduplication SHA-256,
+    analyse QR + date (cache puis pool de process), rangement MinIO + Mongo.
+    Utilisé par /api/ingest_docs et par le démon de dossier surveillé.
+    items : liste de (nom, chemin) ou (nom, chemin, empreinte) si l'empreinte a déjà
+    été calculée au spool. Retourne un résultat par fichier, dans l'ordre.
+    """
+    results = []
+    accepted = []  # (index dans results, nom, chemin, empreinte, à analyser ?)
+    seen_hashes = set()
+
+    # 1) Un contenu déjà connu (même SHA-256) n'est ni analysé ni renvoyé vers MinIO
+    for name, pdf_path, *known_hash in items:
+        content_hash = known_hash[0] if known_hash else sha256_file(pdf_path)
+        existing = find_duplicate_document(db, content_hash)
+        if existing:
+            results.append(_duplicate_result(name, existing))
+            continue
+        accepted.append((len(results), name, pdf_path, content_hash, content_hash not in seen_hashes))
+        seen_hashes.add(content_hash)
+        results.append(None)
+
+    # 2) Analyse QR + date en parallèle sur le pool de process (résultats déjà connus lus en cache)
+    to_analyze = [item for item in accepted if item[4]]
+    analyses = dict(zip(
+        (index for index, *_ in to_analyze),
+        analyze_pdfs_cached(db, [(content_hash, pdf_path) for _, _, pdf_path, content_hash, _ in to_analyze]),
+    ))
+
+    # 3) Rangement MinIO + Mongo, dans l'ordre d'envoi
+    for index, name, pdf_path, content_hash, _ in accepted:
+        results[index] = store_scan(db, name, pdf_path, analyses.get(index), uploaded_by, content_hash=content_hash)
+
+    return results
 
 # ----- Routes -----
 @ingest_bp.route("/quick_ingest", methods=["GET"])
@@ -128,72 +539,431 @@ def api_ingest_docs():
     dans client-documents/<clientId>/scans/...
     docType est forcé à 'intervention'.
     Les fichiers sans QR vont en unassigned/ pour tri manuel.
+    Avec mode=job, les fichiers sont spoolés sur disque et un jobId est renvoyé
+    immédiatement (202) ; l'avancement se suit via /api/ingest_jobs/<jobId>.
     """
     if "files" not in request.files:
         return jsonify({"error": "Aucun fichier reçu"}), 400
 
     db = current_app.config["MONGO_DB"]
     files = request.files.getlist("files")
+
+    if request.form.get("mode") == "job":
+        job_id = _spool_ingest_job(db, files, session.get("username", "quick_ingest"))
+        return jsonify({
+            "jobId": str(job_id),
+            "statusUrl": url_for("ingest.api_ingest_job_status", job_id=str(job_id)),
+        }), 202
+
+    # Fichiers spoolés sur disque (empreinte calculée au passage), les non-PDF refusés sans analyse
+    spool_dir = _new_spool_dir()
+    try:
+        spooled = _spool_files(files, spool_dir)
+        accepted = [(index, f) for index, f in enumerate(spooled) if f.get("spoolPath")]
+        ingested = ingest_pdfs(db, [(f["file"], f["spoolPath"], f["contentHash"]) for _, f in accepted])
+    finally:
+        shutil.rmtree(spool_dir, ignore_errors=True)
+
+    results = [f.get("result") for f in spooled]
+    for (index, _), result in zip(accepted, ingested):
+        results[index] = result
+
+    return jsonify({"results": results})
+
+def _scan_batch_pages(pdf_path: str, first: int, last: int) -> list[dict]:
+    """
+    Rend les pages first..last d'un lot et y cherche un QR client.
+    Exécutée dans un process du pool.
+    """
+    try:
+        pages = convert_from_path(
+            pdf_path, dpi=SPLIT_RENDER_DPI, first_page=first, last_page=last, fmt="ppm", grayscale=True
+        )
+    except Exception as e:
+        print(f"Erreur rendu pages {first}-{last} :", e)
+        pages = []
+
+    # Une page non rendue reste dans la partie en cours (jamais perdue)
+    found = []
+    for page_no in range(first, last + 1):
+        client_id, qr_raw = None, None
+        if page_no - first < len(pages):
+            client_id, qr_raw = extract_qr_client_id_from_pdf(b"", pages[page_no - first])
+        found.append({"page": page_no, "clientId": client_id, "qrRaw": qr_raw})
+    return found
+
+def _continues_part(part: dict, page: dict) -> bool:
+    """
+    Une page à QR prolonge la partie en cours seulement si les deux QR désignent
+    explicitement la même intervention (même client, même intervention_ref).
+    """
+    ref = parse_intervention_ref_from_qr(page["qrRaw"])
+    return (
+        ref is not None
+        and page["clientId"] == part["clientId"]
+        and ref == parse_intervention_ref_from_qr(part["qrRaw"])
+    )
+
+def split_batch_by_qr(pdf_path: str, page_count: int) -> list[dict]:
+    """
+    Découpe un lot en interventions : chaque page portant un QR est une page de séparation
+    et commence une nouvelle partie, même si le client est celui de la partie précédente
+    (plusieurs interventions d'un même client scannées à la suite). Seul un QR portant la
+    même intervention_ref que la partie en cours la prolonge. Un QR lisible qui ne donne
+    aucun client commence une partie sans client (rangée dans unassigned). Les pages
+    précédant le 1er QR forment une partie sans client.
+    Les pages sont analysées en parallèle, par tranches de SPLIT_PAGES_PER_TASK.
+    Retourne [{"first": n, "last": m, "clientId": ..., "qrRaw": ...}] (pages numérotées à partir de 1).
+    """
+    ranges = [
+        (first, min(first + SPLIT_PAGES_PER_TASK - 1, page_count))
+        for first in range(1, page_count + 1, SPLIT_PAGES_PER_TASK)
+    ]
+    futures = [_submit_analysis(_scan_batch_pages, pdf_path, first, last) for first, last in ranges]
+
+    parts = []
+    for (first, last), future in zip(ranges, futures):
+        for page in _analysis_result(future, _scan_batch_pages, pdf_path, first, last):
+            if not parts or (page["qrRaw"] and not _continues_part(parts[-1], page)):
+                parts.append({
+                    "first": page["page"],
+                    "last": page["page"],
+                    "clientId": page["clientId"],
+                    "qrRaw": page["qrRaw"],
+                })
+            else:
+                parts[-1]["last"] = page["page"]
+    return parts
+
+def _write_part(reader: PdfReader, first: int, last: int, path: str) -> str:
+    """Écrit les pages first..last du lot dans path et retourne l'empreinte du fichier."""
+    writer = PdfWriter()
+    for index in range(first - 1, last):
+        writer.add_page(reader.pages[index])
+    with open(path, "wb") as out:
+        writer.write(out)
+    return sha256_file(path)
+
+def ingest_batch(db, name: str, batch_path: str, batch_hash: str, uploaded_by: str = "quick_ingest") -> list[dict]:
+    """
+    Découpe un lot déjà écrit sur disque aux pages portant un QR (split_batch_by_qr) et
+    range chaque partie comme un scan d'intervention. Un lot déjà reçu n'est pas retraité.
+    Retourne un résultat par partie (avec ses pages), ou un seul résultat duplicate / error.
+    """
+    existing = db.clientDocuments.find_one({"batchHash": batch_hash})
+    if existing:
+        return [_duplicate_result(name, existing)]
+
+    results = []
+    parts_dir = _new_spool_dir()
+    try:
+        reader = PdfReader(batch_path)
+        if not reader.pages:
+            return [{"file": name, "status": "error", "message": "PDF vide"}]
+        parts = split_batch_by_qr(batch_path, len(reader.pages))
+
+        # Date d'intervention de chaque partie (texte natif, sinon OCR de sa 1ère page)
+        stem = os.path.splitext(name)[0]
+        part_files = []  # (nom, chemin, empreinte)
+        for part in parts:
+            part_name = f"{stem}_p{part['first']:03d}-{part['last']:03d}.pdf"
+            part_path = os.path.join(parts_dir, secure_filename(part_name) or "part.pdf")
+            part_files.append((part_name, part_path, _write_part(reader, part["first"], part["last"], part_path)))
+        date_futures = [
+            _submit_analysis(extract_intervention_date_from_file, part_path) for _, part_path, _ in part_files
+        ]
+
+        for part, (part_name, part_path, part_hash), future in zip(parts, part_files, date_futures):
+            date_info = _analysis_result(future, extract_intervention_date_from_file, part_path)
+            analysis = {
+                "clientId": part["clientId"],
+                "qrRaw": part["qrRaw"],
+                "interventionDate": date_info.get("interventionDate"),
+                "interventionDateSource": date_info.get("source"),
+            }
+            result = store_scan(
+                db, part_name, part_path, analysis, uploaded_by,
+                content_hash=part_hash,
+                extra_fields={"batchHash": batch_hash, "batchFileName": name,
+                              "batchPages": [part["first"], part["last"]]},
+            )
+            result["pages"] = [part["first"], part["last"]]
+            results.append(result)
+    except Exception as e:
+        results.append({"file": name, "status": "error", "message": f"Découpage: {e}"})
+    finally:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+    return results
+
+@ingest_bp.route("/api/ingest_batch", methods=["POST"])
+def api_ingest_batch():
+    """
+    Reçoit des lots scannés (files[]) : un PDF par pile de feuilles.
+    Chaque lot est découpé aux pages portant un QR client ; chaque partie est
+    rangée comme un scan d'intervention, avec sa propre entrée clientDocuments.
+    Un lot déjà reçu (même SHA-256) n'est pas retraité.
+    """
+    if "files" not in request.files:
+        return jsonify({"error": "Aucun fichier reçu"}), 400
+
+    db = current_app.config["MONGO_DB"]
     results = []
 
+    for f in request.files.getlist("files"):
+        name = f.filename or "lot.pdf"
+        if not name.lower().endswith(".pdf"):
+            results.append({"file": name, "status": "error", "message": "Seuls les PDF sont acceptés"})
+            continue
+
+        batch_path, batch_hash, _ = spool_stream(f.stream, directory=_new_spool_dir(), suffix=".pdf")
+        try:
+            results.extend(ingest_batch(db, name, batch_path, batch_hash))
+        finally:
+            shutil.rmtree(os.path.dirname(batch_path), ignore_errors=True)
+
+    return jsonify({"results": results})
+
+def _new_spool_dir() -> str:
+    spool_dir = os.path.join(INGEST_SPOOL_DIR, uuid.uuid4().hex)
+    os.makedirs(spool_dir, exist_ok=True)
+    return spool_dir
+
+def _spool_files(files, spool_dir) -> list[dict]:
+    """
+    Écrit les fichiers reçus dans spool_dir, par blocs, en calculant leur empreinte.
+    Les non-PDF ne sont pas écrits et portent directement leur résultat d'erreur.
+    Retourne [{"file", "spoolPath", "contentHash"} | {"file", "status", "result"}] dans l'ordre.
+    """
+    spooled = []
     for f in files:
         name = f.filename or "scan.pdf"
         if not name.lower().endswith(".pdf"):
-            results.append({"file": name, "status": "error", "message": "Seuls les PDF sont acceptés"})
+            spooled.append({
+                "file": name,
+                "status": "error",
+                "result": {"file": name, "status": "error", "message": "Seuls les PDF sont acceptés"},
+            })
             continue
+        spool_path, content_hash, _ = spool_stream(
+            f.stream, directory=spool_dir, suffix=f"_{secure_filename(name) or 'scan.pdf'}"
+        )
+        spooled.append({"file": name, "spoolPath": spool_path, "contentHash": content_hash})
+    return spooled
 
-        pdf_bytes = f.read()
-        client_id, qr_raw = extract_qr_client_id_from_pdf(pdf_bytes)
-        date_info = extract_intervention_date_from_pdf(pdf_bytes)
-        intervention_date = date_info.get("interventionDate")
-        date_source = date_info.get("source")
-        print("Date trouvée :", intervention_date)
-        print("Source date  :", date_source)
-        if client_id:
-            key = f"documents/{client_id}/interventions/scans/{_now_ts()}_{name.replace(' ', '_')}"
+def _spool_ingest_job(db, files, created_by):
+    """
+    Écrit les fichiers reçus dans un répertoire de spool et crée le job correspondant.
+    Les non-PDF sont enregistrés directement en erreur.
+    """
+    spool_dir = _new_spool_dir()
+    return IngestJobQueue(db).create_job(_spool_files(files, spool_dir), spool_dir, created_by)
+
+@ingest_bp.route("/api/ingest_jobs/<job_id>", methods=["GET"])
+def api_ingest_job_status(job_id):
+    """
+    Avancement d'un job d'ingestion : statut global et étape de chaque fichier
+    (queued / rasterized / ocr / stored / duplicate / error).
+    """
+    from bson import ObjectId
+
+    if not ObjectId.is_valid(job_id):
+        return jsonify({"error": "jobId invalide"}), 400
+
+    db = current_app.config["MONGO_DB"]
+    job = IngestJobQueue(db).get_job(job_id)
+    if not job:
+        return jsonify({"error": "Job introuvable"}), 404
+
+    counts = {}
+    for f in job["files"]:
+        counts[f["status"]] = counts.get(f["status"], 0) + 1
+
+    return jsonify({
+        "jobId": str(job["_id"]),
+        "status": job["status"],
+        "counts": counts,
+        "files": [
+            {"file": f["file"], "status": f["status"], "result": f.get("result")}
+            for f in job["files"]
+        ],
+    })
+
+def _worker_db(mongo_uri: str, db_name: str):
+    """
+    Base Mongo utilisable depuis un process du pool d'analyse.
+    Le client est créé dans le process lui-même (jamais hérité du fork).
+    """
+    key = (os.getpid(), mongo_uri)
+    if key not in _worker_mongo_clients:
+        _worker_mongo_clients[key] = MongoClient(mongo_uri)
+    return _worker_mongo_clients[key][db_name]
+
+def _analyze_job_file(mongo_uri: str, db_name: str, job_id: str, worker_id: str, index: int, spool_path: str) -> dict:
+    """
+    Analyse un fichier spoolé dans un process du pool et publie ses étapes dans ingestJobs.
+    """
+    jobs = IngestJobQueue(_worker_db(mongo_uri, db_name))
+    return analyze_pdf_file(
+        spool_path, on_stage=lambda stage: jobs.set_file_status(job_id, index, stage, worker_id=worker_id)
+    )
+
+class _JobHeartbeat:
+    """
+    Thread qui rafraîchit lockedAt toutes les INGEST_JOB_HEARTBEAT_INTERVAL secondes tant que
+    le job tourne : une longue analyse (gros PDF, pool recréé) ne le fait pas reprendre par un autre worker.
+    """
+    def __init__(self, queue: IngestJobQueue, job_id: str, worker_id: str):
+        self.queue, self.job_id, self.worker_id = queue, job_id, worker_id
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f"ingest-heartbeat-{job_id}")
+
+    def _run(self):
+        while not self._stop.wait(INGEST_JOB_HEARTBEAT_INTERVAL):
             try:
-                put_minio_object(key, pdf_bytes, "application/pdf")
-                db.clientDocuments.insert_one({
-                    "clientId": client_id,
-                    "fileName": name,
-                    "objectPath": key,
-                    "filePath": key,
-                    "documentType": "intervention",
-                    "uploadedBy": "quick_ingest",  # adapte si tu as l'user en session
-                    "uploadDate": datetime.now(),
-                    "interventionDate": intervention_date,
-                    "interventionDateSource": date_source,
-                    "source": "scan",
-                    "status": "ok",
-                    "qrRaw": qr_raw
-                })
-                results.append({"file": name, "status": "ok", "clientId": client_id})
+                if not self.queue.heartbeat(self.job_id, self.worker_id):
+                    return
             except Exception as e:
-                results.append({"file": name, "status": "error", "message": f"Upload/DB: {e}"})
-        else:
-            # pas de QR → parking unassigned
-            key = f"documents/unassigned/{_now_ts()}_{name.replace(' ', '_')}"
+                print(f"Erreur verrou du job d'ingestion {self.job_id} :", e)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+class _JobLost(Exception):
+    """Le job a été repris par un autre worker : celui-ci ne doit plus y écrire."""
+
+def _process_ingest_job(app, queue: IngestJobQueue, job: dict, done: set):
+    """
+    Analyse les fichiers d'un job sur le pool et les range dans l'ordre.
+    Les fichiers déjà rangés (job repris après un arrêt) sont ignorés ; done reçoit les
+    index des fichiers terminés. Lève _JobLost si le job n'appartient plus à ce worker.
+    """
+    db = app.config["MONGO_DB"]
+    mongo_uri = app.config["MONGO_URI"]
+    db_name = app.config["MONGO_DATABASE"]
+    job_id = str(job["_id"])
+    worker_id = job["workerId"]
+
+    def set_status(index, status, result=None):
+        if not queue.set_file_status(job_id, index, status, result, worker_id=worker_id):
+            raise _JobLost(job_id)
+
+    done.update(
+        index for index, f in enumerate(job["files"]) if f["status"] in ("stored", "duplicate", "error")
+    )
+    pending = [(index, f) for index, f in enumerate(job["files"]) if index not in done]
+
+    # Seuls les contenus inconnus partent à l'analyse (doublons en base ou dans le job exclus,
+    # résultats déjà présents dans le cache OCR/QR réutilisés)
+    cache = OcrResultCache(db)
+    cached = {}
+    futures = {}
+    seen_hashes = set()
+    for index, f in pending:
+        content_hash = f.get("contentHash")
+        if content_hash in seen_hashes or find_duplicate_document(db, content_hash):
+            continue
+        seen_hashes.add(content_hash)
+        analysis = cache.get(content_hash, INGEST_PIPELINE_VERSION)
+        if analysis is not None:
+            cached[index] = analysis
+            set_status(index, "ocr")
+            continue
+        futures[index] = _submit_analysis(
+            _analyze_job_file, mongo_uri, db_name, job_id, worker_id, index, f["spoolPath"]
+        )
+
+    for index, f in pending:
+        try:
+            analysis = cached.get(index)
+            if index in futures:
+                analysis = _analysis_result(
+                    futures[index], _analyze_job_file, mongo_uri, db_name, job_id, worker_id, index, f["spoolPath"]
+                )
+                if _cacheable(analysis):
+                    cache.put(f.get("contentHash"), INGEST_PIPELINE_VERSION, _cache_entry(analysis))
+            result = store_scan(db, f["file"], f["spoolPath"], analysis, job.get("createdBy") or "quick_ingest",
+                                content_hash=f.get("contentHash"))
+            status = {"error": "error", "duplicate": "duplicate"}.get(result["status"], "stored")
+        except _JobLost:
+            raise
+        except Exception as e:
+            status, result = "error", {"file": f["file"], "status": "error", "message": str(e)}
+        set_status(index, status, result)
+        done.add(index)
+
+def _run_ingest_job(app, queue: IngestJobQueue, job: dict):
+    """
+    Traite un job réservé, verrou rafraîchi pendant tout le traitement.
+    Un job qui échoue passe en "failed" (fichiers restants en erreur) au lieu de rester "running".
+    Le spool n'est supprimé que si ce worker détenait encore le job : sinon le worker qui
+    l'a repris est peut-être en train de le lire.
+    """
+    job_id = str(job["_id"])
+    worker_id = job["workerId"]
+    done = set()
+    status = "done"
+    with _JobHeartbeat(queue, job_id, worker_id):
+        try:
+            _process_ingest_job(app, queue, job, done)
+        except _JobLost:
+            print(f"Job d'ingestion {job_id} repris par un autre worker, abandonné par {worker_id}")
+            return
+        except Exception as e:
+            print(f"Erreur job d'ingestion {job_id} :", e)
+            status = "failed"
+            # Un job "failed" n'est jamais repris : ses fichiers non traités sont signalés en erreur
             try:
-                put_minio_object(key, pdf_bytes, "application/pdf")
-                doc_id = db.clientDocuments.insert_one({
-                    "clientId": None,
-                    "fileName": name,
-                    "objectPath": key,
-                    "filePath": key,
-                    "documentType": "intervention",
-                    "uploadedBy": "quick_ingest",
-                    "uploadDate": datetime.now(),
-                    "interventionDate": intervention_date,
-                    "interventionDateSource": date_source,
-                    "source": "scan",
-                    "status": "unassigned",
-                    "qrRaw": qr_raw
-                }).inserted_id
-                results.append({"file": name, "status": "unassigned", "docId": str(doc_id)})
-            except Exception as e:
-                results.append({"file": name, "status": "error", "message": f"Upload/DB: {e}"})
+                for index, f in enumerate(job["files"]):
+                    if index not in done:
+                        queue.set_file_status(job_id, index, "error",
+                                              {"file": f["file"], "status": "error", "message": f"Job interrompu : {e}"},
+                                              worker_id=worker_id)
+            except Exception as write_error:
+                print(f"Erreur mise à jour du job d'ingestion {job_id} :", write_error)
 
-    return jsonify({"results": results})
+    if queue.finish(job_id, status=status, worker_id=worker_id):
+        shutil.rmtree(job.get("spoolDir") or "", ignore_errors=True)
+
+def _ingest_job_worker(app, worker_id: str):
+    """Boucle d'un worker : réserve un job, le traite, recommence."""
+    queue = IngestJobQueue(app.config["MONGO_DB"])
+    while True:
+        try:
+            job = queue.claim_next(worker_id, INGEST_JOB_STALE_AFTER)
+        except Exception as e:
+            print("Erreur lecture ingestJobs :", e)
+            job = None
+
+        if not job:
+            time.sleep(INGEST_JOB_POLL_INTERVAL)
+            continue
+
+        try:
+            _run_ingest_job(app, queue, job)
+        except Exception as e:
+            print(f"Erreur job d'ingestion {job['_id']} :", e)
+            queue.finish(job["_id"], status="failed", worker_id=worker_id)
+
+def start_ingest_workers(app):
+    """
+    Démarre les threads qui consomment la collection ingestJobs (une fois par process).
+    Le travail CPU est délégué au pool de process d'analyse.
+    """
+    global _job_workers_started
+    if _job_workers_started or INGEST_JOB_WORKERS <= 0:
+        return
+    _job_workers_started = True
+
+    for i in range(INGEST_JOB_WORKERS):
+        worker_id = f"{socket.gethostname()}:{os.getpid()}:{i}"
+        threading.Thread(
+            target=_ingest_job_worker, args=(app, worker_id), daemon=True, name=f"ingest-job-{i}"
+        ).start()
 
 @ingest_bp.route("/api/assign_doc", methods=["PATCH"])
 def api_assign_doc():
@@ -217,108 +987,474 @@ def api_assign_doc():
     if doc.get("status") != "unassigned":
         return jsonify({"error": "Document déjà assigné"}), 400
 
-    src_key = doc["objectPath"]
-    filename = doc.get("fileName") or os.path.basename(src_key)
-    dst_key = f"documents/{client_id}/interventions/scans/{_now_ts()}_{filename.replace(' ', '_')}"
-
-    # copie + suppression (faute de "move" natif S3)
     try:
-        # copie
-        minio_client.copy_object(BUCKET_NAME, dst_key, f"/{BUCKET_NAME}/{src_key}")
-        # suppression source
-        minio_client.remove_object(BUCKET_NAME, src_key)
-        # MAJ Mongo
-        db.clientDocuments.update_one(
-            {"_id": doc["_id"]},
-            {"$set": {
-                "clientId": client_id,
-                "objectPath": dst_key,
-                "status": "ok",
-            }}
-        )
+        move_document_to_client(db, doc, client_id)
         return jsonify({"status": "ok"})
     except Exception as e:
         return jsonify({"error": f"Move failed: {e}"}), 500
 
+def _assigned_key(doc: dict, client_id: str) -> str:
+    filename = doc.get("fileName") or os.path.basename(doc["objectPath"])
+    return f"documents/{client_id}/interventions/scans/{_now_ts()}_{filename.replace(' ', '_')}"
+
+def move_document_to_client(db, doc: dict, client_id: str, extra_fields: dict | None = None) -> str:
+    """
+    Déplace un scan 'unassigned' sous documents/<clientId>/interventions/scans/
+    (copie + suppression, faute de "move" natif S3) et met à jour Mongo.
+    Retourne la nouvelle clé. Lève une exception en cas d'échec.
+    """
+    src_key = doc["objectPath"]
+    dst_key = _assigned_key(doc, client_id)
+
+    # Objet encore référencé par un document lié : on copie sans supprimer la source
+    shared = db.clientDocuments.count_documents(
+        {"_id": {"$ne": doc["_id"]}, "$or": [{"filePath": src_key}, {"objectPath": src_key}]}, limit=1
+    ) > 0
+
+    # copie
+    storage.copy(src_key, dst_key)
+    # suppression source
+    if not shared:
+        storage.delete(src_key)
+    # MAJ Mongo
+    db.clientDocuments.update_one(
+        {"_id": doc["_id"]},
+        {"$set": {
+            "clientId": client_id,
+            "objectPath": dst_key,
+            "filePath": dst_key,
+            "status": "ok",
+            **(extra_fields or {}),
+        }}
+    )
+    record_documents(db, [{**doc, **(extra_fields or {}), "clientId": client_id}])
+    return dst_key
+
+@ingest_bp.route("/api/assign_docs", methods=["POST"])
+def api_assign_docs():
+    """
+    Assignation en masse de PDF 'unassigned'.
+    Body JSON: { "items": [ { "docId": "...", "clientId": "..." }, ... ] }
+    Copies MinIO en parallèle (ASSIGN_COPY_WORKERS), chacune suivie de la mise à jour
+    conditionnelle (status "unassigned") de son document ; suppression des sources en un
+    seul appel remove_objects.
+    Retourne un résultat par élément, dans l'ordre reçu.
+    """
+    from bson import ObjectId
+
+    data = request.get_json(silent=True) or {}
+    items = data.get("items")
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "items requis"}), 400
+
+    db = current_app.config["MONGO_DB"]
+    results = [None] * len(items)
+
+    # 1) Validation + chargement des documents en une requête
+    ids = [ObjectId(item["docId"]) for item in items
+           if isinstance(item, dict) and ObjectId.is_valid(item.get("docId"))]
+    docs = {doc["_id"]: doc for doc in db.clientDocuments.find({"_id": {"$in": ids}})}
+
+    moves = []  # (index, doc, clientId, clé destination)
+    claimed = set()
+    for index, item in enumerate(items):
+        doc_id = item.get("docId") if isinstance(item, dict) else None
+        client_id = item.get("clientId") if isinstance(item, dict) else None
+        result = {"docId": doc_id, "clientId": client_id}
+        if not doc_id or not client_id:
+            results[index] = {**result, "status": "error", "message": "docId et clientId requis"}
+            continue
+        if not ObjectId.is_valid(doc_id):
+            results[index] = {**result, "status": "error", "message": "docId invalide"}
+            continue
+        doc = docs.get(ObjectId(doc_id))
+        if not doc:
+            results[index] = {**result, "status": "error", "message": "Document introuvable"}
+        elif doc.get("status") != "unassigned" or doc["_id"] in claimed:
+            results[index] = {**result, "status": "error", "message": "Document déjà assigné"}
+        else:
+            claimed.add(doc["_id"])
+            moves.append((index, doc, client_id, _assigned_key(doc, client_id)))
+
+    if not moves:
+        return jsonify({"results": results})
+
+    # 2) Sources encore référencées par un autre document (mode "link") : à conserver
+    src_keys = [doc["objectPath"] for _, doc, _, _ in moves]
+    moved_ids = {doc["_id"] for _, doc, _, _ in moves}
+    shared = set()
+    for other in db.clientDocuments.find(
+            {"_id": {"$nin": list(moved_ids)},
+             "$or": [{"filePath": {"$in": src_keys}}, {"objectPath": {"$in": src_keys}}]},
+            {"filePath": 1, "objectPath": 1}):
+        shared.update({other.get("filePath"), other.get("objectPath")})
+
+    # 3) Copies MinIO en parallèle, chacune suivie de la mise à jour de son document.
+    # Le filtre status "unassigned" fait de la mise à jour le verrou : un document assigné
+    # entre-temps par une autre requête n'est pas touché, sa source ni son résumé non plus.
+    def assign(move):
+        """Retourne None si le document est assigné, sinon le message d'erreur."""
+        _, doc, client_id, dst_key = move
+        try:
+            storage.copy(doc["objectPath"], dst_key)
+        except Exception as e:
+            return f"Copy failed: {e}"
+        try:
+            matched = db.clientDocuments.update_one(
+                {"_id": doc["_id"], "status": "unassigned"},
+                {"$set": {"clientId": client_id, "objectPath": dst_key, "filePath": dst_key, "status": "ok"}},
+            ).matched_count
+        except Exception as e:
+            print(f"Erreur mise à jour du document {doc['_id']} :", e)
+            return "Mise à jour Mongo impossible"
+        if not matched:
+            # Copie orpheline retirée, sauf si l'autre requête a rangé le document à la même clé
+            current = db.clientDocuments.find_one({"_id": doc["_id"]}, {"objectPath": 1})
+            if not current or current.get("objectPath") != dst_key:
+                try:
+                    storage.delete(dst_key)
+                except Exception as e:
+                    print(f"Suppression impossible de {dst_key} :", e)
+            return "Document déjà assigné"
+        return None
+
+    updated = []
+    with ThreadPoolExecutor(max_workers=ASSIGN_COPY_WORKERS) as executor:
+        for move, future in [(move, executor.submit(assign, move)) for move in moves]:
+            index, doc, client_id, _ = move
+            try:
+                error = future.result()
+            except Exception as e:
+                error = str(e)
+            if error:
+                results[index] = {"docId": str(doc["_id"]), "clientId": client_id,
+                                  "status": "error", "message": error}
+            else:
+                updated.append(move)
+
+    # 4) Suppression des sources déplacées, en un seul appel
+    to_remove = [doc["objectPath"] for _, doc, _, _ in updated if doc["objectPath"] not in shared]
+    for error in storage.delete_many(to_remove):
+        print(f"Suppression impossible de {error.name} : {error.message}")
+
+    for index, doc, client_id, dst_key in updated:
+        results[index] = {"docId": str(doc["_id"]), "clientId": client_id, "status": "ok", "objectPath": dst_key}
+    record_documents(db, [{**doc, "clientId": client_id} for _, doc, client_id, _ in updated])
+
+    return jsonify({"results": results})
+
+@ingest_bp.route("/api/reprocess_unassigned", methods=["POST"])
+def api_reprocess_unassigned():
+    """
+    Relance l'analyse QR + date sur les scans de documents/unassigned/.
+    Les résultats déjà calculés avec la même version de pipeline sont lus dans le cache OCR/QR.
+    Un scan dont le QR donne désormais un client est déplacé chez ce client.
+    Body JSON optionnel: { "limit": 100 }
+    """
+    data = request.get_json(silent=True) or {}
+    limit = int(data.get("limit", 100))
+
+    db = current_app.config["MONGO_DB"]
+    docs = list(db.clientDocuments.find({"status": "unassigned"}).sort("uploadDate", 1).limit(limit))
+
+    # Un scan en erreur (téléchargement, analyse, déplacement) est signalé dans son résultat,
+    # sans interrompre le traitement des suivants
+    results = [None] * len(docs)
+
+    # Scans téléchargés sur disque (jamais gardés en mémoire dans ce process)
+    spool_dir = _new_spool_dir()
+    try:
+        downloaded = []
+        for i, doc in enumerate(docs):
+            pdf_path = os.path.join(spool_dir, f"{i}.pdf")
+            try:
+                storage.download_file(doc["objectPath"], pdf_path)
+                downloaded.append((i, doc.get("contentHash") or sha256_file(pdf_path), pdf_path))
+            except Exception as e:
+                results[i] = {"docId": str(doc["_id"]), "status": "error", "message": f"Téléchargement : {e}"}
+        analyses = analyze_pdfs_cached(
+            db, [(content_hash, pdf_path) for _, content_hash, pdf_path in downloaded], return_exceptions=True
+        )
+    finally:
+        shutil.rmtree(spool_dir, ignore_errors=True)
+
+    for (i, content_hash, _), analysis in zip(downloaded, analyses):
+        doc = docs[i]
+        if isinstance(analysis, Exception):
+            results[i] = {"docId": str(doc["_id"]), "status": "error", "message": f"Analyse : {analysis}"}
+            continue
+        try:
+            fields = {
+                "contentHash": content_hash,
+                "interventionDate": analysis["interventionDate"] or doc.get("interventionDate"),
+                "interventionDateSource": analysis["interventionDateSource"],
+                "qrRaw": analysis["qrRaw"],
+            }
+            if not doc.get("thumbnailPath") and analysis.get("thumbnail"):
+                fields["thumbnailPath"] = ensure_thumbnail(
+                    db, content_hash, None, doc.get("fileName") or "scan.pdf", analysis["thumbnail"]
+                )
+            if analysis["clientId"]:
+                move_document_to_client(db, doc, analysis["clientId"], fields)
+                results[i] = {"docId": str(doc["_id"]), "status": "ok", "clientId": analysis["clientId"]}
+            else:
+                db.clientDocuments.update_one({"_id": doc["_id"]}, {"$set": fields})
+                results[i] = {"docId": str(doc["_id"]), "status": "unassigned"}
+        except Exception as e:
+            results[i] = {"docId": str(doc["_id"]), "status": "error", "message": str(e)}
+
+    return jsonify({"results": results})
+
+# ----- Moteurs OCR -----
+class PytesseractBackend:
+    """
+    OCR via le binaire tesseract : un process est lancé à chaque appel,
+    l'image passe par un fichier temporaire et le modèle de langue est rechargé.
+    Toujours disponible, sert de secours.
+    """
+    name = "pytesseract"
+
+    def __init__(self, lang: str = OCR_LANG):
+        self.lang = lang
+
+    def image_to_string(self, image: Image.Image) -> str:
+        return pytesseract.image_to_string(image, lang=self.lang)
+
+class TesserocrBackend:
+    """
+    OCR via l'API C de Tesseract (paquet tesserocr, optionnel).
+    Le modèle de langue est chargé une seule fois et reste en mémoire ;
+    les images sont passées directement, sans fichier temporaire ni process.
+    """
+    name = "tesserocr"
+
+    def __init__(self, lang: str = OCR_LANG):
+        import tesserocr
+        self._api = tesserocr.PyTessBaseAPI(lang=lang)
+        # Une instance PyTessBaseAPI ne doit pas être utilisée par deux threads à la fois
+        self._lock = threading.Lock()
+        self._fallback = PytesseractBackend(lang)
+
+    def image_to_string(self, image: Image.Image) -> str:
+        try:
+            with self._lock:
+                self._api.SetImage(image)
+                return self._api.GetUTF8Text()
+        except Exception as e:
+            print("Erreur tesserocr, secours pytesseract :", e)
+            return self._fallback.image_to_string(image)
+
+def get_ocr_backend(name: str = OCR_BACKEND):
+    """
+    Moteur OCR du process courant, créé au premier appel puis conservé.
+    Chaque process du pool d'analyse garde ainsi son propre worker OCR chargé
+    pendant toute sa durée de vie (jamais hérité d'un fork).
+    """
+    key = (os.getpid(), name)
+    if key not in _ocr_backends:
+        backend = None
+        if name in ("auto", "tesserocr"):
+            try:
+                backend = TesserocrBackend()
+            except Exception as e:
+                print("tesserocr indisponible, secours pytesseract :", e)
+        _ocr_backends[key] = backend or PytesseractBackend()
+        print(f"Moteur OCR du process {os.getpid()} : {_ocr_backends[key].name} (OCR_BACKEND={name})")
+    return _ocr_backends[key]
+
+# ----- Moteurs d'extraction de texte -----
+class PyPDF2TextBackend:
+    """
+    Extraction en pur Python : toujours disponible, mais lente sur les gros PDF générés.
+    """
+    name = "pypdf2"
+
+    def extract_text(self, pdf: bytes | str, max_pages: int = PDF_TEXT_PAGES) -> str:
+        reader = PdfReader(pdf if isinstance(pdf, str) else io.BytesIO(pdf))
+        texts = [pdf_page.extract_text() or "" for pdf_page in reader.pages[:max_pages]]
+        return "\n".join(texts).strip()
+
+class PdftotextBackend:
+    """
+    Extraction via le binaire pdftotext de Poppler (même paquet que pdftoppm).
+    Le process est tué au-delà de PDF_TEXT_TIMEOUT.
+    """
+    name = "pdftotext"
+
+    def __init__(self, timeout: float = PDF_TEXT_TIMEOUT):
+        self.binary = shutil.which("pdftotext")
+        if not self.binary:
+            raise RuntimeError("pdftotext introuvable (paquet poppler-utils)")
+        self.timeout = timeout
+
+    def extract_text(self, pdf: bytes | str, max_pages: int = PDF_TEXT_PAGES) -> str:
+        if isinstance(pdf, str):
+            return self._run(pdf, max_pages)
+        # Contenu en mémoire : pdftotext ne lit qu'un fichier
+        with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+            tmp.write(pdf)
+            tmp.flush()
+            return self._run(tmp.name, max_pages)
+
+    def _run(self, pdf_path: str, max_pages: int) -> str:
+        completed = subprocess.run(
+            [self.binary, "-q", "-layout", "-enc", "UTF-8", "-f", "1", "-l", str(max_pages), pdf_path, "-"],
+            capture_output=True, timeout=self.timeout, check=True,
+        )
+        return completed.stdout.decode("utf-8", errors="replace").strip()
+
+_text_backends = {}
+
+def get_text_backends(name: str = PDF_TEXT_BACKEND) -> list:
+    """
+    Moteurs d'extraction de texte, par ordre d'essai : le moteur configuré,
+    puis l'autre en secours (un PDF numérique ne doit pas finir en OCR
+    parce qu'un moteur a échoué ou dépassé son délai).
+    """
+    if name not in _text_backends:
+        backends = [PyPDF2TextBackend()]
+        try:
+            pdftotext = PdftotextBackend()
+            if name in ("auto", "pdftotext"):
+                backends.insert(0, pdftotext)
+            else:
+                backends.append(pdftotext)
+        except RuntimeError as e:
+            if name == "pdftotext":
+                print("pdftotext indisponible, secours PyPDF2 :", e)
+        _text_backends[name] = backends
+    return _text_backends[name]
+
+def extract_pdf_text(pdf: bytes | str, max_pages: int = PDF_TEXT_PAGES) -> str:
+    """
+    Texte natif des premières pages ("" pour un scan sans couche texte).
+    pdf : contenu du PDF ou chemin sur disque.
+    Passe au moteur suivant seulement en cas d'erreur ou de dépassement de délai.
+    """
+    for backend in get_text_backends():
+        try:
+            return backend.extract_text(pdf, max_pages)
+        except Exception as e:
+            print(f"Erreur extraction texte PDF ({backend.name}) :", e)
+    return ""
+
+# dd/mm/yyyy, dd-mm-yy... (même séparateur des deux côtés) ou yyyy-mm-dd, en une seule passe
+_DATE_RE = re.compile(
+    r"\b(?:(?P<day>\d{2})(?P<sep>[/-])(?P<month>\d{2})(?P=sep)(?P<year>\d{4}|\d{2})"
+    r"|(?P<iso_year>\d{4})-(?P<iso_month>\d{2})-(?P<iso_day>\d{2}))\b"
+)
+# Mots-clés annonçant la date d'intervention ; "specific" l'emporte sur un simple "date"
+_DATE_KEYWORD_RE = re.compile(
+    r"(?P<specific>date\s+d['’]\s*intervention|date\s+d[eu]\s+passage|intervention\s+du)|\bdate\b",
+    re.IGNORECASE,
+)
+
+def _date_from_match(match: re.Match) -> str | None:
+    """Convertit une correspondance de _DATE_RE en YYYY-MM-DD (None si la date n'existe pas)."""
+    if match.group("iso_year"):
+        year, month, day = match.group("iso_year", "iso_month", "iso_day")
+    else:
+        day, month, year = match.group("day", "month", "year")
+    year = int(year)
+    if year < 100:
+        # Même pivot que strptime %y : 69-99 -> 19xx, 00-68 -> 20xx
+        year += 1900 if year >= 69 else 2000
+    try:
+        return date(year, int(month), int(day)).isoformat()
+    except ValueError:
+        return None
+
 def extract_date_from_text(text: str) -> str | None:
     """
-    Cherche une date dans différents formats et la renvoie au format YYYY-MM-DD.
+    Cherche une date (dd/mm/yyyy, dd-mm-yyyy, yyyy-mm-dd, dd/mm/yy, dd-mm-yy)
+    et la renvoie au format YYYY-MM-DD.
+    Priorité aux dates qui suivent de près "date d'intervention" (ou "date de passage"),
+    puis à celles qui suivent un simple "date", puis à la première date du texte.
     """
     if not text:
         return None
 
-    patterns = [
-        r"\b(\d{2}/\d{2}/\d{4})\b",
-        r"\b(\d{2}-\d{2}-\d{4})\b",
-        r"\b(\d{4}-\d{2}-\d{2})\b",
-        r"\b(\d{2}/\d{2}/\d{2})\b",
-        r"\b(\d{2}-\d{2}-\d{2})\b",
-    ]
+    keywords = [(m.end(), 0 if m.group("specific") else 1) for m in _DATE_KEYWORD_RE.finditer(text)]
 
-    for pattern in patterns:
-        match = re.search(pattern, text)
-        if match:
-            raw = match.group(1)
+    best = None
+    for match in _DATE_RE.finditer(text):
+        found = _date_from_match(match)
+        if not found:
+            continue
+        near = [
+            (keyword_rank, match.start() - keyword_end)
+            for keyword_end, keyword_rank in keywords
+            if 0 <= match.start() - keyword_end <= DATE_KEYWORD_WINDOW
+        ]
+        score = (*min(near, default=(2, 0)), match.start())
+        if best is None or score < best[0]:
+            best = (score, found)
+        if score[:2] == (0, 0):
+            break
 
-            # Essais de parsing selon plusieurs formats
-            for fmt in ("%d/%m/%Y", "%d-%m-%Y", "%Y-%m-%d", "%d/%m/%y", "%d-%m-%y"):
-                try:
-                    dt = datetime.strptime(raw, fmt)
-                    return dt.strftime("%Y-%m-%d")
-                except ValueError:
-                    pass
+    return best[1] if best else None
 
-    return None
+def ocr_date_zones(page: Image.Image, zones: tuple = INTERVENTION_DATE_ZONES,
+                   dpi: int = DATE_ZONE_OCR_DPI) -> str:
+    """
+    OCR des seules zones du formulaire où figure la date, à résolution réduite.
+    page : rendu à INGEST_RENDER_DPI (render_first_page).
+    """
+    scale = min(dpi / INGEST_RENDER_DPI, 1.0)
+    width, height = page.size
+    texts = []
+    for x0, y0, x1, y1 in zones:
+        crop = page.crop((int(x0 * width), int(y0 * height), int(x1 * width), int(y1 * height)))
+        if scale < 1.0:
+            crop = crop.resize((max(int(crop.width * scale), 1), max(int(crop.height * scale), 1)))
+        texts.append(get_ocr_backend().image_to_string(crop).strip())
+    return "\n".join(t for t in texts if t)
 
-def extract_intervention_date_from_pdf(pdf_bytes: bytes) -> dict:
+def extract_intervention_date_from_pdf(pdf: bytes | str, page: Image.Image | None = None) -> dict:
     """
-    Cherche la date d'intervention dans un PDF.
+    Cherche la date d'intervention dans un PDF (contenu ou chemin sur disque).
     1. Tente d'abord une extraction texte native
-    2. Si échec, considère que c'est un scan et fait OCR sur la première page
+    2. Si échec, considère que c'est un scan : OCR des zones INTERVENTION_DATE_ZONES,
+       puis OCR de toute la première page seulement si les zones ne donnent pas de date
+    page : rendu déjà calculé par render_first_page (sinon la page est rendue ici).
     """
     # --- Étape 1 : extraction texte native ---
-    try:
-        reader = PdfReader(io.BytesIO(pdf_bytes))
-        extracted_text = ""
+    extracted_text = extract_pdf_text(pdf)
 
-        for page in reader.pages[:2]:
-            page_text = page.extract_text()
-            if page_text:
-                extracted_text += "\n" + page_text
-
-        extracted_text = extracted_text.strip()
-
-        if extracted_text and len(extracted_text) > 20:
-            found_date = extract_date_from_text(extracted_text)
-            if found_date:
-                return {
-                    "interventionDate": found_date,
-                    "source": "pdf_text",
-                    "rawText": extracted_text
-                }
-    except Exception as e:
-        print("Erreur extraction texte PDF :", e)
+    if extracted_text and len(extracted_text) > 20:
+        found_date = extract_date_from_text(extracted_text)
+        if found_date:
+            return {
+                "interventionDate": found_date,
+                "source": "pdf_text",
+                "rawText": extracted_text
+            }
 
     # --- Étape 2 : OCR sur image si PDF scanné ---
     try:
-        pages = convert_from_bytes(pdf_bytes, first_page=1, last_page=1, fmt="png")
-        print("Nombre de pages converties OCR :", len(pages))
+        if page is None:
+            page = render_first_page(pdf)
 
-        if not pages:
+        if page is None:
             return {
                 "interventionDate": None,
                 "source": "none",
                 "rawText": ""
             }
 
-        page: Image.Image = pages[0]
+        if INTERVENTION_DATE_ZONES:
+            zone_text = ocr_date_zones(page)
+            found_date = extract_date_from_text(zone_text)
+            if found_date:
+                return {
+                    "interventionDate": found_date,
+                    "source": "ocr_zone",
+                    "rawText": zone_text
+                }
 
-        ocr_text = pytesseract.image_to_string(page, lang="fra")
+        ocr_text = get_ocr_backend().image_to_string(page)
         ocr_text = ocr_text.strip()
 
-        print("Texte OCR extrait :")
-        print(ocr_text[:1000])
-
         found_date = extract_date_from_text(ocr_text)
 
         return {
@@ -0,0 +1,176 @@
+from flask import Blueprint, request, jsonify, current_app, session, redirect, abort
+from bson import ObjectId
+from models import storage
+from routes.auth import login_required
+
+objects_bp = Blueprint("objects", __name__)
+
+# Nombre max d'identifiants par appel à l'API de signature groupée
+PRESIGN_BATCH_MAX = 200
+
+
+def can_access_client(client_id) -> bool:
+    """
+    Utilisateur interne connecté : accès à tous les clients.
+    Utilisateur du portail client : accès à son seul client.
+    """
+    if "user_id" in session:
+        return True
+    return bool(session.get("client_id")) and str(client_id) == str(session["client_id"])
+
+
+def _object_key(doc: dict, *fields) -> str | None:
+    for field in fields:
+        if doc.get(field):
+            return doc[field]
+    return None
+
+
+def _redirect_to_object(key: str, download_name: str | None):
+    """Redirige vers une URL signée (mise en cache) ; la redirection elle-même n'est jamais mise en cache."""
+    expiry = "download" if download_name else "view"
+    response = redirect(storage.presign_cached(key, expiry, download_name=download_name))
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+def _find_for_session(collection, object_id: str, projection: dict):
+    """Charge un document / plan et vérifie que la session y a accès (404 / 403 sinon)."""
+    if not ObjectId.is_valid(object_id):
+        abort(404)
+    if "user_id" not in session and "client_id" not in session:
+        abort(401)
+    doc = collection.find_one({"_id": ObjectId(object_id)}, projection)
+    if not doc:
+        abort(404)
+    if not can_access_client(doc.get("clientId")):
+        abort(403)
+    return doc
+
+
+@objects_bp.route("/obj/<document_id>")
+def document_object(document_id):
+    """
+    Lien stable vers le fichier d'un document client : l'URL signée n'est générée
+    qu'au moment où le lien est suivi. ?download=1 force le téléchargement.
+    """
+    db = current_app.config["MONGO_DB"]
+    doc = _find_for_session(
+        db.clientDocuments, document_id, {"clientId": 1, "filePath": 1, "objectPath": 1, "fileName": 1}
+    )
+    key = _object_key(doc, "filePath", "objectPath")
+    if not key:
+        abort(404)
+    download_name = (doc.get("fileName") or "document") if request.args.get("download") else None
+    return _redirect_to_object(key, download_name)
+
+
+@objects_bp.route("/obj/<document_id>/thumbnail")
+def document_thumbnail(document_id):
+    """Vignette WebP de la 1ère page d'un document (voir models/thumbnails.py)."""
+    db = current_app.config["MONGO_DB"]
+    doc = _find_for_session(db.clientDocuments, document_id, {"clientId": 1, "thumbnailPath": 1})
+    if not doc.get("thumbnailPath"):
+        abort(404)
+    return _redirect_to_object(doc["thumbnailPath"], None)
+
+
+@objects_bp.route("/obj/floorplan/<plan_id>")
+def floorplan_object(plan_id):
+    """Comme /obj/<document_id>, pour le fichier d'un plan d'étage."""
+    db = current_app.config["MONGO_DB"]
+    plan = _find_for_session(db.floorPlans, plan_id, {"clientId": 1, "imagePath": 1, "fileName": 1})
+    if not plan.get("imagePath"):
+        abort(404)
+    download_name = (plan.get("fileName") or "plan") if request.args.get("download") else None
+    return _redirect_to_object(plan["imagePath"], download_name)
+
+
+@objects_bp.route("/obj/floorplan/<plan_id>/preview")
+def floorplan_preview(plan_id):
+    """Aperçu WebP réduit d'un plan ; fichier d'origine tant que l'aperçu n'est pas généré."""
+    db = current_app.config["MONGO_DB"]
+    plan = _find_for_session(db.floorPlans, plan_id, {"clientId": 1, "imagePath": 1, "previewPath": 1})
+    key = _object_key(plan, "previewPath", "imagePath")
+    if not key:
+        abort(404)
+    return _redirect_to_object(key, None)
+
+
+@objects_bp.route("/obj/floorplan/<plan_id>/tiles/<int:level>/<int:col>_<int:row>.webp")
+def floorplan_tile(plan_id, level, col, row):
+    """Une tuile de la pyramide d'un plan (voir models/floorplan_tiles.py)."""
+    db = current_app.config["MONGO_DB"]
+    plan = _find_for_session(db.floorPlans, plan_id, {"clientId": 1, "tiles": 1})
+    tiles = plan.get("tiles")
+    if not tiles or not tiles["minLevel"] <= level <= tiles["maxLevel"]:
+        abort(404)
+    return _redirect_to_object(f"{tiles['prefix']}/{level}/{col}_{row}.{tiles['format']}", None)
+
+
+@objects_bp.route("/obj/key")
+@login_required
+def raw_object():
+    """Objet désigné directement par sa clé (explorateur MinIO) : utilisateurs internes seulement."""
+    key = request.args.get("key")
+    if not key:
+        abort(400)
+    return _redirect_to_object(key, None)
+
+
+@objects_bp.route("/api/obj/presign", methods=["POST"])
+def api_presign_objects():
+    """
+    Signature groupée, à la demande (portail client, aperçus chargés en JavaScript).
+    Body JSON: { "documents": ["id", ...], "floorplans": ["id", ...], "download": false }
+    Réponse : { "documents": {id: url | null}, "floorplans": {id: url | null} }
+    null : identifiant inconnu, sans fichier ou non autorisé pour la session.
+    """
+    if "user_id" not in session and "client_id" not in session:
+        return jsonify({"error": "Non authentifié"}), 401
+
+    data = request.get_json(silent=True) or {}
+    document_ids = [i for i in data.get("documents") or [] if isinstance(i, str)]
+    plan_ids = [i for i in data.get("floorplans") or [] if isinstance(i, str)]
+    if len(document_ids) + len(plan_ids) > PRESIGN_BATCH_MAX:
+        return jsonify({"error": f"{PRESIGN_BATCH_MAX} identifiants maximum"}), 400
+    download = bool(data.get("download"))
+
+    db = current_app.config["MONGO_DB"]
+
+    def sign_all(collection, ids, key_fields, default_name):
+        urls = dict.fromkeys(ids)
+        valid = [ObjectId(i) for i in ids if ObjectId.is_valid(i)]
+        if not valid:
+            return urls
+        projection = {"clientId": 1, "fileName": 1, **{field: 1 for field in key_fields}}
+        for doc in collection.find({"_id": {"$in": valid}}, projection):
+            key = _object_key(doc, *key_fields)
+            if not key or not can_access_client(doc.get("clientId")):
+                continue
+            download_name = (doc.get("fileName") or default_name) if download else None
+            urls[str(doc["_id"])] = storage.presign_cached(
+                key, "download" if download else "view", download_name=download_name
+            )
+        return urls
+
+    return jsonify({
+        "documents": sign_all(db.clientDocuments, document_ids, ("filePath", "objectPath"), "document"),
+        "floorplans": sign_all(db.floorPlans, plan_ids, ("imagePath",), "plan"),
+    })
+
+
+@objects_bp.route("/api/storage/clients/<client_id>/usage")
+def api_client_storage_usage(client_id):
+    """
+    Espace occupé par un client dans le bucket (nombre d'objets, octets, détail par préfixe),
+    lu dans l'index storageObjects plutôt qu'en parcourant le bucket.
+    """
+    if "user_id" not in session and "client_id" not in session:
+        return jsonify({"error": "Non authentifié"}), 401
+    if not can_access_client(client_id):
+        return jsonify({"error": "Accès refusé"}), 403
+    index = storage.get_object_index()
+    if index is None:
+        return jsonify({"error": "Index storageObjects indisponible"}), 503
+    return jsonify(index.client_usage(client_id))
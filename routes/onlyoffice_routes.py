@@ -1,7 +1,10 @@
 import os
 import jwt
-from flask import Blueprint, render_template, request, jsonify
+from bson import ObjectId
+from flask import Blueprint, render_template, request, jsonify, current_app
 from dotenv import load_dotenv
+from models import storage
+from routes.objects import can_access_client
 
 load_dotenv()
 
@@ -12,9 +15,28 @@ ONLYOFFICE_URL = os.getenv("ONLYOFFICE_URL", "https://docs.ahc-digital.com")
 
 @onlyoffice_bp.route("/view_doc")
 def view_doc():
+    """
+    Ouvre un document dans OnlyOffice.
+    ?plan_id=... : plan d'étage, l'URL signée (lue par le serveur OnlyOffice) n'est générée qu'ici.
+    ?file_url=...&file_name=... : URL déjà fournie par l'appelant.
+    """
     file_url = request.args.get("file_url")
     file_name = request.args.get("file_name", "document.docx")
 
+    plan_id = request.args.get("plan_id")
+    if plan_id:
+        if not ObjectId.is_valid(plan_id):
+            return "Plan introuvable", 404
+        plan = current_app.config["MONGO_DB"].floorPlans.find_one(
+            {"_id": ObjectId(plan_id)}, {"clientId": 1, "imagePath": 1, "fileName": 1}
+        )
+        if not plan or not plan.get("imagePath"):
+            return "Plan introuvable", 404
+        if not can_access_client(plan.get("clientId")):
+            return "Accès refusé", 403
+        file_url = storage.presign_cached(plan["imagePath"])
+        file_name = plan.get("fileName") or file_name
+
     if not file_url:
         return "URL du document manquante", 400
 
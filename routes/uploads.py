@@ -0,0 +1,254 @@
+from flask import Blueprint, request, jsonify, current_app, session, url_for
+import os, shutil, tempfile, uuid
+from datetime import timedelta
+from bson import ObjectId
+from models.ClientDocumentManager import ClientDocumentManager
+from models.ingest_job import IngestJobQueue
+from models.upload_session import UPLOAD_TARGETS, UploadSessionStore
+from models.utils.file_utils import CHUNK_SIZE, sha256_file
+from routes.auth import login_required
+from routes.ingest import ingest_batch, ingest_pdfs, _new_spool_dir
+
+uploads_bp = Blueprint("uploads", __name__)
+
+# ----- Uploads reprenables (protocole inspiré de tus) -----
+# 1. POST   /api/uploads                     {fileName, length, target, ...} -> uploadId
+# 2. PATCH  /api/uploads/<id>                corps brut, en-tête Upload-Offset (à répéter jusqu'à length)
+#    HEAD   /api/uploads/<id>                Upload-Offset confirmé, pour reprendre après une coupure
+# 3. POST   /api/uploads/<id>/finalize       passe le fichier au pipeline d'ingestion ou de documents
+UPLOAD_SESSION_DIR = os.getenv("UPLOAD_SESSION_DIR", os.path.join(tempfile.gettempdir(), "ahc_upload_sessions"))
+UPLOAD_SESSION_TTL = timedelta(hours=int(os.getenv("UPLOAD_SESSION_TTL_HOURS", "24")))
+# Taille max d'un fichier envoyé par cette API (Mo)
+UPLOAD_MAX_LENGTH = int(os.getenv("UPLOAD_MAX_LENGTH_MB", "2048")) * 1024 * 1024
+
+
+def _store(db):
+    return UploadSessionStore(db, UPLOAD_SESSION_DIR, UPLOAD_SESSION_TTL)
+
+
+def _offset_headers(upload):
+    return {
+        "Upload-Offset": str(upload["offset"]),
+        "Upload-Length": str(upload["length"]),
+        "Cache-Control": "no-store",
+    }
+
+
+def _upload_json(upload):
+    return {
+        "uploadId": str(upload["_id"]),
+        "fileName": upload["fileName"],
+        "target": upload["target"],
+        "length": upload["length"],
+        "offset": upload["offset"],
+        "status": upload["status"],
+        "result": upload.get("result"),
+    }
+
+
+def _load_upload(upload_id):
+    """Retourne (store, session) ou (None, réponse d'erreur)."""
+    if not ObjectId.is_valid(upload_id):
+        return None, (jsonify({"error": "uploadId invalide"}), 400)
+    store = _store(current_app.config["MONGO_DB"])
+    upload = store.get(upload_id)
+    if not upload:
+        return None, (jsonify({"error": "Upload introuvable"}), 404)
+    return store, upload
+
+
+@uploads_bp.route("/api/uploads", methods=["POST"])
+@login_required
+def api_create_upload():
+    """
+    Ouvre une session d'upload reprenable.
+    Body JSON: { "fileName": "...", "length": 1234, "target": "ingest" | "batch" | "document",
+                 "clientId": "...", "documentType": "...", "dedupMode": "copy" | "link" }
+    clientId et documentType ne servent qu'à la destination "document".
+    """
+    data = request.get_json(silent=True) or {}
+    file_name = (data.get("fileName") or "").strip()
+    target = data.get("target", "ingest")
+    try:
+        length = int(data.get("length"))
+    except (TypeError, ValueError):
+        return jsonify({"error": "length requis"}), 400
+
+    if not file_name:
+        return jsonify({"error": "fileName requis"}), 400
+    if target not in UPLOAD_TARGETS:
+        return jsonify({"error": f"target doit valoir {', '.join(UPLOAD_TARGETS)}"}), 400
+    if length <= 0:
+        return jsonify({"error": "Le fichier est vide."}), 400
+    if length > UPLOAD_MAX_LENGTH:
+        return jsonify({"error": "Fichier trop volumineux"}), 413
+    if target in ("ingest", "batch") and not file_name.lower().endswith(".pdf"):
+        return jsonify({"error": "Seuls les PDF sont acceptés"}), 400
+
+    metadata = {}
+    if target == "document":
+        if not data.get("clientId") or not data.get("documentType"):
+            return jsonify({"error": "clientId et documentType requis"}), 400
+        metadata = {
+            "clientId": data["clientId"],
+            "documentType": data["documentType"],
+            "dedupMode": data.get("dedupMode"),
+            "contentType": data.get("contentType") or "application/octet-stream",
+        }
+
+    store = _store(current_app.config["MONGO_DB"])
+    store.purge_expired()
+    upload = store.create(file_name, length, target, session.get("username"), metadata)
+
+    location = url_for("uploads.api_upload_chunk", upload_id=str(upload["_id"]))
+    headers = dict(_offset_headers(upload), Location=location)
+    return jsonify(dict(_upload_json(upload), uploadUrl=location)), 201, headers
+
+
+@uploads_bp.route("/api/uploads/<upload_id>", methods=["HEAD", "GET"])
+@login_required
+def api_upload_status(upload_id):
+    """Offset confirmé d'une session : le client reprend l'envoi à partir de là."""
+    store, upload = _load_upload(upload_id)
+    if store is None:
+        return upload
+    if request.method == "HEAD":
+        return "", 200, _offset_headers(upload)
+    return jsonify(_upload_json(upload)), 200, _offset_headers(upload)
+
+
+@uploads_bp.route("/api/uploads/<upload_id>", methods=["PATCH"])
+@login_required
+def api_upload_chunk(upload_id):
+    """
+    Ajoute un morceau au fichier. L'en-tête Upload-Offset doit être égal à l'offset confirmé
+    (sinon 409 avec l'offset attendu). Si la connexion tombe en cours de morceau,
+    les octets déjà reçus sont conservés et l'offset avance d'autant.
+    """
+    store, upload = _load_upload(upload_id)
+    if store is None:
+        return upload
+    if upload["status"] != "open":
+        return jsonify({"error": "Upload déjà finalisé"}), 409, _offset_headers(upload)
+
+    try:
+        offset = int(request.headers["Upload-Offset"])
+    except (KeyError, ValueError):
+        return jsonify({"error": "En-tête Upload-Offset requis"}), 400
+    if offset != upload["offset"]:
+        return jsonify({"error": "Offset inattendu", "offset": upload["offset"]}), 409, _offset_headers(upload)
+
+    remaining = upload["length"] - offset
+    if request.content_length is not None and request.content_length > remaining:
+        return jsonify({"error": "Le morceau dépasse la taille annoncée"}), 413, _offset_headers(upload)
+
+    token = uuid.uuid4().hex
+    if not store.begin_write(upload_id, offset, token):
+        # Un autre envoi est en cours ou vient de faire avancer l'offset
+        upload = store.get(upload_id)
+        return jsonify({"error": "Envoi concurrent", "offset": upload["offset"]}), 409, _offset_headers(upload)
+
+    written = 0
+    error = None
+    with open(upload["path"], "r+b") as fh:
+        # Les octets au-delà de l'offset confirmé viennent d'un envoi interrompu : ils sont réécrits
+        fh.seek(offset)
+        fh.truncate()
+        try:
+            for chunk in iter(lambda: request.stream.read(CHUNK_SIZE), b""):
+                chunk = chunk[:remaining - written]
+                fh.write(chunk)
+                written += len(chunk)
+                if written == remaining:
+                    break
+        except Exception as e:
+            error = e
+        fh.flush()
+        os.fsync(fh.fileno())
+
+    upload = store.end_write(upload_id, token, offset + written)
+    if upload is None:
+        upload = store.get(upload_id)
+        return jsonify({"error": "Verrou d'écriture perdu", "offset": upload["offset"]}), 409, _offset_headers(upload)
+    if error is not None:
+        print(f"Upload {upload_id} interrompu à {offset + written} octets :", error)
+        return jsonify({"error": "Envoi interrompu", "offset": upload["offset"]}), 400, _offset_headers(upload)
+    return "", 204, _offset_headers(upload)
+
+
+@uploads_bp.route("/api/uploads/<upload_id>", methods=["DELETE"])
+@login_required
+def api_delete_upload(upload_id):
+    """Abandonne une session et supprime les octets reçus."""
+    store, upload = _load_upload(upload_id)
+    if store is None:
+        return upload
+    if upload["status"] == "finalizing":
+        return jsonify({"error": "Finalisation en cours"}), 409
+    store.delete(upload)
+    return "", 204
+
+
+@uploads_bp.route("/api/uploads/<upload_id>/finalize", methods=["POST"])
+@login_required
+def api_finalize_upload(upload_id):
+    """
+    Passe le fichier complet au pipeline choisi à la création de la session :
+      - ingest   : scan d'intervention (QR + date) ; avec {"mode": "job"}, un job d'ingestion est
+                   créé et la réponse 202 donne son jobId, comme /api/ingest_docs
+      - batch    : lot découpé aux pages portant un QR, comme /api/ingest_batch
+      - document : document client, comme /upload_document/<client_id>
+    Une session déjà finalisée renvoie le même résultat (finalisation rejouable).
+    """
+    store, upload = _load_upload(upload_id)
+    if store is None:
+        return upload
+    if upload["status"] == "done":
+        return jsonify(_upload_json(upload))
+    if upload["offset"] != upload["length"]:
+        return jsonify({"error": "Upload incomplet", "offset": upload["offset"]}), 409, _offset_headers(upload)
+    if not store.mark(upload_id, "finalizing", from_status="open"):
+        return jsonify({"error": "Finalisation déjà en cours"}), 409
+
+    db = current_app.config["MONGO_DB"]
+    data = request.get_json(silent=True) or {}
+    name = upload["fileName"]
+    uploaded_by = upload.get("createdBy") or "quick_ingest"
+    status_code = 200
+    try:
+        content_hash = sha256_file(upload["path"])
+        if upload["target"] == "ingest" and data.get("mode") == "job":
+            # Le fichier rejoint un répertoire de spool, supprimé par le worker à la fin du job
+            spool_dir = _new_spool_dir()
+            spool_path = os.path.join(spool_dir, os.path.basename(upload["path"]))
+            shutil.move(upload["path"], spool_path)
+            job_id = IngestJobQueue(db).create_job(
+                [{"file": name, "spoolPath": spool_path, "contentHash": content_hash}], spool_dir, uploaded_by
+            )
+            result = {
+                "jobId": str(job_id),
+                "statusUrl": url_for("ingest.api_ingest_job_status", job_id=str(job_id)),
+            }
+            status_code = 202
+        elif upload["target"] == "ingest":
+            result = {"results": ingest_pdfs(db, [(name, upload["path"], content_hash)], uploaded_by)}
+        elif upload["target"] == "batch":
+            result = {"results": ingest_batch(db, name, upload["path"], content_hash, uploaded_by)}
+        else:
+            metadata = upload["metadata"]
+            result = ClientDocumentManager(db).store_file(
+                metadata["clientId"], upload["path"], name, metadata.get("contentType"), uploaded_by,
+                metadata["documentType"], content_hash=content_hash, file_size=upload["length"],
+                dedup_mode=metadata.get("dedupMode"),
+            )
+    except Exception as e:
+        # Le fichier reste en place : la finalisation peut être relancée
+        store.mark(upload_id, "open", from_status="finalizing")
+        print(f"Erreur finalisation upload {upload_id} :", e)
+        return jsonify({"error": str(e)}), 500
+
+    if os.path.exists(upload["path"]):
+        os.remove(upload["path"])
+    store.mark(upload_id, "done", result=result)
+    upload = store.get(upload_id)
+    return jsonify(_upload_json(upload)), status_code
@@ -0,0 +1,52 @@
+import os
+import sys
+import uuid
+
+import pytest
+
+# Les tests importent les modules de l'application depuis la racine du dépôt
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# mongod local utilisé par les tests (base jetable, supprimée après chaque test)
+TEST_MONGO_URI = os.getenv("TEST_MONGO_URI", "mongodb://localhost:27017")
+
+
+def _local_mongo_client():
+    from pymongo import MongoClient
+    from pymongo.errors import PyMongoError
+
+    client = MongoClient(TEST_MONGO_URI, serverSelectionTimeoutMS=500)
+    try:
+        client.admin.command("ping")
+        return client
+    except PyMongoError:
+        client.close()
+        return None
+
+
+@pytest.fixture(scope="session")
+def mongo_client():
+    """
+    Client du mongod local ; à défaut (poste sans mongod), mongomock s'il est installé.
+    Les tests qui en dépendent sont ignorés si aucun des deux n'est disponible.
+    """
+    client = _local_mongo_client()
+    if client is None:
+        mongomock = pytest.importorskip("mongomock", reason=f"aucun mongod sur {TEST_MONGO_URI} ni mongomock")
+        client = mongomock.MongoClient()
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def db(mongo_client):
+    name = f"ahc_test_{uuid.uuid4().hex[:12]}"
+    yield mongo_client[name]
+    mongo_client.drop_database(name)
+
+
+@pytest.fixture
+def mongod_only(mongo_client):
+    """Pour les opérations que mongomock ne reproduit pas (ex. $max sur un champ à null)."""
+    if type(mongo_client).__module__.startswith("mongomock"):
+        pytest.skip(f"nécessite un vrai mongod ({TEST_MONGO_URI})")
@@ -0,0 +1,160 @@
+"""
+Résumés clients (collection clientSummaries) : reconstruction par agrégation, mises à jour
+incrémentales par les écritures et recalcul d'un client après une suppression.
+"""
+import time
+from datetime import datetime
+
+from bson.objectid import ObjectId
+
+from models.client_summary import (
+    rebuild_client_summaries,
+    record_client_user,
+    record_documents,
+    record_intervention,
+    refresh_client_summary,
+    remove_client_summary,
+    sync_client,
+)
+
+
+def add_client(db, **fields):
+    client = {"companyName": "Boulangerie Dupré", "email": "contact@dupre.fr",
+              "serviceAddress": {"city": "Lyon", "treatmentPlaceName": "Fournil"}, **fields}
+    client["_id"] = db.clients.insert_one(client).inserted_id
+    return client
+
+
+def add_document(db, client, day, source="upload", intervention_date=None):
+    document = {"clientId": str(client["_id"]), "uploadDate": datetime(2026, 3, day), "source": source}
+    if intervention_date:
+        document["interventionDate"] = intervention_date
+    db.clientDocuments.insert_one(document)
+    return document
+
+
+def summary(db, client):
+    return db.clientSummaries.find_one({"_id": client["_id"]})
+
+
+def test_rebuild_counts_everything_linked_to_a_client(db):
+    client = add_client(db, responsible={"lastName": "Martin"})
+    add_document(db, client, 1)
+    add_document(db, client, 5, source="scan", intervention_date="2026-03-04")
+    plan_id = db.floorPlans.insert_one({"clientId": str(client["_id"])}).inserted_id
+    db.traps.insert_many([{"planId": plan_id}, {"planId": plan_id}])
+    db.interventions.insert_one({"clientId": str(client["_id"]), "date": datetime(2026, 3, 10)})
+    empty = add_client(db, companyName="Sans documents")
+
+    assert rebuild_client_summaries(db) == 2
+
+    saved = summary(db, client)
+    assert (saved["documentCount"], saved["scanCount"], saved["planCount"], saved["trapCount"],
+            saved["interventionCount"]) == (2, 1, 1, 2, 1)
+    assert saved["lastDocumentDate"] == datetime(2026, 3, 5)
+    assert saved["lastInterventionDate"] == datetime(2026, 3, 10)
+    assert saved["serviceAddress"] == {"treatmentPlaceName": "Fournil"}
+    # Clés de recherche : champs de l'identité et du responsable
+    assert {"boul", "dupre", "mart", "lyon"} <= set(saved["searchKeys"])
+    assert summary(db, empty)["documentCount"] == 0
+
+
+def test_rebuild_drops_summaries_of_deleted_clients(db):
+    client = add_client(db)
+    rebuild_client_summaries(db)
+    db.clients.delete_one({"_id": client["_id"]})
+    # Les résumés plus anciens que la reconstruction sont supprimés (dates à la milliseconde)
+    time.sleep(0.01)
+
+    rebuild_client_summaries(db)
+
+    assert summary(db, client) is None
+
+
+def test_recorded_documents_update_counters_and_last_dates(db):
+    client = add_client(db)
+    add_document(db, client, 2, source="scan", intervention_date="2026-03-01")
+    rebuild_client_summaries(db)
+
+    record_documents(db, [
+        add_document(db, client, 8, source="scan", intervention_date="2026-03-07"),
+        add_document(db, client, 3),
+        {"clientId": None, "uploadDate": datetime(2026, 3, 9)},  # scan non assigné : ignoré
+    ])
+
+    saved = summary(db, client)
+    assert (saved["documentCount"], saved["scanCount"]) == (3, 2)
+    assert saved["lastDocumentDate"] == datetime(2026, 3, 8)
+    assert saved["lastInterventionDate"] == datetime(2026, 3, 7)
+
+
+def test_first_write_for_unsummarised_client_builds_its_summary(db):
+    client = add_client(db)
+
+    record_intervention(db, {"clientId": str(client["_id"]), "date": datetime(2026, 3, 10)})
+    db.interventions.insert_one({"clientId": str(client["_id"]), "date": datetime(2026, 3, 10)})
+    refresh_client_summary(db, client["_id"])
+
+    saved = summary(db, client)
+    assert saved["companyName"] == "Boulangerie Dupré"
+    assert saved["interventionCount"] == 1
+
+
+def test_new_client_then_first_document(db, mongod_only):
+    client = add_client(db)
+    sync_client(db, client)
+
+    record_documents(db, [add_document(db, client, 4)])
+
+    saved = summary(db, client)
+    assert saved["documentCount"] == 1
+    assert saved["lastDocumentDate"] == datetime(2026, 3, 4)
+
+
+def test_refresh_after_deletion_recomputes_last_dates(db):
+    client = add_client(db)
+    add_document(db, client, 2)
+    latest = add_document(db, client, 9)
+    rebuild_client_summaries(db)
+
+    db.clientDocuments.delete_one({"_id": latest["_id"]})
+    refresh_client_summary(db, client["_id"])
+
+    saved = summary(db, client)
+    assert saved["documentCount"] == 1
+    assert saved["lastDocumentDate"] == datetime(2026, 3, 2)
+
+
+def test_sync_and_remove_follow_the_client_record(db):
+    client = add_client(db)
+    rebuild_client_summaries(db)
+    record_documents(db, [add_document(db, client, 4)])
+
+    sync_client(db, {**client, "companyName": "Dupré & Fils"})
+    saved = summary(db, client)
+    assert saved["companyName"] == "Dupré & Fils"
+    assert saved["documentCount"] == 1
+
+    remove_client_summary(db, client["_id"])
+    assert summary(db, client) is None
+    remove_client_summary(db, ObjectId())
+
+
+def test_clients_without_active_portal_user_are_unassigned(db):
+    client = add_client(db)
+    unassigned = add_client(db, companyName="Sans accès")
+    db.clientUsers.insert_many([
+        {"clientId": str(client["_id"]), "username": "dupre", "isActive": True},
+        {"clientId": str(client["_id"]), "username": "ancien"},  # comptes antérieurs au champ isActive
+        {"clientId": str(unassigned["_id"]), "username": "parti", "isActive": False},
+    ])
+
+    rebuild_client_summaries(db)
+
+    assert summary(db, client)["activeUserCount"] == 2
+    assert summary(db, unassigned)["activeUserCount"] == 0
+
+    record_client_user(db, unassigned["_id"])
+    record_client_user(db, client["_id"], -1)
+    assert summary(db, unassigned)["activeUserCount"] == 1
+    assert summary(db, client)["activeUserCount"] == 1
@@ -0,0 +1,80 @@
+"""
+Déduplication des documents par empreinte SHA-256 : pas de second envoi pour un même
+client, référence à l'objet existant en mode "link", objet partagé conservé à la suppression.
+"""
+import pytest
+from bson.objectid import ObjectId
+
+from models import ClientDocumentManager as manager_module
+from models.ClientDocumentManager import ClientDocumentManager
+
+
+@pytest.fixture
+def bucket(monkeypatch):
+    """Bucket MinIO simulé : clés envoyées et supprimées."""
+    objects = {"put": [], "deleted": []}
+    monkeypatch.setattr(manager_module.storage, "put_file", lambda key, path, content_type: objects["put"].append(key))
+    monkeypatch.setattr(manager_module.storage, "delete", lambda key: objects["deleted"].append(key))
+    monkeypatch.setattr(manager_module, "ensure_thumbnail", lambda db, content_hash, path, name: None)
+    return objects
+
+
+@pytest.fixture
+def report(tmp_path):
+    path = tmp_path / "rapport.pdf"
+    path.write_bytes(b"%PDF-1.4 rapport d'intervention")
+    return str(path)
+
+
+def store(manager, client_id, path, dedup_mode=None):
+    return manager.store_file(client_id, path, "rapport.pdf", "application/pdf", "alice", "rapport",
+                              dedup_mode=dedup_mode)
+
+
+def test_same_content_for_same_client_is_not_uploaded_twice(db, bucket, report):
+    manager = ClientDocumentManager(db)
+    client_id = str(ObjectId())
+
+    first = store(manager, client_id, report)
+    second = store(manager, client_id, report)
+
+    assert first["status"] == "ok"
+    assert second == {"status": "duplicate", "documentId": first["documentId"]}
+    assert len(bucket["put"]) == 1
+    assert db.clientDocuments.count_documents({}) == 1
+
+
+def test_link_mode_references_existing_object(db, bucket, report):
+    manager = ClientDocumentManager(db)
+
+    first = store(manager, str(ObjectId()), report)
+    linked = store(manager, str(ObjectId()), report, dedup_mode="link")
+
+    assert linked["status"] == "linked"
+    assert len(bucket["put"]) == 1
+    original = db.clientDocuments.find_one({"_id": ObjectId(first["documentId"])})
+    link = db.clientDocuments.find_one({"_id": ObjectId(linked["documentId"])})
+    assert link["filePath"] == original["filePath"]
+    assert link["linkedFrom"] == original["_id"]
+
+
+def test_shared_object_survives_deletion_of_one_document(db, bucket, report):
+    manager = ClientDocumentManager(db)
+    first = store(manager, str(ObjectId()), report)
+    linked = store(manager, str(ObjectId()), report, dedup_mode="link")
+
+    manager.delete_document(first["documentId"])
+    assert bucket["deleted"] == []
+
+    manager.delete_document(linked["documentId"])
+    assert bucket["deleted"] == [bucket["put"][0]]
+
+
+def test_copy_mode_uploads_again_for_another_client(db, bucket, report):
+    manager = ClientDocumentManager(db)
+
+    store(manager, str(ObjectId()), report)
+    other = store(manager, str(ObjectId()), report, dedup_mode="copy")
+
+    assert other["status"] == "ok"
+    assert len(bucket["put"]) == 2
@@ -0,0 +1,44 @@
+"""
+Plans d'étage et pièges : chargement groupé, coordonnées toujours entières à l'affichage.
+"""
+from bson.objectid import ObjectId
+
+from models.floorplan_model import FloorPlanModel
+from models.trap_model import TrapModel
+
+
+def add_plan(db, client_id):
+    return db.floorPlans.insert_one({"clientId": client_id, "name": "RDC"}).inserted_id
+
+
+def test_plans_come_with_their_own_traps(db):
+    client_id = str(ObjectId())
+    plan_a, plan_b, empty = add_plan(db, client_id), add_plan(db, client_id), add_plan(db, client_id)
+    TrapModel(db).add_trap(plan_a, {"label": "P1", "coordinates": {"x": "10", "y": "20"}})
+    TrapModel(db).add_trap(plan_b, {"label": "P2"})
+
+    plans = {plan["_id"]: plan for plan in FloorPlanModel(db).get_floorplans_with_traps(client_id)}
+
+    assert [trap["label"] for trap in plans[plan_a]["traps"]] == ["P1"]
+    assert plans[plan_a]["traps"][0]["coordinates"] == {"x": 10, "y": 20}
+    assert [trap["label"] for trap in plans[plan_b]["traps"]] == ["P2"]
+    assert plans[empty]["traps"] == []
+
+
+def test_legacy_text_coordinates_are_integers_when_loaded(db):
+    plan_id = add_plan(db, str(ObjectId()))
+    # Pièges enregistrés par les anciens formulaires, avant normalize-traps
+    db.traps.insert_many([
+        {"planId": plan_id, "label": "texte", "coordinates": {"x": "12.7", "y": "30"}},
+        {"planId": plan_id, "label": "incomplet", "coordinates": {"x": "", "y": None}},
+        {"planId": plan_id, "label": "sans coordonnées"},
+    ])
+
+    plan = FloorPlanModel(db).get_floorplan_with_traps(plan_id)
+
+    assert {trap["label"]: trap.get("coordinates") for trap in plan["traps"]} == {
+        "texte": {"x": 12, "y": 30},
+        "incomplet": {"x": 0, "y": 0},
+        "sans coordonnées": None,
+    }
+    assert FloorPlanModel(db).get_floorplan_with_traps(ObjectId()) is None
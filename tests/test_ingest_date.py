@@ -0,0 +1,87 @@
+"""
+Date d'intervention d'un scan (PDF image, sans couche texte) : l'OCR doit recevoir
+le rendu PIL de la 1ère page, pas une page PyPDF2.
+"""
+import io
+
+import pytest
+from PIL import Image
+
+from routes import ingest
+
+
+class FakeOcrBackend:
+    """Moteur OCR de test : n'accepte que des images PIL, comme tesseract."""
+    name = "fake"
+
+    def __init__(self, text):
+        self.text = text
+        self.calls = []
+
+    def image_to_string(self, image):
+        if not isinstance(image, Image.Image):
+            raise TypeError(f"image PIL attendue, reçu {type(image).__name__}")
+        self.calls.append(image.size)
+        return self.text
+
+
+def image_only_pdf():
+    """PDF d'une page ne contenant qu'une image (scan), donc sans texte extractible."""
+    buffer = io.BytesIO()
+    Image.new("L", (850, 1100), 255).save(buffer, format="PDF")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def ocr(monkeypatch):
+    backend = FakeOcrBackend("Date d'intervention : 12/03/2026")
+    monkeypatch.setattr(ingest, "get_ocr_backend", lambda name=ingest.OCR_BACKEND: backend)
+    # Extraction texte en pur Python : pas de dépendance au binaire pdftotext
+    monkeypatch.setattr(ingest, "get_text_backends", lambda name=ingest.PDF_TEXT_BACKEND: [ingest.PyPDF2TextBackend()])
+    return backend
+
+
+def test_image_only_pdf_date_comes_from_ocr(ocr):
+    pdf_bytes = image_only_pdf()
+    page = Image.new("L", (1700, 2200), 255)
+
+    result = ingest.extract_intervention_date_from_pdf(pdf_bytes, page)
+
+    assert result["interventionDate"] == "2026-03-12"
+    assert result["source"] in ("ocr_zone", "ocr")
+    assert ocr.calls
+
+
+def test_full_page_ocr_when_zones_have_no_date(monkeypatch, ocr):
+    monkeypatch.setattr(ingest, "INTERVENTION_DATE_ZONES", ())
+    page = Image.new("L", (1700, 2200), 255)
+
+    result = ingest.extract_intervention_date_from_pdf(image_only_pdf(), page)
+
+    assert result == {
+        "interventionDate": "2026-03-12",
+        "source": "ocr",
+        "rawText": "Date d'intervention : 12/03/2026",
+    }
+    assert ocr.calls == [(1700, 2200)]
+
+
+def test_spooled_pdf_is_read_from_its_path(monkeypatch, tmp_path, ocr):
+    pdf_path = tmp_path / "scan.pdf"
+    pdf_path.write_bytes(image_only_pdf())
+    rendered = []
+
+    def convert_from_path(path, **kwargs):
+        rendered.append(path)
+        return [Image.new("L", (1700, 2200), 255)]
+
+    def convert_from_bytes(*args, **kwargs):
+        raise AssertionError("le PDF spoolé ne doit pas être rechargé en mémoire")
+
+    monkeypatch.setattr(ingest, "convert_from_path", convert_from_path)
+    monkeypatch.setattr(ingest, "convert_from_bytes", convert_from_bytes)
+
+    result = ingest.extract_intervention_date_from_file(str(pdf_path))
+
+    assert result["interventionDate"] == "2026-03-12"
+    assert rendered == [str(pdf_path)]
@@ -0,0 +1,119 @@
+"""
+File des jobs d'ingestion (collection ingestJobs) : réservation atomique, reprise d'un
+job abandonné, avancement des fichiers et fin de job, limités au worker qui détient le job.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from models.ingest_job import IngestJobQueue
+
+
+def spooled(*names):
+    return [{"file": name, "spoolPath": f"/spool/{name}", "contentHash": f"hash-{name}"} for name in names]
+
+
+def test_create_job_queues_every_file(db):
+    queue = IngestJobQueue(db)
+
+    job_id = queue.create_job(
+        spooled("a.pdf") + [{"file": "b.txt", "status": "error", "result": {"message": "PDF attendu"}}],
+        "/spool", "alice",
+    )
+
+    job = queue.get_job(job_id)
+    assert job["status"] == "queued"
+    assert job["createdBy"] == "alice"
+    assert job["workerId"] is None
+    assert [(f["file"], f["status"]) for f in job["files"]] == [("a.pdf", "queued"), ("b.txt", "error")]
+
+
+def test_claim_next_takes_oldest_queued_job(db):
+    queue = IngestJobQueue(db)
+    first = queue.create_job(spooled("a.pdf"), "/spool/1", "alice")
+    queue.create_job(spooled("b.pdf"), "/spool/2", "alice")
+
+    job = queue.claim_next("worker-1")
+
+    assert job["_id"] == first
+    assert job["status"] == "running"
+    assert job["workerId"] == "worker-1"
+    assert job["lockedAt"] is not None
+
+
+def test_claim_next_never_gives_a_job_twice(db):
+    queue = IngestJobQueue(db)
+    job_ids = {queue.create_job(spooled(f"{i}.pdf"), f"/spool/{i}", "alice") for i in range(5)}
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        claimed = list(executor.map(lambda i: queue.claim_next(f"worker-{i}"), range(8)))
+
+    claimed_ids = [job["_id"] for job in claimed if job]
+    assert sorted(claimed_ids) == sorted(job_ids)
+    assert queue.claim_next("worker-late") is None
+
+
+def test_stale_running_job_is_reclaimed(db):
+    queue = IngestJobQueue(db)
+    job_id = queue.create_job(spooled("a.pdf"), "/spool", "alice")
+    queue.claim_next("worker-1")
+
+    # Verrou récent : personne d'autre ne prend le job
+    assert queue.claim_next("worker-2", stale_after=timedelta(minutes=10)) is None
+
+    db.ingestJobs.update_one({"_id": job_id}, {"$set": {"lockedAt": datetime.now() - timedelta(minutes=11)}})
+    job = queue.claim_next("worker-2", stale_after=timedelta(minutes=10))
+    assert job["_id"] == job_id
+    assert job["workerId"] == "worker-2"
+
+
+def test_heartbeat_keeps_job_from_being_reclaimed(db):
+    queue = IngestJobQueue(db)
+    job_id = queue.create_job(spooled("a.pdf"), "/spool", "alice")
+    queue.claim_next("worker-1")
+    db.ingestJobs.update_one({"_id": job_id}, {"$set": {"lockedAt": datetime.now() - timedelta(minutes=11)}})
+
+    assert queue.heartbeat(job_id, "worker-1")
+    assert queue.claim_next("worker-2", stale_after=timedelta(minutes=10)) is None
+
+
+def test_set_file_status_records_progress(db):
+    queue = IngestJobQueue(db)
+    job_id = queue.create_job(spooled("a.pdf", "b.pdf"), "/spool", "alice")
+    queue.claim_next("worker-1")
+
+    assert queue.set_file_status(job_id, 0, "rasterized", worker_id="worker-1")
+    assert queue.set_file_status(job_id, 1, "stored", {"status": "ok"}, worker_id="worker-1")
+
+    files = queue.get_job(job_id)["files"]
+    assert [f["status"] for f in files] == ["rasterized", "stored"]
+    assert files[0]["result"] is None
+    assert files[1]["result"] == {"status": "ok"}
+
+
+def test_finish_marks_job_done(db):
+    queue = IngestJobQueue(db)
+    job_id = queue.create_job(spooled("a.pdf"), "/spool", "alice")
+    queue.claim_next("worker-1")
+
+    assert queue.finish(job_id, worker_id="worker-1")
+
+    job = queue.get_job(job_id)
+    assert job["status"] == "done"
+    assert job["finishedAt"] is not None
+    assert job["lockedAt"] is None
+
+
+def test_worker_that_lost_its_job_cannot_write_to_it(db):
+    queue = IngestJobQueue(db)
+    job_id = queue.create_job(spooled("a.pdf"), "/spool", "alice")
+    queue.claim_next("worker-1")
+    db.ingestJobs.update_one({"_id": job_id}, {"$set": {"lockedAt": datetime.now() - timedelta(minutes=11)}})
+    queue.claim_next("worker-2", stale_after=timedelta(minutes=10))
+
+    assert not queue.heartbeat(job_id, "worker-1")
+    assert not queue.set_file_status(job_id, 0, "error", worker_id="worker-1")
+    assert not queue.finish(job_id, worker_id="worker-1")
+
+    job = queue.get_job(job_id)
+    assert job["status"] == "running"
+    assert job["files"][0]["status"] == "queued"
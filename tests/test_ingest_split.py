@@ -0,0 +1,90 @@
+"""
+Découpage d'un lot par QR : chaque page à QR commence une nouvelle intervention, sauf si
+son QR désigne explicitement l'intervention en cours (intervention_ref).
+"""
+from concurrent.futures import Future
+
+import pytest
+
+from routes import ingest
+
+QR_URL = "https://app.ahc-digital.com/api/upload_doc?client_ref={}"
+
+
+def qr(client_id, intervention_ref=None):
+    raw = QR_URL.format(client_id)
+    if intervention_ref:
+        raw += f"&intervention_ref={intervention_ref}"
+    return {"clientId": client_id, "qrRaw": raw}
+
+
+NO_QR = {"clientId": None, "qrRaw": None}
+# QR lisible mais qui ne désigne aucun client
+UNKNOWN_QR = {"clientId": None, "qrRaw": "https://exemple.fr/produit/42"}
+
+
+@pytest.fixture
+def batch(monkeypatch):
+    """Lot simulé : liste des QR lus page par page, analysée sans pool de process."""
+    pages = []
+
+    def scan_batch_pages(pdf_path, first, last):
+        return [{"page": page_no, **pages[page_no - 1]} for page_no in range(first, last + 1)]
+
+    def submit_analysis(fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+    monkeypatch.setattr(ingest, "_scan_batch_pages", scan_batch_pages)
+    monkeypatch.setattr(ingest, "_submit_analysis", submit_analysis)
+    # Tranches de 2 pages : les parties se prolongent aussi d'une tranche à l'autre
+    monkeypatch.setattr(ingest, "SPLIT_PAGES_PER_TASK", 2)
+    return pages
+
+
+def ranges(parts):
+    return [(part["first"], part["last"], part["clientId"]) for part in parts]
+
+
+def test_consecutive_interventions_of_same_client_are_split(batch):
+    batch.extend([qr("a"), NO_QR, qr("a"), NO_QR, NO_QR, qr("b")])
+
+    parts = ingest.split_batch_by_qr("lot.pdf", len(batch))
+
+    assert ranges(parts) == [(1, 2, "a"), (3, 5, "a"), (6, 6, "b")]
+
+
+def test_same_qr_on_consecutive_pages_splits_without_intervention_ref(batch):
+    batch.extend([qr("a"), qr("a")])
+
+    parts = ingest.split_batch_by_qr("lot.pdf", len(batch))
+
+    assert ranges(parts) == [(1, 1, "a"), (2, 2, "a")]
+
+
+def test_repeated_intervention_ref_continues_the_part(batch):
+    batch.extend([qr("a", "int-1"), qr("a", "int-1"), qr("a", "int-1"), qr("a", "int-2"), NO_QR, qr("b", "int-2")])
+
+    parts = ingest.split_batch_by_qr("lot.pdf", len(batch))
+
+    assert ranges(parts) == [(1, 3, "a"), (4, 5, "a"), (6, 6, "b")]
+    assert parts[1]["qrRaw"].endswith("intervention_ref=int-2")
+
+
+def test_unresolved_qr_starts_an_unassigned_part(batch):
+    batch.extend([qr("a"), NO_QR, UNKNOWN_QR, NO_QR, qr("a")])
+
+    parts = ingest.split_batch_by_qr("lot.pdf", len(batch))
+
+    assert ranges(parts) == [(1, 2, "a"), (3, 4, None), (5, 5, "a")]
+    assert parts[1]["qrRaw"] == UNKNOWN_QR["qrRaw"]
+
+
+def test_pages_before_first_qr_form_unassigned_part(batch):
+    batch.extend([NO_QR, NO_QR, qr("a"), NO_QR])
+
+    parts = ingest.split_batch_by_qr("lot.pdf", len(batch))
+
+    assert ranges(parts) == [(1, 2, None), (3, 4, "a")]
+    assert parts[0]["qrRaw"] is None
@@ -0,0 +1,46 @@
+"""
+Cache des résultats d'analyse QR / OCR (collection ocrCache) : clé empreinte + version du
+pipeline, éviction des entrées les moins récemment utilisées.
+"""
+import time
+
+from models.ocr_cache import OcrResultCache
+
+ANALYSIS = {"clientId": "abc", "qrRaw": "client:abc", "interventionDate": "2026-03-12"}
+
+
+def test_result_is_returned_for_same_hash_and_version(db):
+    cache = OcrResultCache(db)
+    cache.put("hash-1", "v1", ANALYSIS)
+
+    assert cache.get("hash-1", "v1") == ANALYSIS
+    assert db.ocrCache.find_one({"contentHash": "hash-1"})["hits"] == 1
+
+
+def test_new_pipeline_version_misses(db):
+    cache = OcrResultCache(db)
+    cache.put("hash-1", "v1", ANALYSIS)
+
+    assert cache.get("hash-1", "v2") is None
+    assert cache.get("hash-2", "v1") is None
+    assert cache.get(None, "v1") is None
+
+
+def test_least_recently_used_entries_are_evicted(db):
+    cache = OcrResultCache(db, max_entries=2)
+
+    # Mongo stocke les dates à la milliseconde : opérations espacées pour les départager
+    def step(operation, *args):
+        operation(*args)
+        time.sleep(0.01)
+
+    step(cache.put, "hash-1", "v1", ANALYSIS)
+    step(cache.put, "hash-2", "v1", ANALYSIS)
+    # hash-1 relu : c'est hash-2 le moins récemment utilisé
+    step(cache.get, "hash-1", "v1")
+
+    cache.put("hash-3", "v1", ANALYSIS)
+
+    assert cache.get("hash-1", "v1") == ANALYSIS
+    assert cache.get("hash-2", "v1") is None
+    assert cache.get("hash-3", "v1") == ANALYSIS
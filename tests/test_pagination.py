@@ -0,0 +1,62 @@
+"""
+Pagination par curseur (keyset) sur _id et cache des totaux.
+"""
+from models.pagination import CountCache, decode_cursor, encode_cursor, keyset_page
+
+
+def names(page):
+    return [item["name"] for item in page["items"]]
+
+
+def fill(db, count):
+    db.items.insert_many([{"name": f"item-{i:02d}", "even": i % 2 == 0} for i in range(count)])
+    return db.items
+
+
+def test_walks_forward_then_back_through_pages(db):
+    items = fill(db, 7)
+
+    first = keyset_page(items, {}, None, "", 3)
+    second = keyset_page(items, {}, None, first["next"], 3)
+    last = keyset_page(items, {}, None, second["next"], 3)
+    back = keyset_page(items, {}, None, last["prev"], 3)
+
+    assert names(first) == ["item-00", "item-01", "item-02"]
+    assert first["prev"] is None
+    assert (second["page"], names(second)) == (2, ["item-03", "item-04", "item-05"])
+    assert (last["page"], names(last), last["next"]) == (3, ["item-06"], None)
+    assert (back["page"], names(back)) == (2, names(second))
+    assert keyset_page(items, {}, None, back["prev"], 3)["prev"] is None
+
+
+def test_filter_applies_on_every_page(db):
+    items = fill(db, 10)
+
+    first = keyset_page(items, {"even": True}, None, "", 3)
+    second = keyset_page(items, {"even": True}, None, first["next"], 3)
+
+    assert names(first) == ["item-00", "item-02", "item-04"]
+    assert names(second) == ["item-06", "item-08"]
+    assert second["next"] is None
+
+
+def test_invalid_cursor_restarts_at_first_page(db):
+    items = fill(db, 4)
+
+    page = keyset_page(items, {}, None, "pas-un-jeton", 2)
+
+    assert page["page"] == 1
+    assert names(page) == ["item-00", "item-01"]
+    assert decode_cursor(encode_cursor("sideways", items.find_one()["_id"], 2)) is None
+
+
+def test_filtered_total_is_cached_until_ttl(db):
+    items = fill(db, 4)
+    counts = CountCache(ttl=60)
+
+    assert counts.count(items, {"even": True}) == 2
+    items.insert_one({"name": "item-04", "even": True})
+
+    assert counts.count(items, {"even": True}) == 2
+    assert CountCache(ttl=0).count(items, {"even": True}) == 3
+    assert counts.count(items, {}) == 5
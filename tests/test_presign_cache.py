@@ -0,0 +1,79 @@
+"""
+Cache des URL signées : réutilisation tant qu'il reste assez de validité, clé par nom de
+téléchargement et classe d'expiration, partage entre process par le fichier SQLite.
+"""
+import time
+
+from models.presign_cache import PresignedUrlCache
+
+
+class Signer:
+    """Signature simulée : une nouvelle URL à chaque appel."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return f"https://minio/objet?signature={self.calls}"
+
+
+def test_url_is_reused_while_valid_enough():
+    cache, sign = PresignedUrlCache(sqlite_path=""), Signer()
+
+    first = cache.get_or_sign("doc.pdf", None, "view", 3600, sign)
+    second = cache.get_or_sign("doc.pdf", None, "view", 3600, sign)
+
+    assert first == second
+    assert sign.calls == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_download_name_and_expiry_class_are_part_of_the_key():
+    cache, sign = PresignedUrlCache(sqlite_path=""), Signer()
+
+    cache.get_or_sign("doc.pdf", None, "view", 3600, sign)
+    cache.get_or_sign("doc.pdf", "rapport.pdf", "view", 3600, sign)
+    cache.get_or_sign("doc.pdf", None, "download", 3600, sign)
+
+    assert sign.calls == 3
+
+
+def test_url_past_half_its_lifetime_is_signed_again(monkeypatch):
+    cache, sign = PresignedUrlCache(sqlite_path="", min_remaining=0.5), Signer()
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    cache.get_or_sign("doc.pdf", None, "view", 3600, sign)
+
+    monkeypatch.setattr(time, "time", lambda: now + 1801)
+    cache.get_or_sign("doc.pdf", None, "view", 3600, sign)
+
+    assert sign.calls == 2
+
+
+def test_memory_level_evicts_least_recently_used():
+    cache, sign = PresignedUrlCache(max_entries=2, sqlite_path=""), Signer()
+    cache.get_or_sign("a", None, "view", 3600, sign)
+    cache.get_or_sign("b", None, "view", 3600, sign)
+    cache.get_or_sign("a", None, "view", 3600, sign)
+
+    cache.get_or_sign("c", None, "view", 3600, sign)
+    cache.get_or_sign("a", None, "view", 3600, sign)
+    cache.get_or_sign("b", None, "view", 3600, sign)
+
+    assert sign.calls == 4
+    assert cache.stats()["evictions"] == 2
+
+
+def test_shared_store_serves_other_processes_and_tracks_use(tmp_path):
+    path = str(tmp_path / "presigned.sqlite")
+    worker_1, worker_2, sign = PresignedUrlCache(sqlite_path=path), PresignedUrlCache(sqlite_path=path), Signer()
+
+    url = worker_1.get_or_sign("doc.pdf", None, "view", 3600, sign)
+    before = worker_1._db().execute("SELECT last_used FROM presigned").fetchone()[0]
+    time.sleep(0.01)
+
+    assert worker_2.get_or_sign("doc.pdf", None, "view", 3600, sign) == url
+    assert sign.calls == 1
+    assert worker_2.stats()["sharedHits"] == 1
+    assert worker_1._db().execute("SELECT last_used FROM presigned").fetchone()[0] > before
@@ -0,0 +1,75 @@
+"""
+Sessions d'upload reprenable (collection uploadSessions) : un seul envoi à la fois,
+reprise à l'offset confirmé, finalisation unique et purge des sessions abandonnées.
+"""
+import os
+from datetime import datetime, timedelta
+
+from models.upload_session import UploadSessionStore
+
+
+def open_session(db, tmp_path, length=10):
+    store = UploadSessionStore(db, str(tmp_path / "uploads"))
+    return store, store.create("scan.pdf", length, "ingest", "alice", {"clientId": "abc"})
+
+
+def test_create_opens_session_with_empty_file(db, tmp_path):
+    store, upload = open_session(db, tmp_path)
+
+    saved = store.get(upload["_id"])
+    assert saved["offset"] == 0
+    assert saved["status"] == "open"
+    assert saved["metadata"] == {"clientId": "abc"}
+    assert os.path.getsize(saved["path"]) == 0
+
+
+def test_only_one_write_at_a_time_and_at_confirmed_offset(db, tmp_path):
+    store, upload = open_session(db, tmp_path)
+
+    assert store.begin_write(upload["_id"], 0, "token-1")
+    # Envoi concurrent, ou reprise à un offset qui n'est pas celui confirmé
+    assert store.begin_write(upload["_id"], 0, "token-2") is None
+
+    saved = store.end_write(upload["_id"], "token-1", 4)
+    assert saved["offset"] == 4
+    assert saved["writeToken"] is None
+
+    assert store.begin_write(upload["_id"], 0, "token-3") is None
+    assert store.begin_write(upload["_id"], 4, "token-3")
+
+
+def test_abandoned_write_lock_is_taken_over(db, tmp_path):
+    store, upload = open_session(db, tmp_path)
+    store.begin_write(upload["_id"], 0, "token-1")
+    db.uploadSessions.update_one({"_id": upload["_id"]},
+                                 {"$set": {"writeLockedAt": datetime.now() - timedelta(minutes=6)}})
+
+    assert store.begin_write(upload["_id"], 0, "token-2", stale_after=timedelta(minutes=5))
+    # L'écriture abandonnée ne peut plus confirmer d'octets
+    assert store.end_write(upload["_id"], "token-1", 10) is None
+    assert store.get(upload["_id"])["offset"] == 0
+
+
+def test_session_is_finalized_once(db, tmp_path):
+    store, upload = open_session(db, tmp_path)
+
+    assert store.mark(upload["_id"], "finalizing", from_status="open")
+    assert not store.mark(upload["_id"], "finalizing", from_status="open")
+    assert store.mark(upload["_id"], "done", result={"status": "ok"})
+    assert store.get(upload["_id"])["result"] == {"status": "ok"}
+
+
+def test_purge_removes_expired_sessions_but_not_finalizing_ones(db, tmp_path):
+    store, expired = open_session(db, tmp_path)
+    _, finalizing = open_session(db, tmp_path)
+    _, active = open_session(db, tmp_path)
+    past = datetime.now() - timedelta(hours=1)
+    db.uploadSessions.update_many({"_id": {"$in": [expired["_id"], finalizing["_id"]]}},
+                                  {"$set": {"expiresAt": past}})
+    store.mark(finalizing["_id"], "finalizing", from_status="open")
+
+    assert store.purge_expired() == 1
+    assert store.get(expired["_id"]) is None
+    assert not os.path.exists(expired["path"])
+    assert store.get(finalizing["_id"])
+    assert store.get(active["_id"])